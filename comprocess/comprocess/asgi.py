@@ -9,8 +9,14 @@ https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 
 import os
 
+from django.conf import settings
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'comprocess.settings')
 
 application = get_asgi_application()
+
+if settings.EXCHANGE_RATE_PRELOAD:
+    from comprocessSW.ai_module.postprocess import preload_predictor
+
+    preload_predictor()
@@ -110,6 +110,25 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
+# Password hashing (comprocessSW/hashing.py). Measure with: python manage.py benchmark_hashers
+# First entry hashes new passwords; stored hashes from the others are upgraded on the next login.
+PASSWORD_HASHERS = [
+    hasher.strip() for hasher in os.getenv(
+        'PASSWORD_HASHERS',
+        'comprocessSW.hashing.PBKDF2PasswordHasher,'
+        'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher,'
+        'django.contrib.auth.hashers.Argon2PasswordHasher,'
+        'django.contrib.auth.hashers.BCryptSHA256PasswordHasher,'
+        'django.contrib.auth.hashers.ScryptPasswordHasher'
+    ).split(',') if hasher.strip()
+]
+# 0 = Django default; changing it rehashes stored passwords on login
+PASSWORD_PBKDF2_ITERATIONS = int(os.getenv('PASSWORD_PBKDF2_ITERATIONS', '0'))
+# Dedicated hashing threads per process (0 = answer every hashing request with 503) and how many more requests may wait before a 503
+PASSWORD_HASH_WORKERS = int(os.getenv('PASSWORD_HASH_WORKERS', '2'))
+PASSWORD_HASH_QUEUE = int(os.getenv('PASSWORD_HASH_QUEUE', '16'))
+PASSWORD_HASH_RETRY_AFTER = int(os.getenv('PASSWORD_HASH_RETRY_AFTER', '1'))
+
 
 # Internationalization
 # https://docs.djangoproject.com/en/5.2/topics/i18n/
@@ -132,6 +151,32 @@ STATIC_ROOT = BASE_DIR / 'staticfiles'
 # Media files (Uploaded by users)
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'uploads'
+# Hashed subdirectories for upload blobs: depth 2, width 2 → blobs/ab/cd/<sha256>.ext
+# (changing these only affects new blobs; stored paths keep working)
+MEDIA_SHARD_DEPTH = int(os.getenv('MEDIA_SHARD_DEPTH', '2'))
+MEDIA_SHARD_WIDTH = int(os.getenv('MEDIA_SHARD_WIDTH', '2'))
+# Unreferenced upload blobs younger than this are left for manage.py gc_blobs
+BLOB_GC_GRACE_SECONDS = int(os.getenv('BLOB_GC_GRACE_SECONDS', '3600'))
+# Where upload blobs live: local (MEDIA_ROOT) / s3 (S3-compatible object storage, needs `pip install boto3`)
+UPLOAD_STORAGE = os.getenv('UPLOAD_STORAGE', 'local')
+# Lifetime of presigned upload/download URLs (seconds)
+UPLOAD_PRESIGN_EXPIRES = int(os.getenv('UPLOAD_PRESIGN_EXPIRES', '3600'))
+UPLOAD_S3_BUCKET = os.getenv('UPLOAD_S3_BUCKET', '')
+UPLOAD_S3_PREFIX = os.getenv('UPLOAD_S3_PREFIX', '')
+UPLOAD_S3_REGION = os.getenv('UPLOAD_S3_REGION', '')
+# Set for MinIO / R2 etc.; empty means AWS
+UPLOAD_S3_ENDPOINT_URL = os.getenv('UPLOAD_S3_ENDPOINT_URL', '')
+# Empty keys fall back to the default AWS credential chain (env vars, IAM role)
+UPLOAD_S3_ACCESS_KEY_ID = os.getenv('UPLOAD_S3_ACCESS_KEY_ID', '')
+UPLOAD_S3_SECRET_ACCESS_KEY = os.getenv('UPLOAD_S3_SECRET_ACCESS_KEY', '')
+# Public/CDN base URL for the bucket; empty means presigned GET URLs
+UPLOAD_S3_PUBLIC_URL = os.getenv('UPLOAD_S3_PUBLIC_URL', '')
+# How uploaded files are sent: django (FileResponse) / accel (nginx X-Accel-Redirect) / sendfile (X-Sendfile)
+MEDIA_SERVE_MODE = os.getenv('MEDIA_SERVE_MODE', 'django')
+# nginx `internal` location aliasing MEDIA_ROOT, used by the accel mode
+MEDIA_ACCEL_REDIRECT_PREFIX = os.getenv('MEDIA_ACCEL_REDIRECT_PREFIX', '/protected-media/')
+# Require a JWT Authorization header on MEDIA_URL requests
+MEDIA_REQUIRE_AUTH = os.getenv('MEDIA_REQUIRE_AUTH', 'False') == 'True'
 
 # WhiteNoise settings for static files
 STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
@@ -165,6 +210,76 @@ CORS_ALLOW_HEADERS = [
     'x-requested-with',
 ]
 
+# Cache (shared by all worker processes)
+# REDIS_URL 이 있으면 Redis (redis 패키지 필요), 없으면 로컬 파일 캐시 사용
+if os.getenv('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.getenv('REDIS_URL'),
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': BASE_DIR / 'cache',
+            'OPTIONS': {'MAX_ENTRIES': 10000},
+        }
+    }
+
+# Load the exchange rate model in the background when the server starts (asgi.py / wsgi.py)
+EXCHANGE_RATE_PRELOAD = os.getenv('EXCHANGE_RATE_PRELOAD', 'True') == 'True'
+
+# Travel plan cache
+PLAN_CACHE_TIMEOUT = int(os.getenv('PLAN_CACHE_TIMEOUT', str(60 * 60 * 24 * 7)))
+PLAN_CACHE_SIMILARITY_THRESHOLD = float(os.getenv('PLAN_CACHE_SIMILARITY_THRESHOLD', '0.85'))
+PLAN_CACHE_INDEX_SIZE = int(os.getenv('PLAN_CACHE_INDEX_SIZE', '5000'))
+
+# Image analysis cache (perceptual hash Hamming distance, 0 = identical hash only)
+IMAGE_CACHE_MAX_DISTANCE = int(os.getenv('IMAGE_CACHE_MAX_DISTANCE', '4'))
+
+# Similar image search (in-memory index per worker, image_search.py)
+IMAGE_SEARCH_MAX_DISTANCE = int(os.getenv('IMAGE_SEARCH_MAX_DISTANCE', '12'))
+IMAGE_SEARCH_MAX_RESULTS = int(os.getenv('IMAGE_SEARCH_MAX_RESULTS', '50'))
+IMAGE_SEARCH_REFRESH_SECONDS = float(os.getenv('IMAGE_SEARCH_REFRESH_SECONDS', '5'))
+IMAGE_SEARCH_RELOAD_SECONDS = float(os.getenv('IMAGE_SEARCH_RELOAD_SECONDS', '3600'))
+
+# Batch image analysis (image-analyze/batch/)
+IMAGE_BATCH_MAX_FILES = int(os.getenv('IMAGE_BATCH_MAX_FILES', '50'))
+IMAGE_BATCH_CONCURRENCY = int(os.getenv('IMAGE_BATCH_CONCURRENCY', '4'))
+
+# Upload limits checked while the upload streams (upload_handlers.py)
+IMAGE_UPLOAD_MAX_BYTES = int(os.getenv('IMAGE_UPLOAD_MAX_MB', '20')) * 1024 * 1024
+IMAGE_MAX_PIXELS = int(os.getenv('IMAGE_MAX_PIXELS', '40000000'))
+IMAGE_MAX_DIMENSION = int(os.getenv('IMAGE_MAX_DIMENSION', '12000'))
+IMAGE_ALLOWED_FORMATS = os.getenv('IMAGE_ALLOWED_FORMATS', 'JPEG,MPO,PNG,WEBP,GIF,HEIF,BMP,TIFF').split(',')
+
+# Resumable upload sessions without progress for this long are removed (cleanup_upload_sessions)
+UPLOAD_SESSION_TTL_HOURS = int(os.getenv('UPLOAD_SESSION_TTL_HOURS', '24'))
+
+FILE_UPLOAD_HANDLERS = [
+    'comprocessSW.upload_handlers.ImageUploadLimitHandler',
+    'django.core.files.uploadhandler.MemoryFileUploadHandler',
+    'django.core.files.uploadhandler.TemporaryFileUploadHandler',
+]
+
+# Thumbnails / responsive variants (variants.py)
+IMAGE_THUMBNAIL_SIZE = int(os.getenv('IMAGE_THUMBNAIL_SIZE', '256'))
+IMAGE_VARIANT_WIDTHS = [int(w) for w in os.getenv('IMAGE_VARIANT_WIDTHS', '320,640,1280').split(',') if w.strip()]
+IMAGE_VARIANT_FORMAT = os.getenv('IMAGE_VARIANT_FORMAT', 'webp')  # webp / jpeg
+IMAGE_VARIANT_QUALITY = int(os.getenv('IMAGE_VARIANT_QUALITY', '80'))
+
+# Re-encode lossless/HEIC uploads after upload (transcode.py): off / webp / jpeg
+IMAGE_TRANSCODE = os.getenv('IMAGE_TRANSCODE', 'off')
+IMAGE_TRANSCODE_QUALITY = int(os.getenv('IMAGE_TRANSCODE_QUALITY', '90'))
+# Keep the transcoded result only if it is at least this much smaller (0.1 = 10%)
+IMAGE_TRANSCODE_MIN_SAVING = float(os.getenv('IMAGE_TRANSCODE_MIN_SAVING', '0.1'))
+IMAGE_TRANSCODE_KEEP_ORIGINAL = os.getenv('IMAGE_TRANSCODE_KEEP_ORIGINAL', 'False') == 'True'
+
+# In-process background thread pool (background.py)
+BACKGROUND_WORKERS = int(os.getenv('BACKGROUND_WORKERS', '2'))
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
@@ -176,7 +291,7 @@ AUTH_USER_MODEL = 'comprocessSW.User'
 # REST Framework settings
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'comprocessSW.authentication.CachedJWTAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.AllowAny',
@@ -200,6 +315,16 @@ SIMPLE_JWT = {
     'USER_ID_CLAIM': 'user_id',
 }
 
+# Authenticated user cache (comprocessSW/authentication.py): per-process LRU in front of the shared cache
+AUTH_USER_CACHE_SECONDS = float(os.getenv('AUTH_USER_CACHE_SECONDS', '10'))
+AUTH_USER_CACHE_SIZE = int(os.getenv('AUTH_USER_CACHE_SIZE', '1024'))
+AUTH_USER_SHARED_CACHE_SECONDS = int(os.getenv('AUTH_USER_SHARED_CACHE_SECONDS', '300'))
+
+# User list pagination (users/): page size, max page size, seconds the approximate count is cached
+USER_LIST_PAGE_SIZE = int(os.getenv('USER_LIST_PAGE_SIZE', '50'))
+USER_LIST_MAX_PAGE_SIZE = int(os.getenv('USER_LIST_MAX_PAGE_SIZE', '200'))
+USER_LIST_COUNT_CACHE_SECONDS = int(os.getenv('USER_LIST_COUNT_CACHE_SECONDS', '60'))
+
 # Swagger settings
 SWAGGER_SETTINGS = {
     'SECURITY_DEFINITIONS': {
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Travel_Schedule, UploadedImage, User
+from .models import Travel_Schedule, TravelDayRevision, UploadedImage, UploadSession, User
 
 # Register your models here.
 @admin.register(User)
@@ -12,9 +12,21 @@ class UserAdmin(admin.ModelAdmin):
 class TravelScheduleAdmin(admin.ModelAdmin):
     list_display = ['id', 'destination', 'budget', 'travel_date']
     search_fields = ['destination']
+    readonly_fields = ['ai_usage']
+
+@admin.register(TravelDayRevision)
+class TravelDayRevisionAdmin(admin.ModelAdmin):
+    list_display = ['id', 'schedule', 'day', 'created_at']
+    readonly_fields = ['ai_usage', 'created_at']
 
 @admin.register(UploadedImage)
 class UploadedImageAdmin(admin.ModelAdmin):
-    list_display = ['id', 'title', 'uploaded_at']
-    search_fields = ['title']
-    readonly_fields = ['uploaded_at']
+    list_display = ['id', 'title', 'uploaded_at', 'analyzed_at']
+    search_fields = ['title', 'phash']
+    readonly_fields = ['uploaded_at', 'phash', 'ai_analysis', 'analyzed_at', 'variants', 'original_image']
+
+@admin.register(UploadSession)
+class UploadSessionAdmin(admin.ModelAdmin):
+    list_display = ['id', 'file_name', 'offset', 'total_size', 'status', 'updated_at']
+    list_filter = ['status']
+    readonly_fields = ['created_at', 'updated_at']
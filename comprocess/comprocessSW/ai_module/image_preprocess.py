@@ -0,0 +1,332 @@
+"""
+비전 모델 전송용 이미지 전처리
+
+원본 파일을 그대로 base64 로 보내지 않고 Pillow 로 먼저 줄여서 보냅니다.
+- EXIF 회전 정보를 픽셀에 반영
+- 모델이 실제로 사용하는 크기까지 축소
+  (high: 2048x2048 안에 맞춘 뒤 짧은 변 768px, low: 긴 변 512px)
+- JPEG (투명도가 있으면 WebP, 더 작으면 PNG) 로 다시 인코딩하고 올바른 MIME 타입 지정
+- 글자/세부 묘사가 많은 이미지만 high detail 사용 (나머지는 low, 고정 85 토큰)
+
+메모리 사용량
+- 파일 전체를 bytes 로 읽지 않고, JPEG 는 필요한 크기까지만 축소 디코딩(draft)
+- base64 는 조각 단위로 인코딩해 data URL 문자열을 한 번만 만듦
+- 동시에 처리 중인 이미지들의 예상 메모리 합계는 memory_budget 으로 제한
+"""
+import asyncio
+import base64
+import io
+import math
+import os
+import threading
+from contextlib import asynccontextmanager, contextmanager
+
+from PIL import Image, ImageFilter, ImageOps
+
+# auto / low / high
+IMAGE_DETAIL = os.getenv("IMAGE_DETAIL", "auto")
+IMAGE_JPEG_QUALITY = int(os.getenv("IMAGE_JPEG_QUALITY", "85"))
+IMAGE_WEBP_QUALITY = int(os.getenv("IMAGE_WEBP_QUALITY", "80"))
+# auto 모드에서 이 비율 이상이 윤곽선인 이미지는 high detail 로 전송
+IMAGE_EDGE_DENSITY_HIGH = float(os.getenv("IMAGE_EDGE_DENSITY_HIGH", "0.12"))
+# 프로세스 안에서 동시에 분석 중인 이미지들의 예상 메모리 합계 상한
+IMAGE_MEMORY_BUDGET_MB = int(os.getenv("IMAGE_MEMORY_BUDGET_MB", "256"))
+
+HIGH_MAX_SIDE = 2048
+HIGH_SHORT_SIDE = 768
+LOW_MAX_SIDE = 512
+TILE = 512
+EDGE_THRESHOLD = 32
+EDGE_SAMPLE = 256
+EXIF_ORIENTATION = 0x0112
+# 이미지 한 장 처리 중 최대 메모리(MB) 히스토그램 구간 (show_metrics)
+PEAK_MB_EDGES = [1, 2, 5, 10, 20, 50, 100]
+# 3의 배수라야 조각별 base64 를 이어 붙여도 전체 인코딩과 같음
+BASE64_CHUNK = 3 * 64 * 1024
+
+# 다시 인코딩하지 않아도 모델이 받는 형식
+PASSTHROUGH_MIME = {"JPEG": "image/jpeg", "PNG": "image/png", "WEBP": "image/webp"}
+
+
+def target_size(width, height, detail):
+    """detail 별로 모델이 실제 사용하는 크기 (원본보다 커지지 않음)"""
+    if detail == "low":
+        scale = min(1.0, LOW_MAX_SIDE / max(width, height))
+    else:
+        scale = min(1.0, HIGH_MAX_SIDE / max(width, height))
+        scale *= min(1.0, HIGH_SHORT_SIDE / (min(width, height) * scale))
+    return max(1, round(width * scale)), max(1, round(height * scale))
+
+
+def estimate_tokens(width, height, detail):
+    """이미지 입력 토큰 추정 (low 85, high 85 + 512px 타일당 170)"""
+    if detail == "low":
+        return 85
+    w, h = target_size(width, height, "high")
+    return 85 + 170 * math.ceil(w / TILE) * math.ceil(h / TILE)
+
+
+def edge_density(image):
+    """축소한 흑백 이미지에서 윤곽선 픽셀 비율 (글자, 간판, 메뉴판 등은 높음)"""
+    sample = image.convert("L")
+    sample.thumbnail((EDGE_SAMPLE, EDGE_SAMPLE))
+    edges = sample.filter(ImageFilter.FIND_EDGES)
+    histogram = edges.histogram()
+    total = sum(histogram) or 1
+    return sum(histogram[EDGE_THRESHOLD:]) / total
+
+
+def choose_detail(image, detail=None):
+    """설정값(IMAGE_DETAIL) 또는 이미지 내용에 따라 low / high 선택"""
+    detail = detail or IMAGE_DETAIL
+    if detail in ("low", "high"):
+        return detail
+    if max(image.size) <= LOW_MAX_SIDE:
+        return "low"
+    return "high" if edge_density(image) >= IMAGE_EDGE_DENSITY_HIGH else "low"
+
+
+def has_alpha(image):
+    """실제로 투명한 픽셀이 있는지 (알파 채널이 모두 불투명이면 False)"""
+    if image.mode in ("RGBA", "LA"):
+        return image.getextrema()[-1][0] < 255
+    return image.mode == "P" and "transparency" in image.info
+
+
+def _encode(image, lossless_source=False):
+    """
+    (bytes, MIME 타입) - 투명도가 있으면 WebP, 아니면 JPEG
+
+    PNG 원본(스크린샷, 그래픽)은 PNG 로도 인코딩해서 더 작은 쪽을 사용합니다.
+    """
+    buffer = io.BytesIO()
+    if has_alpha(image):
+        image.convert("RGBA").save(buffer, "WEBP", quality=IMAGE_WEBP_QUALITY, method=4)
+        return buffer.getvalue(), "image/webp"
+    image.convert("RGB").save(buffer, "JPEG", quality=IMAGE_JPEG_QUALITY, optimize=True)
+    encoded = buffer.getvalue(), "image/jpeg"
+    if lossless_source:
+        buffer = io.BytesIO()
+        image.convert("RGB").save(buffer, "PNG", optimize=True)
+        if len(buffer.getvalue()) < len(encoded[0]):
+            encoded = buffer.getvalue(), "image/png"
+    return encoded
+
+
+def _draft_scale(width, height, fmt):
+    """JPEG 축소 디코딩 배율 (high detail 크기 이상을 유지하는 가장 큰 1/2, 1/4, 1/8)"""
+    if fmt != "JPEG":
+        return 1
+    tw, th = target_size(width, height, "high")
+    for scale in (8, 4, 2):
+        if width // scale >= tw and height // scale >= th:
+            return scale
+    return 1
+
+
+def _file_size(file):
+    position = file.tell()
+    file.seek(0, os.SEEK_END)
+    size = file.tell()
+    file.seek(position)
+    return size
+
+
+def estimate_peak_bytes(image):
+    """
+    이미지 한 장을 처리하는 동안의 최대 메모리 추정 (헤더만 읽음)
+
+    축소 디코딩된 픽셀 + 축소 결과 픽셀 + 인코딩 결과와 그 base64 / data URL 사본
+    (인코딩 결과는 원본 파일 크기와 픽셀 버퍼 크기 중 작은 값을 넘지 않음)
+    """
+    opened_here = isinstance(image, (str, os.PathLike))
+    file = open(image, "rb") if opened_here else image
+    try:
+        file.seek(0)
+        original_bytes = _file_size(file)
+        with Image.open(file) as header:
+            width, height = header.size
+            fmt = header.format
+            bands = max(3, len(header.getbands()))
+    finally:
+        if opened_here:
+            file.close()
+        else:
+            file.seek(0)
+    scale = _draft_scale(width, height, fmt)
+    decoded = (width // scale) * (height // scale) * bands
+    tw, th = target_size(width, height, "high")
+    encoded = min(original_bytes, tw * th * bands)
+    return decoded + tw * th * bands + encoded + 2 * (encoded * 4 // 3)
+
+
+def iter_base64(file, chunk_size=BASE64_CHUNK):
+    """파일을 3바이트 배수 단위로 읽어 base64 조각을 순서대로 반환 (전체를 한 번에 읽지 않음)"""
+    while True:
+        chunk = file.read(chunk_size)
+        if not chunk:
+            return
+        yield base64.b64encode(chunk)
+
+
+def build_data_url(mime, file):
+    """data URL 문자열 (base64 조각을 하나의 버퍼에 쓰고 문자열로 한 번만 변환)"""
+    buffer = io.BytesIO()
+    buffer.write(f"data:{mime};base64,".encode("ascii"))
+    for piece in iter_base64(file):
+        buffer.write(piece)
+    # memoryview 에서 바로 디코딩해 bytes 사본을 만들지 않음
+    with buffer.getbuffer() as view:
+        return str(view, "ascii")
+
+
+class MemoryBudget:
+    """
+    프로세스 안에서 동시에 처리 중인 이미지들의 예상 메모리 합계 제한
+
+    한도를 넘으면 앞선 분석이 끝날 때까지 기다립니다.
+    한도보다 큰 이미지 한 장은 한도 전체를 차지하고 혼자 처리됩니다.
+
+    동기 코드는 acquire(스레드 대기), 비동기 코드는 acquire_async(이벤트 루프에서 대기)를 사용합니다.
+    acquire_async 는 스레드를 붙잡지 않으므로 대기 중인 분석이 많아도 스레드 풀이 막히지 않습니다.
+    """
+
+    def __init__(self, limit_bytes):
+        self.limit = limit_bytes
+        self.used = 0
+        self.condition = threading.Condition()
+        # acquire_async 대기자 (이벤트 루프, Future)
+        self.waiters = []
+
+    def _try_acquire(self, nbytes):
+        """condition 을 잡은 상태에서 호출"""
+        if self.used and self.used + nbytes > self.limit:
+            return False
+        self.used += nbytes
+        return True
+
+    def acquire(self, nbytes):
+        """예약 (한도가 빌 때까지 대기). 실제 예약한 크기를 반환"""
+        nbytes = min(nbytes, self.limit)
+        with self.condition:
+            while not self._try_acquire(nbytes):
+                self.condition.wait()
+        return nbytes
+
+    async def acquire_async(self, nbytes):
+        """acquire 의 비동기 버전 (스레드를 사용하지 않고 이벤트 루프에서 대기)"""
+        nbytes = min(nbytes, self.limit)
+        loop = asyncio.get_running_loop()
+        while True:
+            with self.condition:
+                if self._try_acquire(nbytes):
+                    return nbytes
+                waiter = loop.create_future()
+                self.waiters.append((loop, waiter))
+            await waiter
+
+    def release(self, nbytes):
+        with self.condition:
+            self.used -= nbytes
+            self.condition.notify_all()
+            waiters, self.waiters = self.waiters, []
+        # 다른 스레드의 이벤트 루프일 수 있으므로 각 루프에서 깨움
+        for loop, waiter in waiters:
+            try:
+                loop.call_soon_threadsafe(_wake, waiter)
+            except RuntimeError:  # 이미 닫힌 루프
+                pass
+
+    @contextmanager
+    def reserve(self, nbytes):
+        reserved = self.acquire(nbytes)
+        try:
+            yield reserved
+        finally:
+            self.release(reserved)
+
+    @asynccontextmanager
+    async def reserve_async(self, nbytes):
+        reserved = await self.acquire_async(nbytes)
+        try:
+            yield reserved
+        finally:
+            self.release(reserved)
+
+
+def _wake(waiter):
+    if not waiter.done():
+        waiter.set_result(None)
+
+
+memory_budget = MemoryBudget(IMAGE_MEMORY_BUDGET_MB * 1024 * 1024)
+
+
+def prepare_image(image, detail=None):
+    """
+    이미지 파일을 비전 모델 전송용으로 변환
+
+    Args:
+        image: 이미지 파일 경로 또는 파일 객체
+               (업로드 요청의 UploadedFile 을 넘기면 디스크에서 다시 읽지 않음)
+        detail: low / high / auto (None 이면 IMAGE_DETAIL 설정)
+
+    Returns:
+        {
+            "data_url": "data:<mime>;base64,...",
+            "mime", "detail", "width", "height",
+            "original_bytes", "bytes", "estimated_tokens",
+            "peak_bytes": 처리 중 동시에 존재한 버퍼 크기 합 (픽셀, 인코딩 결과, data URL)
+        }
+    """
+    opened_here = isinstance(image, (str, os.PathLike))
+    file = open(image, "rb") if opened_here else image
+    try:
+        file.seek(0)
+        original_bytes = _file_size(file)
+
+        with Image.open(file) as opened:
+            source_format = opened.format
+            rotated = opened.getexif().get(EXIF_ORIENTATION, 1) != 1
+            scale = _draft_scale(*opened.size, source_format)
+            if scale > 1:
+                # 전체 해상도 픽셀 버퍼를 만들지 않고 1/2~1/8 크기로 바로 디코딩
+                opened.draft(None, (opened.width // scale, opened.height // scale))
+            image = ImageOps.exif_transpose(opened)
+        decoded_bytes = image.width * image.height * len(image.getbands())
+
+        chosen = choose_detail(image, detail)
+        size = target_size(*image.size, chosen)
+        if size != image.size:
+            image = image.resize(size, Image.LANCZOS)
+        pixel_bytes = image.width * image.height * len(image.getbands())
+
+        data, mime = _encode(image, lossless_source=source_format in ("PNG", "GIF", "BMP"))
+        # 회전이 필요 없고 원본이 더 작으면 원본 그대로 전송 (축소는 모델 쪽에서 동일하게 수행)
+        if (
+            not rotated
+            and source_format in PASSTHROUGH_MIME
+            and original_bytes <= len(data)
+        ):
+            file.seek(0)
+            source, mime, sent_bytes = file, PASSTHROUGH_MIME[source_format], original_bytes
+        else:
+            source, sent_bytes = io.BytesIO(data), len(data)
+        data_url = build_data_url(mime, source)
+    finally:
+        if opened_here:
+            file.close()
+        else:
+            file.seek(0)
+
+    return {
+        "data_url": data_url,
+        "mime": mime,
+        "detail": chosen,
+        "width": image.width,
+        "height": image.height,
+        "original_bytes": original_bytes,
+        "bytes": sent_bytes,
+        "estimated_tokens": estimate_tokens(image.width, image.height, chosen),
+        "peak_bytes": decoded_bytes + pixel_bytes + len(data) + 2 * len(data_url),
+    }
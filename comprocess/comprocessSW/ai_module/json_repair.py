@@ -0,0 +1,264 @@
+"""
+AI 응답 JSON 로컬 복구 및 스키마 검증
+
+json.loads 가 실패해도 다시 생성하지 않고 로컬에서 먼저 고칩니다.
+- 마크다운 코드 펜스(```json ... ```)와 앞뒤 설명 문장
+- 작은따옴표 문자열, Python 리터럴(True/False/None)
+- 문자열 안의 줄바꿈, 닫는 괄호 앞의 쉼표
+- 중간에 잘린 출력 (마지막 미완성 항목을 버리고 괄호를 닫음)
+
+복구 후에는 travel_schema 의 스키마에 맞춰 타입을 보정하고 누락된 값을 기본값으로 채웁니다.
+"""
+import json
+import re
+
+FENCE = re.compile(r"^```[a-zA-Z]*\s*|\s*```$")
+PY_LITERALS = {"True": "true", "False": "false", "None": "null"}
+
+
+def strip_fences(text):
+    """마크다운 코드 펜스 제거"""
+    return FENCE.sub("", (text or "").strip())
+
+
+def _close(out, stack):
+    """미완성 항목을 정리하고 열린 괄호를 닫은 후보 문자열"""
+    body = "".join(out).rstrip()
+    if body.endswith(","):
+        body = body[:-1]
+    return body + "".join(entry[0] for entry in reversed(stack))
+
+
+def repair_json_text(text):
+    """
+    JSON 문자열 복구
+
+    Returns:
+        (복구된 JSON 문자열, 적용한 복구 단계 목록, 잘린 출력이었는지 여부)
+        복구할 수 없으면 None
+    """
+    starts = [i for i in (text.find("{"), text.find("[")) if i >= 0]
+    if not starts:
+        return None
+    start = min(starts)
+    steps = ["leading_text"] if start > 0 else []
+
+    out = []
+    stack = []  # [닫는 괄호, out 에서 여는 괄호 위치, 쉼표 위치 목록]
+    quote = None
+    i = start
+    n = len(text)
+    complete = False
+
+    while i < n:
+        ch = text[i]
+        if quote:
+            if ch == "\\":
+                if quote == "'" and text[i + 1:i + 2] == "'":
+                    out.append("'")
+                else:
+                    out.append(text[i:i + 2])
+                i += 2
+                continue
+            if ch == quote:
+                out.append('"')
+                quote = None
+            elif ch == '"':
+                out.append('\\"')
+            elif ch == "\n":
+                out.append("\\n")
+                if "newline_in_string" not in steps:
+                    steps.append("newline_in_string")
+            else:
+                out.append(ch)
+            i += 1
+            continue
+
+        if ch in "\"'":
+            if ch == "'" and "single_quotes" not in steps:
+                steps.append("single_quotes")
+            quote = ch
+            out.append('"')
+        elif ch in "{[":
+            stack.append(["}" if ch == "{" else "]", len(out), []])
+            out.append(ch)
+        elif ch in "}]":
+            body_end = len(out) - 1
+            while body_end >= 0 and out[body_end].isspace():
+                body_end -= 1
+            if body_end >= 0 and out[body_end] == ",":
+                del out[body_end]
+                if "trailing_comma" not in steps:
+                    steps.append("trailing_comma")
+            if stack:
+                if stack[-1][0] != ch and "bracket_mismatch" not in steps:
+                    steps.append("bracket_mismatch")
+                out.append(stack.pop()[0])
+            if not stack:
+                complete = True
+                break
+        elif ch == ",":
+            if stack:
+                stack[-1][2].append(len(out))
+            out.append(ch)
+        elif ch.isalpha():
+            j = i
+            while j < n and (text[j].isalnum() or text[j] == "_"):
+                j += 1
+            word = text[i:j]
+            if word in PY_LITERALS:
+                out.append(PY_LITERALS[word])
+                if "python_literals" not in steps:
+                    steps.append("python_literals")
+            else:
+                out.append(word)
+            i = j
+            continue
+        else:
+            out.append(ch)
+        i += 1
+
+    if complete:
+        if text[i + 1:].strip():
+            steps.append("trailing_text")
+        candidate = "".join(out)
+        try:
+            json.loads(candidate)
+        except json.JSONDecodeError:
+            return None
+        return candidate, steps, False
+
+    # 잘린 출력: 열린 문자열을 닫고, 실패하면 마지막 미완성 항목부터 하나씩 버림
+    steps.append("truncated")
+    if quote:
+        out.append('"')
+    while stack:
+        candidate = _close(out, stack)
+        try:
+            json.loads(candidate)
+            return candidate, steps, True
+        except json.JSONDecodeError:
+            pass
+        _, open_index, commas = stack[-1]
+        if commas:
+            del out[commas.pop():]
+        elif len(out) > open_index + 1:
+            del out[open_index + 1:]
+        else:
+            # 빈 컨테이너도 닫을 수 없으면 (예: 키 뒤에 값이 없는 경우) 컨테이너째 버림
+            stack.pop()
+            del out[open_index:]
+            if not stack:
+                return None
+    return None
+
+
+def default_for(schema):
+    """스키마 타입의 기본값"""
+    schema_type = schema.get("type")
+    if schema_type == "object":
+        return {key: default_for(sub) for key, sub in schema.get("properties", {}).items()}
+    return {"array": [], "string": "", "integer": 0, "number": 0, "boolean": False}.get(schema_type)
+
+
+def conform(value, schema, path="$", report=None):
+    """
+    스키마에 맞춰 값 보정
+
+    - 숫자/불리언 문자열은 해당 타입으로 변환 (report["coerced"] 증가)
+    - 누락되었거나 변환할 수 없는 값은 기본값으로 채움 (report["missing"] 에 경로 기록)
+
+    Returns:
+        (보정된 값, report)
+    """
+    if report is None:
+        report = {"missing": [], "coerced": 0}
+    schema_type = schema.get("type")
+
+    if schema_type == "object":
+        if not isinstance(value, dict):
+            report["missing"].append(path)
+            return default_for(schema), report
+        for key, sub in schema.get("properties", {}).items():
+            if key not in value:
+                report["missing"].append(f"{path}.{key}")
+                value[key] = default_for(sub)
+            else:
+                value[key], _ = conform(value[key], sub, f"{path}.{key}", report)
+        return value, report
+
+    if schema_type == "array":
+        if not isinstance(value, list):
+            report["missing"].append(path)
+            return [], report
+        items = schema.get("items", {})
+        return [conform(item, items, f"{path}[{i}]", report)[0] for i, item in enumerate(value)], report
+
+    if schema_type in ("integer", "number"):
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            if schema_type == "integer" and not isinstance(value, int):
+                report["coerced"] += 1
+                return round(value), report
+            return value, report
+        try:
+            number = float(str(value).replace(",", "").strip())
+        except (TypeError, ValueError):
+            report["missing"].append(path)
+            return 0, report
+        report["coerced"] += 1
+        return (round(number) if schema_type == "integer" else number), report
+
+    if schema_type == "boolean":
+        if isinstance(value, bool):
+            return value, report
+        report["coerced"] += 1
+        return str(value).strip().lower() in ("true", "yes", "y", "1", "예", "필요"), report
+
+    if schema_type == "string":
+        if isinstance(value, str):
+            return value, report
+        report["coerced"] += 1
+        return "" if value is None else str(value), report
+
+    return value, report
+
+
+def parse_plan(raw, schema, essential=()):
+    """
+    AI 응답 문자열을 스키마에 맞는 dict 로 변환
+
+    Args:
+        raw: AI 응답 문자열
+        schema: travel_schema 의 JSON 스키마
+        essential: 비어 있으면 사용할 수 없는 최상위 키 (예: ("itinerary",))
+
+    Returns:
+        (dict 또는 None, info)
+        info["status"]: valid / repaired / incomplete (잘려서 이어쓰기 필요) / unrecoverable
+    """
+    text = strip_fences(raw)
+    steps = ["fences"] if text != (raw or "").strip() else []
+    truncated = False
+
+    try:
+        value = json.loads(text)
+    except json.JSONDecodeError:
+        repaired = repair_json_text(text)
+        if repaired is None:
+            return None, {"status": "unrecoverable", "steps": steps, "partial": text}
+        fixed, repair_steps, truncated = repaired
+        steps += repair_steps
+        value = json.loads(fixed)
+
+    value, report = conform(value, schema)
+    unusable = [key for key in essential if not value.get(key)]
+    info = {"steps": steps, "missing": report["missing"], "coerced": report["coerced"]}
+
+    if truncated and report["missing"] or unusable:
+        # 잘린 출력(복구하면서 열린 괄호를 닫은 경우)만 이어쓰기로 채울 수 있음
+        # 끝까지 받은 문서가 쓸 수 없으면 (예: 빈 itinerary) 이어써도 달라지지 않음
+        status = "incomplete" if truncated else "unrecoverable"
+        return None, {**info, "status": status, "partial": text, "fallback": None if unusable else value}
+
+    clean = not steps and not report["missing"] and not report["coerced"]
+    return value, {**info, "status": "valid" if clean else "repaired"}
@@ -1,85 +1,375 @@
 import os
+import re
+import json
+import time
+from datetime import date
 from dotenv import load_dotenv
 import asyncio
-from openai import AsyncOpenAI
+from openai import AsyncOpenAI, OpenAIError
+
+from .json_repair import parse_plan, strip_fences
+from .travel_schema import DAY_SCHEMA, SKELETON_SCHEMA, TRAVEL_PLAN_SCHEMA, json_schema_format
 
 load_dotenv()
 
 client = AsyncOpenAI(api_key=os.environ.get("OPENAI_API_KEY"))
 
-SYSTEM_PROMPT = """System:
-You are COMPROCESSER, an intelligent travel planner.
-
-User will provide structured travel information in 5 fields:
-1. destination
-2. budget
-3. travel_date
-4. preferences (activities user likes)
-5. extra (additional notes such as allergies, religion, pace, mobility limits, must-visit places, etc.)
-
-Your task:
-- Generate a detailed travel plan ONLY based on these fields.
-- Output **JSON only**, with no explanation or markdown.
-- JSON keys must stay **English**.
-- JSON values must be written in the **same language as the user's input fields**.
-- If any field is empty, fill with reasonable assumptions and state them clearly inside the JSON value.
-- If numbers are unclear, give approximate ranges.
-- Output must be clean, valid, strict JSON only.
-
-JSON structure to output:
-
-{
-  "destination": "",
-  "date": {"start":"", "end":"", "days":0},
-  "travelers": {"count":1, "profile":"unspecified"},
-  "preferences": {
-    "themes": [],
-    "pace": "",
-    "diet": {"allergies":[], "restrictions":[]}
-  },
-  "itinerary": [
-    {
-      "day": 1,
-      "segments": [
-        {
-          "time": "09:00-11:00",
-          "title": "",
-          "poi": "",
-          "duration_min": 0,
-          "transport": "",
-          "cost_local": 0,
-          "booking_needed": false
-        }
-      ]
-    }
-  ],
-  "costs": {
-    "currency": "",
-    "total_local": 0,
-    "total_krw": 0
-  }
-}
-
-Now provide the JSON based on the following user fields:
+MODEL = "gpt-4o-mini"
+
+# 이 일수 이상의 여행은 골격 생성 후 날짜별로 병렬 생성 (fan-out)
+FANOUT_MIN_DAYS = int(os.getenv("TRAVEL_FANOUT_MIN_DAYS", "7"))
+# fan-out 시 동시에 진행할 날짜별 생성 요청 수
+FANOUT_CONCURRENCY = int(os.getenv("TRAVEL_FANOUT_CONCURRENCY", "4"))
+# fan-out 중 한 날짜의 생성이 실패했을 때 다시 시도하는 횟수
+FANOUT_DAY_RETRIES = int(os.getenv("TRAVEL_FANOUT_DAY_RETRIES", "1"))
+# 개별 AI 호출 실패 (잘못된 JSON 은 _create_json 의 ValueError)
+AI_CALL_ERRORS = (ValueError, OpenAIError)
+
+# JSON 구조는 TRAVEL_PLAN_SCHEMA 로 강제되므로 프롬프트에는 규칙만 남긴다.
+# 매 호출마다 동일한 instructions 는 프롬프트 캐시 대상이 된다.
+SYSTEM_PROMPT = """You are COMPROCESSER, an intelligent travel planner.
+Build a detailed travel plan ONLY from the user's fields (destination, budget, travel_date, preferences, extra).
+- Write JSON values in the same language as the user's fields.
+- If a field is empty, make reasonable assumptions and state them in the values.
+- If numbers are unclear, use approximate amounts.
+- Give cost_local per segment in the local currency; totals are calculated by the server.
+"""
+
+SKELETON_PROMPT = """You are COMPROCESSER, an intelligent travel planner.
+Outline the trip from the user's fields: for every day give its date, a theme and ONE anchor POI.
+Do not plan hourly segments.
+- Write JSON values in the same language as the user's fields.
+- If a field is empty, make reasonable assumptions and state them in the values.
+- Set costs.currency to the local currency code; totals are calculated by the server.
+"""
+
+DAY_PROMPT = """You are COMPROCESSER, an intelligent travel planner.
+Plan the hourly segments of ONE day of the trip outlined below.
+- Build the day around its theme and anchor POI; do not repeat places planned for other days.
+- Write JSON values in the same language as the user's fields.
+- If numbers are unclear, use approximate amounts in the local currency.
+"""
+
+REGENERATE_DAY_PROMPT = """You are COMPROCESSER, an intelligent travel planner.
+Re-plan the hourly segments of ONE day of an existing trip.
+- The other days stay as listed; do not repeat their places.
+- Follow the user's feedback for this day if given.
+- Write JSON values in the same language as the user's fields.
+- Give cost_local in the trip's currency.
 """
 
+# 잘린 응답을 로컬에서 복구할 수 없을 때만 사용하는 이어쓰기 요청
+CONTINUE_PROMPT = """You are COMPROCESSER, an intelligent travel planner.
+The travel plan JSON below was cut off. Output ONLY the missing remainder so that
+the partial text followed by your output is one valid JSON document.
+- Do not repeat any part of the partial text.
+- Do not add explanations or markdown fences.
+"""
+
+DATE_PATTERN = re.compile(r"(\d{4})\s*[-./년]\s*(\d{1,2})\s*[-./월]\s*(\d{1,2})")
+
+
+def parse_travel_dates(travel_date):
+    """
+    자유 형식 travel_date 에서 시작일/종료일 추출
+
+    Returns:
+        (start, end) date 튜플. 날짜를 찾지 못하면 None
+    """
+    found = []
+    for year, month, day in DATE_PATTERN.findall(travel_date or ""):
+        try:
+            found.append(date(int(year), int(month), int(day)))
+        except ValueError:
+            continue
+    if not found:
+        return None
+    end = found[-1] if found[-1] >= found[0] else found[0]
+    return found[0], end
+
+
+def count_travel_days(travel_date):
+    """여행 일수 (날짜를 해석할 수 없으면 None)"""
+    dates = parse_travel_dates(travel_date)
+    if dates is None:
+        return None
+    start, end = dates
+    return (end - start).days + 1
+
+
 def build_prompt(destination, budget, travel_date, preferences, extra):
-    return SYSTEM_PROMPT + f"""
-destination: {destination}
+    return f"""destination: {destination}
 budget: {budget}
 travel_date: {travel_date}
 preferences: {preferences}
 extra: {extra}
 """
 
+
+def extract_usage(response, started):
+    """Responses API 응답에서 토큰 사용량과 지연 시간(ms) 추출"""
+    usage = response.usage
+    details = getattr(usage, "input_tokens_details", None)
+    return {
+        "model": response.model,
+        "calls": 1,
+        "prompt_tokens": usage.input_tokens if usage else 0,
+        "completion_tokens": usage.output_tokens if usage else 0,
+        "cached_tokens": (getattr(details, "cached_tokens", 0) or 0) if details else 0,
+        "total_tokens": usage.total_tokens if usage else 0,
+        "latency_ms": round((time.perf_counter() - started) * 1000),
+    }
+
+
+SUMMED_USAGE_KEYS = ("calls", "prompt_tokens", "completion_tokens", "cached_tokens", "total_tokens")
+
+
+def merge_usage(usages, latency_ms):
+    """
+    여러 호출의 토큰 사용량 합산 (latency_ms 는 전체 경과 시간)
+
+    mode, failed_days 처럼 합산하지 않는 값은 첫 사용량의 값을 유지합니다.
+    """
+    merged = {
+        "model": usages[0]["model"] if usages else MODEL,
+        "calls": 0,
+        "prompt_tokens": 0,
+        "completion_tokens": 0,
+        "cached_tokens": 0,
+        "total_tokens": 0,
+    }
+    for usage in usages:
+        for key in SUMMED_USAGE_KEYS:
+            merged[key] += usage.get(key, 0)
+    if usages:
+        for key, value in usages[0].items():
+            if key not in merged and key != "latency_ms":
+                merged[key] = value
+    merged["latency_ms"] = latency_ms
+    return merged
+
+
+async def _create_json(instructions, prompt, name, schema):
+    """structured output 호출 후 (파싱된 JSON, 사용량) 반환"""
+    started = time.perf_counter()
+    response = await client.responses.create(
+        model=MODEL,
+        instructions=instructions,
+        input=prompt,
+        text=json_schema_format(name, schema),
+        temperature=0.4,
+        truncation="auto"
+    )
+    parsed, info = parse_plan(response.output_text, schema)
+    if parsed is None:
+        raise ValueError(f"Invalid JSON returned from AI ({name}: {info['status']})")
+    return parsed, extract_usage(response, started)
+
+
+def _outline_text(outline):
+    return "\n".join(
+        f"day {item['day']} ({item['date']}): {item['theme']} / anchor: {item['anchor_poi']}"
+        for item in outline
+    )
+
+
+async def generate_travel_plan_fanout(destination, budget, travel_date, preferences, extra):
+    """
+    장기 여행 일정 분할 생성
+
+    1) 날짜별 테마와 대표 장소만 담은 골격을 먼저 생성하고
+    2) 각 날짜의 segments 를 FANOUT_CONCURRENCY 개씩 동시에 생성한 뒤
+    3) 기존 일정 JSON 구조로 병합합니다.
+    전체 지연 시간은 대략 골격 1회 + 가장 느린 날짜 1회 수준입니다.
+
+    한 날짜의 생성이 실패하면 FANOUT_DAY_RETRIES 번 다시 시도하고, 그래도 실패한 날짜는
+    segments 를 비워 두고 사용량의 failed_days 에 기록합니다. (모든 날짜가 실패하면 ValueError)
+    """
+    started = time.perf_counter()
+    fields = build_prompt(destination, budget, travel_date, preferences, extra)
+
+    skeleton, skeleton_usage = await _create_json(
+        SKELETON_PROMPT, fields, "travel_skeleton", SKELETON_SCHEMA
+    )
+    outline = skeleton["outline"]
+    outline_text = _outline_text(outline)
+    semaphore = asyncio.Semaphore(FANOUT_CONCURRENCY)
+
+    async def generate_day(item):
+        prompt = f"""{fields}
+trip outline:
+{outline_text}
+
+plan day: {item['day']} ({item['date']})
+"""
+        for attempt in range(FANOUT_DAY_RETRIES + 1):
+            try:
+                async with semaphore:
+                    return await _create_json(DAY_PROMPT, prompt, "travel_day", DAY_SCHEMA)
+            except AI_CALL_ERRORS as e:
+                error = e
+        return error
+
+    day_results = await asyncio.gather(*(generate_day(item) for item in outline))
+
+    itinerary = []
+    day_usages = []
+    failed_days = []
+    for item, result in zip(outline, day_results):
+        if isinstance(result, Exception):
+            failed_days.append(item["day"])
+            itinerary.append({"day": item["day"], "segments": []})
+            continue
+        day_plan, day_usage = result
+        day_usages.append(day_usage)
+        itinerary.append({"day": item["day"], "segments": day_plan["segments"]})
+    if outline and len(failed_days) == len(outline):
+        raise ValueError(f"Failed to generate every day of the trip ({day_results[0]})")
+
+    plan = {
+        "destination": skeleton["destination"],
+        "date": skeleton["date"],
+        "travelers": skeleton["travelers"],
+        "preferences": skeleton["preferences"],
+        "itinerary": itinerary,
+        "costs": skeleton["costs"],
+    }
+    usage = merge_usage([skeleton_usage] + day_usages, round((time.perf_counter() - started) * 1000))
+    usage["mode"] = "fanout"
+    if failed_days:
+        usage["failed_days"] = failed_days
+    return json.dumps(plan, ensure_ascii=False), usage
+
+
+def summarize_itinerary(ai_result, skip_day=None):
+    """다른 날짜의 일정을 'day N: 장소, 장소' 형태의 짧은 문맥으로 요약"""
+    lines = []
+    for item in ai_result.get("itinerary") or []:
+        if item.get("day") == skip_day:
+            continue
+        pois = [seg.get("poi") or seg.get("title", "") for seg in item.get("segments") or []]
+        lines.append(f"day {item.get('day')}: {', '.join(p for p in pois if p)}")
+    return "\n".join(lines)
+
+
+async def regenerate_travel_day(destination, budget, travel_date, preferences, extra,
+                                ai_result, day, feedback=""):
+    """
+    저장된 일정 중 하루만 다시 생성
+
+    Args:
+        ai_result: 저장된 전체 일정 JSON (다른 날짜는 요약 문맥으로만 전달)
+        day: 다시 생성할 날짜 번호
+        feedback: 사용자의 수정 요청 (선택)
+
+    Returns:
+        ({"day": N, "segments": [...]}, 토큰 사용량 dict)
+    """
+    prompt = f"""{build_prompt(destination, budget, travel_date, preferences, extra)}
+currency: {(ai_result.get("costs") or {}).get("currency", "")}
+other days:
+{summarize_itinerary(ai_result, skip_day=day)}
+
+re-plan day: {day}
+feedback: {feedback}
+"""
+    day_plan, usage = await _create_json(REGENERATE_DAY_PROMPT, prompt, "travel_day", DAY_SCHEMA)
+    return {"day": day, "segments": day_plan["segments"]}, usage
+
+
 async def generate_travel_plan(destination, budget, travel_date, preferences, extra):
+    """
+    여행 일정 생성
+
+    FANOUT_MIN_DAYS 이상인 여행은 generate_travel_plan_fanout 으로 분할 생성합니다.
+
+    Returns:
+        (AI 응답 JSON 문자열, 토큰 사용량 dict)
+    """
+    days = count_travel_days(travel_date)
+    if days is not None and days >= FANOUT_MIN_DAYS:
+        return await generate_travel_plan_fanout(destination, budget, travel_date, preferences, extra)
+
     prompt = build_prompt(destination, budget, travel_date, preferences, extra)
 
+    started = time.perf_counter()
     response = await client.responses.create(
-        model="gpt-4o-mini",
+        model=MODEL,
+        instructions=SYSTEM_PROMPT,
         input=prompt,
+        text=json_schema_format("travel_plan", TRAVEL_PLAN_SCHEMA),
         temperature=0.4,
         truncation="auto"
     )
 
-    return response.output_text
+    return response.output_text, extract_usage(response, started)
+
+
+async def continue_travel_plan(destination, budget, travel_date, preferences, extra, partial):
+    """
+    잘린 일정 JSON 의 나머지 부분만 이어서 생성
+
+    전체를 다시 생성하지 않고 잘린 지점 이후만 출력 토큰으로 받습니다.
+
+    Returns:
+        (이어진 문자열, 토큰 사용량 dict)
+    """
+    prompt = f"""{build_prompt(destination, budget, travel_date, preferences, extra)}
+partial JSON:
+{partial}"""
+
+    started = time.perf_counter()
+    response = await client.responses.create(
+        model=MODEL,
+        instructions=CONTINUE_PROMPT,
+        input=prompt,
+        temperature=0,
+        truncation="auto"
+    )
+    return strip_fences(response.output_text), extract_usage(response, started)
+
+
+async def generate_travel_plan_result(destination, budget, travel_date, preferences, extra):
+    """
+    여행 일정 생성 + 로컬 JSON 복구/검증
+
+    1) 응답을 json_repair 로 복구하고 TRAVEL_PLAN_SCHEMA 에 맞춰 보정
+    2) 잘린 응답이라 복구할 수 없을 때만 continue_travel_plan 으로 나머지를 이어 받음
+    3) 그래도 실패하면 잘린 부분까지 복구한 일정, 그것도 없으면 오류 JSON 을 반환
+
+    분할 생성에서 일부 날짜만 실패한 일정은 partial (빈 날짜는 usage["failed_days"]),
+    AI 호출 자체가 실패하면 failed 를 반환합니다.
+
+    Returns:
+        (일정 dict, 토큰 사용량 dict, 복구 상태 문자열)
+        상태: valid / repaired / continued / partial / failed
+    """
+    started = time.perf_counter()
+    try:
+        ai_raw, usage = await generate_travel_plan(destination, budget, travel_date, preferences, extra)
+    except AI_CALL_ERRORS as e:
+        usage = merge_usage([], round((time.perf_counter() - started) * 1000))
+        return {"error": f"AI request failed: {e}"}, usage, "failed"
+    plan, info = parse_plan(ai_raw, TRAVEL_PLAN_SCHEMA, essential=("itinerary",))
+    if plan is not None:
+        return plan, usage, "partial" if usage.get("failed_days") else info["status"]
+
+    fallback = info.get("fallback")
+    error = {"error": "Invalid JSON returned from AI", "raw": ai_raw}
+    if info["status"] == "incomplete":
+        try:
+            continuation, extra_usage = await continue_travel_plan(
+                destination, budget, travel_date, preferences, extra, info["partial"]
+            )
+        except AI_CALL_ERRORS as e:
+            # 이어 받기 호출이 실패해도 잘린 부분까지 복구한 일정은 그대로 돌려줌
+            error = {"error": f"AI request failed: {e}"}
+        else:
+            usage = merge_usage([usage, extra_usage], usage["latency_ms"] + extra_usage["latency_ms"])
+            plan, _ = parse_plan(info["partial"] + continuation, TRAVEL_PLAN_SCHEMA, essential=("itinerary",))
+            if plan is not None:
+                return plan, usage, "continued"
+
+    if fallback is not None:
+        return fallback, usage, "partial"
+    return error, usage, "failed"
@@ -1,13 +1,57 @@
 import os
-import base64
 import json
-from openai import OpenAI
+import asyncio
+from openai import AsyncOpenAI, OpenAI
 from pathlib import Path
 from dotenv import load_dotenv
 
+from .image_preprocess import estimate_peak_bytes, memory_budget, prepare_image
+
 # .env 파일 로드
 load_dotenv()
 
+MODEL = "gpt-4o-mini"
+
+SYSTEM_PROMPT = """당신은 한국의 관광지와 음식 전문가입니다. 
+                        이미지를 분석하여 JSON 형식으로 정보를 제공하세요.
+                        
+                        음식인 경우:
+                        {
+                            "type": "음식",
+                            "음식명": "음식 이름",
+                            "대부분_들어가있는_재료": ["재료1", "재료2", "재료3"],
+                            "음식에_대한_설명": "상세한 설명",
+                            "음식_특징": "특별한 특징이나 맛의 특성"
+                        }
+                        
+                        장소인 경우:
+                        {
+                            "type": "장소",
+                            "장소_이름": "장소 이름",
+                            "장소에_대한_설명": "상세한 설명",
+                            "장소에_대한_특징": "특별한 특징이나 역사적 의미"
+                        }
+                        
+                        반드시 유효한 JSON 형식으로만 답변하세요."""
+
+USER_PROMPT = "이 사진은 한국의 어떤 관광지 또는 어떤 음식인가요? JSON 형식으로 자세히 설명해주세요."
+
+
+def build_messages(image_url, detail=None):
+    """Vision API 요청 메시지 (image_url 은 http URL 또는 data URL)"""
+    image = {"url": image_url}
+    if detail:
+        image["detail"] = detail
+    return [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {
+            "role": "user",
+            "content": [
+                {"type": "text", "text": USER_PROMPT},
+                {"type": "image_url", "image_url": image}
+            ]
+        }
+    ]
 
 
 class KoreanImageAnalyzer:
@@ -25,116 +69,145 @@ class KoreanImageAnalyzer:
             raise ValueError("OPENAI_API_KEY가 필요합니다. 환경 변수로 설정하거나 매개변수로 전달하세요.")
         
         self.client = OpenAI(api_key=self.api_key)
+        self.async_client = AsyncOpenAI(api_key=self.api_key)
     
-    def encode_image(self, image_path):
+    def encode_image(self, image_path, detail=None):
         """
-        이미지를 base64로 인코딩
+        이미지를 전송용으로 축소/재인코딩한 뒤 base64 data URL 로 변환
         
         Args:
-            image_path: 이미지 파일 경로
+            image_path: 이미지 파일 경로 또는 파일 객체
+            detail: low / high / auto (None 이면 IMAGE_DETAIL 설정)
             
         Returns:
-            base64 인코딩된 이미지 문자열
+            image_preprocess.prepare_image 결과 dict (data_url, mime, detail 등)
         """
-        with open(image_path, "rb") as image_file:
-            return base64.b64encode(image_file.read()).decode('utf-8')
+        return prepare_image(image_path, detail)
     
     def analyze_image(self, image_path):
         """
         이미지를 분석하여 한국 관광지 또는 음식 정보 제공
         
         Args:
-            image_path: 분석할 이미지 파일 경로
+            image_path: 분석할 이미지 파일 경로 또는 파일 객체
+                        (업로드된 파일 객체를 넘기면 디스크에서 다시 읽지 않음)
             
         Returns:
             AI의 분석 결과 (dict)
         """
         # 이미지 파일 존재 확인
-        if not Path(image_path).exists():
+        if isinstance(image_path, (str, os.PathLike)) and not Path(image_path).exists():
             return {
                 "error": f"이미지 파일을 찾을 수 없습니다: {image_path}"
             }
         
-        # 이미지 인코딩
-        base64_image = self.encode_image(image_path)
+        # 예상 메모리만큼 예약한 뒤 전처리 + API 호출 (동시 분석 시 워커 메모리 급증 방지)
+        try:
+            estimated = estimate_peak_bytes(image_path)
+        except (OSError, ValueError) as e:
+            return {
+                "success": False,
+                "error": f"이미지를 읽을 수 없습니다: {str(e)}"
+            }
+        with memory_budget.reserve(estimated):
+            return self._analyze_with_budget(image_path)
+    
+    def _analyze_with_budget(self, image_path):
+        """analyze_image 에서 메모리를 예약한 뒤 호출"""
+        # 이미지 축소/재인코딩
+        try:
+            prepared = self.encode_image(image_path)
+        except (OSError, ValueError) as e:
+            return {
+                "success": False,
+                "error": f"이미지를 읽을 수 없습니다: {str(e)}"
+            }
         
         # GPT-4 Vision API 호출
         try:
             response = self.client.chat.completions.create(
-                model="gpt-4o-mini",
-                messages=[
-                    {
-                        "role": "system",
-                        "content": """당신은 한국의 관광지와 음식 전문가입니다. 
-                        이미지를 분석하여 JSON 형식으로 정보를 제공하세요.
-                        
-                        음식인 경우:
-                        {
-                            "type": "음식",
-                            "음식명": "음식 이름",
-                            "대부분_들어가있는_재료": ["재료1", "재료2", "재료3"],
-                            "음식에_대한_설명": "상세한 설명",
-                            "음식_특징": "특별한 특징이나 맛의 특성"
-                        }
-                        
-                        장소인 경우:
-                        {
-                            "type": "장소",
-                            "장소_이름": "장소 이름",
-                            "장소에_대한_설명": "상세한 설명",
-                            "장소에_대한_특징": "특별한 특징이나 역사적 의미"
-                        }
-                        
-                        반드시 유효한 JSON 형식으로만 답변하세요."""
-                    },
-                    {
-                        "role": "user",
-                        "content": [
-                            {
-                                "type": "text",
-                                "text": "이 사진은 한국의 어떤 관광지 또는 어떤 음식인가요? JSON 형식으로 자세히 설명해주세요."
-                            },
-                            {
-                                "type": "image_url",
-                                "image_url": {
-                                    "url": f"data:image/jpeg;base64,{base64_image}"
-                                }
-                            }
-                        ]
-                    }
-                ],
+                model=MODEL,
+                messages=build_messages(prepared["data_url"], prepared["detail"]),
                 max_tokens=1000,
                 response_format={"type": "json_object"}
             )
-            
-            # JSON 파싱
-            analysis_text = response.choices[0].message.content
-            analysis_json = json.loads(analysis_text)
-            
-            result = {
-                "success": True,
-                "data": analysis_json,
-                "model": response.model,
-                "usage": {
-                    "prompt_tokens": response.usage.prompt_tokens,
-                    "completion_tokens": response.usage.completion_tokens,
-                    "total_tokens": response.usage.total_tokens
-                }
+            return self._parse_response(response, prepared)
+        except Exception as e:
+            return {
+                "success": False,
+                "error": f"API 호출 중 오류 발생: {str(e)}"
             }
+    
+    async def analyze_image_async(self, image_path):
+        """
+        analyze_image 의 비동기 버전
+
+        전처리(디코딩/축소/인코딩)는 스레드에서, 메모리 예약 대기와 Vision API 호출은
+        이벤트 루프에서 처리하므로 여러 장을 동시에 분석할 수 있습니다.
+        """
+        if isinstance(image_path, (str, os.PathLike)) and not Path(image_path).exists():
+            return {
+                "error": f"이미지 파일을 찾을 수 없습니다: {image_path}"
+            }
+        
+        try:
+            estimated = await asyncio.to_thread(estimate_peak_bytes, image_path)
+        except (OSError, ValueError) as e:
+            return {
+                "success": False,
+                "error": f"이미지를 읽을 수 없습니다: {str(e)}"
+            }
+        async with memory_budget.reserve_async(estimated):
+            try:
+                prepared = await asyncio.to_thread(self.encode_image, image_path)
+            except (OSError, ValueError) as e:
+                return {
+                    "success": False,
+                    "error": f"이미지를 읽을 수 없습니다: {str(e)}"
+                }
             
-            return result
-            
+            try:
+                response = await self.async_client.chat.completions.create(
+                    model=MODEL,
+                    messages=build_messages(prepared["data_url"], prepared["detail"]),
+                    max_tokens=1000,
+                    response_format={"type": "json_object"}
+                )
+                return self._parse_response(response, prepared)
+            except Exception as e:
+                return {
+                    "success": False,
+                    "error": f"API 호출 중 오류 발생: {str(e)}"
+                }
+    
+    def _parse_response(self, response, prepared=None):
+        """Vision API 응답을 분석 결과 dict 로 변환"""
+        analysis_text = response.choices[0].message.content
+        try:
+            analysis_json = json.loads(analysis_text)
         except json.JSONDecodeError as e:
             return {
                 "success": False,
                 "error": f"JSON 파싱 오류: {str(e)}",
                 "raw_response": analysis_text
             }
-        except Exception as e:
-            return {
-                "success": False,
-                "error": f"API 호출 중 오류 발생: {str(e)}"
+        
+        result = {
+            "success": True,
+            "data": analysis_json,
+            "model": response.model,
+            "usage": {
+                "prompt_tokens": response.usage.prompt_tokens,
+                "completion_tokens": response.usage.completion_tokens,
+                "total_tokens": response.usage.total_tokens
+            }
+        }
+        if prepared is not None:
+            result["image"] = {
+                key: prepared[key]
+                for key in ("mime", "detail", "width", "height", "original_bytes", "bytes", "peak_bytes")
             }
+        return result
     
     def analyze_image_url(self, image_url):
         """
@@ -148,75 +221,28 @@ class KoreanImageAnalyzer:
         """
         try:
             response = self.client.chat.completions.create(
-                model="gpt-4o-mini",
-                messages=[
-                    {
-                        "role": "system",
-                        "content": """당신은 한국의 관광지와 음식 전문가입니다. 
-                        이미지를 분석하여 JSON 형식으로 정보를 제공하세요.
-                        
-                        음식인 경우:
-                        {
-                            "type": "음식",
-                            "음식명": "음식 이름",
-                            "대부분_들어가있는_재료": ["재료1", "재료2", "재료3"],
-                            "음식에_대한_설명": "상세한 설명",
-                            "음식_특징": "특별한 특징이나 맛의 특성"
-                        }
-                        
-                        장소인 경우:
-                        {
-                            "type": "장소",
-                            "장소_이름": "장소 이름",
-                            "장소에_대한_설명": "상세한 설명",
-                            "장소에_대한_특징": "특별한 특징이나 역사적 의미"
-                        }
-                        
-                        반드시 유효한 JSON 형식으로만 답변하세요."""
-                    },
-                    {
-                        "role": "user",
-                        "content": [
-                            {
-                                "type": "text",
-                                "text": "이 사진은 한국의 어떤 관광지 또는 어떤 음식인가요? JSON 형식으로 자세히 설명해주세요."
-                            },
-                            {
-                                "type": "image_url",
-                                "image_url": {
-                                    "url": image_url
-                                }
-                            }
-                        ]
-                    }
-                ],
+                model=MODEL,
+                messages=build_messages(image_url),
                 max_tokens=1000,
                 response_format={"type": "json_object"}
             )
-            
-            # JSON 파싱
-            analysis_text = response.choices[0].message.content
-            analysis_json = json.loads(analysis_text)
-            
-            result = {
-                "success": True,
-                "data": analysis_json,
-                "model": response.model,
-                "usage": {
-                    "prompt_tokens": response.usage.prompt_tokens,
-                    "completion_tokens": response.usage.completion_tokens,
-                    "total_tokens": response.usage.total_tokens
-                }
-            }
-            
-            return result
-            
-        except json.JSONDecodeError as e:
+            return self._parse_response(response)
+        except Exception as e:
             return {
                 "success": False,
-                "error": f"JSON 파싱 오류: {str(e)}",
-                "raw_response": analysis_text
+                "error": f"API 호출 중 오류 발생: {str(e)}"
             }
+    
+    async def analyze_image_url_async(self, image_url):
+        """analyze_image_url 의 비동기 버전"""
+        try:
+            response = await self.async_client.chat.completions.create(
+                model=MODEL,
+                messages=build_messages(image_url),
+                max_tokens=1000,
+                response_format={"type": "json_object"}
+            )
+            return self._parse_response(response)
         except Exception as e:
             return {
                 "success": False,
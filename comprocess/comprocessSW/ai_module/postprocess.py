@@ -0,0 +1,163 @@
+"""
+여행 일정 후처리
+
+AI 가 생성한 일정 JSON 을 로컬에서 보정합니다.
+- 동선: 지명 사전 좌표로 하루 segments 순서를 재배치 (route_optimizer)
+- 비용: segments 의 cost_local 합계를 구하고 여행 월의 환율(ExchangeRatePredictor)로 원화 환산
+"""
+import threading
+import time
+from collections import OrderedDict
+from datetime import date
+
+from .exchange_rate_predictor import ExchangeRatePredictor
+from .kjy import parse_travel_dates
+from .route_optimizer import optimize_itinerary
+
+# 통화 코드 → (환율 예측기 국가, 예측기 환율 단위, base_data 컬럼)
+PREDICTOR_CURRENCIES = {
+    "USD": ("미국", 1, "USD"),
+    "JPY": ("일본", 100, "JPY100"),
+}
+
+CURRENCY_ALIASES = {
+    "원": "KRW", "₩": "KRW", "won": "KRW",
+    "달러": "USD", "$": "USD", "us$": "USD", "dollar": "USD",
+    "엔": "JPY", "¥": "JPY", "円": "JPY", "yen": "JPY",
+}
+
+# 환율 예측기 로드에 실패한 뒤 다시 시도하기까지 기다리는 시간 (초)
+PREDICTOR_RETRY_SECONDS = 300
+RATE_CACHE_SIZE = 256
+
+_predictor = None
+_predictor_failed_at = None
+_predictor_lock = threading.Lock()
+
+# (통화, 연, 월) → 환율 (성공한 값만 저장)
+_rates = OrderedDict()
+_rates_lock = threading.Lock()
+
+
+def get_predictor():
+    """
+    환율 예측기 (모델 로드 비용이 커서 프로세스당 한 번만 생성)
+
+    서버 시작 시 preload_predictor 로 미리 로드합니다.
+    로드에 실패하면 PREDICTOR_RETRY_SECONDS 동안은 다시 시도하지 않고 RuntimeError
+    """
+    global _predictor, _predictor_failed_at
+    if _predictor is None:
+        with _predictor_lock:
+            if _predictor is None:
+                if _predictor_failed_at is not None and \
+                        time.monotonic() - _predictor_failed_at < PREDICTOR_RETRY_SECONDS:
+                    raise RuntimeError("환율 예측기를 사용할 수 없습니다.")
+                try:
+                    _predictor = ExchangeRatePredictor()
+                except Exception:
+                    _predictor_failed_at = time.monotonic()
+                    raise
+                _predictor_failed_at = None
+    return _predictor
+
+
+def preload_predictor():
+    """첫 요청이 모델 로드를 기다리지 않도록 백그라운드 스레드에서 미리 로드 (asgi.py / wsgi.py)"""
+    from comprocessSW import background
+    background.submit(get_predictor)
+
+
+def normalize_currency(currency):
+    text = (currency or "").strip()
+    return CURRENCY_ALIASES.get(text.lower(), text.upper())
+
+
+def krw_rate(currency, year, month):
+    """
+    해당 월의 1 통화 단위당 원화 환율
+
+    예측 범위를 벗어난 달은 가장 최근 실제 환율을 사용합니다.
+    지원하지 않는 통화이거나 예측기를 사용할 수 없으면 None
+    (None 은 캐시하지 않으므로 예측기가 다시 사용 가능해지면 다음 요청부터 환산됨)
+    """
+    if currency == "KRW":
+        return 1.0
+    if currency not in PREDICTOR_CURRENCIES:
+        return None
+
+    key = (currency, year, month)
+    with _rates_lock:
+        if key in _rates:
+            _rates.move_to_end(key)
+            return _rates[key]
+
+    country, unit, column = PREDICTOR_CURRENCIES[currency]
+    try:
+        predictor = get_predictor()
+    except Exception:
+        return None
+
+    result = predictor.predict_exchange_rate(year, month, country)
+    if result.get("success"):
+        rate = result["predicted_rate"]
+    else:
+        rate = float(predictor.base_data[column].iloc[-1])
+    rate /= unit
+
+    with _rates_lock:
+        _rates[key] = rate
+        while len(_rates) > RATE_CACHE_SIZE:
+            _rates.popitem(last=False)
+    return rate
+
+
+def _amount(value):
+    try:
+        return float(value or 0)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def apply_local_costs(ai_result, travel_date):
+    """costs.total_local / total_krw 를 segments 기준으로 계산"""
+    total_local = sum(
+        _amount(segment.get("cost_local"))
+        for day in ai_result.get("itinerary") or []
+        for segment in day.get("segments") or []
+    )
+
+    costs = ai_result.get("costs") if isinstance(ai_result.get("costs"), dict) else {}
+    currency = normalize_currency(costs.get("currency"))
+    dates = parse_travel_dates(travel_date)
+    month = dates[0] if dates else date.today()
+    rate = krw_rate(currency, month.year, month.month) if currency else None
+
+    costs.update({
+        "currency": currency,
+        "total_local": round(total_local, 2),
+        "total_krw": round(total_local * rate) if rate is not None else None,
+        "krw_rate": round(rate, 4) if rate is not None else None,
+    })
+    ai_result["costs"] = costs
+    return ai_result
+
+
+def postprocess_travel_plan(ai_result, travel_date, days=None):
+    """
+    AI 일정 후처리 파이프라인
+
+    Args:
+        ai_result: 파싱된 일정 JSON (오류 결과는 그대로 반환)
+        travel_date: 사용자 입력 여행 날짜
+        days: 동선을 다시 최적화할 날짜 번호 목록 (None 이면 전체, 비용은 항상 전체 재계산)
+
+    Returns:
+        보정된 ai_result (같은 객체를 수정)
+    """
+    if not isinstance(ai_result, dict) or "error" in ai_result:
+        return ai_result
+    if not isinstance(ai_result.get("itinerary"), list):
+        return ai_result
+    optimize_itinerary(ai_result, days=days)
+    return apply_local_costs(ai_result, travel_date)
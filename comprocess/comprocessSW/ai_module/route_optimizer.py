@@ -0,0 +1,230 @@
+"""
+여행 일정 동선 최적화
+
+segments 의 poi 이름을 로컬 지명 사전(data/gazetteer.csv)에서 좌표로 찾고,
+하루 동선의 총 이동 거리가 짧아지도록 segments 순서를 2-opt 로 재배치합니다.
+
+- 시간대(time)는 원래 자리에 그대로 두고, 그 자리에 들어갈 장소만 바꿉니다.
+- 길이가 같은 시간대끼리만 장소를 바꾸므로 각 일정의 duration_min 은 그대로 유지됩니다.
+- 예약이 필요한 일정(booking_needed), 식사 일정, 좌표나 시간대를 모르는 일정은 원래 자리에 고정합니다.
+- 순서가 바뀐 날은 transport 를 이동 거리 기준으로 다시 계산합니다.
+"""
+import csv
+import re
+from functools import lru_cache
+from pathlib import Path
+
+import numpy as np
+
+GAZETTEER_PATH = Path(__file__).parent / "data" / "gazetteer.csv"
+EARTH_RADIUS_KM = 6371.0
+
+# (최대 거리 km, 한국어, 영어, 속도 km/h, 추가 대기 시간 분)
+TRANSPORT_MODES = [
+    (1.2, "도보", "walk", 4.5, 0),
+    (12.0, "대중교통", "public transit", 20.0, 8),
+    (float("inf"), "택시/차량", "taxi/car", 35.0, 5),
+]
+
+TIME_WINDOW = re.compile(r"(\d{1,2}):(\d{2})\s*[-~]\s*(\d{1,2}):(\d{2})")
+HANGUL = re.compile(r"[가-힣]")
+NAME_SEPARATORS = re.compile(r"[\s\-_.,'·&/]+")
+MEAL = re.compile(r"아침|점심|저녁|조식|중식|석식|브런치|식사|breakfast|brunch|lunch|dinner", re.IGNORECASE)
+
+
+def name_tokens(name):
+    """괄호 내용을 제거하고 공백/구두점으로 나눈 소문자 토큰 목록"""
+    text = re.sub(r"\(.*?\)", "", (name or "").lower())
+    return [token for token in NAME_SEPARATORS.split(text) if token]
+
+
+def normalize_name(name):
+    """괄호 내용, 공백, 구두점을 제거한 소문자 이름"""
+    return "".join(name_tokens(name))
+
+
+@lru_cache(maxsize=1)
+def load_gazetteer():
+    """
+    Returns:
+        이름 → (위도, 경도) dict
+    """
+    places = {}
+    with open(GAZETTEER_PATH, encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            coords = (float(row["lat"]), float(row["lon"]))
+            for name in [row["name"]] + row["aliases"].split("|"):
+                key = normalize_name(name)
+                if key:
+                    places.setdefault(key, coords)
+    return places
+
+
+def lookup_coords(poi):
+    """poi 이름의 좌표 (사전에 없으면 None)"""
+    tokens = name_tokens(poi)
+    if not tokens:
+        return None
+    places = load_gazetteer()
+    # "경복궁 근정전", "해운대 해수욕장 산책" 처럼 사전 이름을 포함하는 경우도 찾되,
+    # "Studio" 안의 "udo", "송정역" 안의 "송정" 같은 단어 일부는 일치로 보지 않도록
+    # 연속한 토큰 묶음 단위로 긴 것부터 비교
+    for size in range(len(tokens), 0, -1):
+        for start in range(len(tokens) - size + 1):
+            key = "".join(tokens[start:start + size])
+            if key in places:
+                return places[key]
+    return None
+
+
+def haversine_matrix(coords):
+    """(n, 2) 위도/경도 배열의 거리 행렬 (km)"""
+    radians = np.radians(np.asarray(coords, dtype=np.float64))
+    lat = radians[:, 0:1]
+    lon = radians[:, 1:2]
+    a = (
+        np.sin((lat - lat.T) / 2) ** 2
+        + np.cos(lat) * np.cos(lat.T) * np.sin((lon - lon.T) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def _route_length(order, located, dist):
+    """slot 순서대로 좌표가 있는 장소 사이의 이동 거리 합"""
+    total = 0.0
+    previous = None
+    for segment_index in order:
+        node = located.get(segment_index)
+        if node is None:
+            continue
+        if previous is not None:
+            total += dist[previous, node]
+        previous = node
+    return total
+
+
+def _two_opt(order, movable_slots, located, dist):
+    """이동 가능한 slot 들 사이에서 구간 뒤집기(2-opt)로 총 거리 개선"""
+    best = list(order)
+    best_length = _route_length(best, located, dist)
+    improved = True
+    while improved:
+        improved = False
+        for i in range(len(movable_slots) - 1):
+            for j in range(i + 1, len(movable_slots)):
+                candidate = list(best)
+                picked = [best[s] for s in movable_slots[i:j + 1]]
+                for slot, segment_index in zip(movable_slots[i:j + 1], reversed(picked)):
+                    candidate[slot] = segment_index
+                length = _route_length(candidate, located, dist)
+                if length < best_length - 1e-9:
+                    best, best_length = candidate, length
+                    improved = True
+    return best, best_length
+
+
+def _window_minutes(time_text):
+    match = TIME_WINDOW.search(time_text or "")
+    if not match:
+        return None
+    h1, m1, h2, m2 = (int(g) for g in match.groups())
+    minutes = (h2 * 60 + m2) - (h1 * 60 + m1)
+    return minutes if minutes > 0 else None
+
+
+def _transport(distance_km, korean):
+    for max_km, ko, en, speed, wait in TRANSPORT_MODES:
+        if distance_km <= max_km:
+            minutes = round(distance_km / speed * 60 + wait)
+            return f"{ko} (약 {minutes}분)" if korean else f"{en} (~{minutes} min)"
+
+
+def optimize_day(day):
+    """
+    하루 일정의 segments 순서 최적화 (day dict 를 직접 수정)
+
+    Returns:
+        (최적화 전 거리 km, 최적화 후 거리 km). 최적화 대상이 아니면 None
+    """
+    segments = day.get("segments")
+    if not isinstance(segments, list) or len(segments) < 3:
+        return None
+
+    coords = []
+    located = {}
+    # 시간대 길이(분) → 이동 가능한 slot 목록 (길이가 같은 slot 끼리만 교환)
+    movable_groups = {}
+    for index, segment in enumerate(segments):
+        point = lookup_coords(segment.get("poi") or segment.get("title"))
+        if point is None:
+            continue
+        located[index] = len(coords)
+        coords.append(point)
+        label = f"{segment.get('title', '')} {segment.get('poi', '')}"
+        minutes = _window_minutes(segment.get("time"))
+        if minutes is not None and not segment.get("booking_needed") and not MEAL.search(label):
+            movable_groups.setdefault(minutes, []).append(index)
+
+    movable_groups = [slots for slots in movable_groups.values() if len(slots) >= 2]
+    if not movable_groups or len(coords) < 3:
+        return None
+
+    dist = haversine_matrix(coords)
+    original = list(range(len(segments)))
+    before = _route_length(original, located, dist)
+    order, after = original, before
+    improved = True
+    while improved:
+        improved = False
+        for movable_slots in movable_groups:
+            candidate, length = _two_opt(order, movable_slots, located, dist)
+            if length < after - 1e-9:
+                order, after = candidate, length
+                improved = True
+    if order == original:
+        return before, before
+
+    slot_times = [segment.get("time") for segment in segments]
+    korean = any(HANGUL.search(str(segment.get("transport", ""))) for segment in segments)
+
+    reordered = []
+    for slot, segment_index in enumerate(order):
+        segment = dict(segments[segment_index])
+        segment["time"] = slot_times[slot]
+        reordered.append(segment)
+
+    # 이동 수단은 직전 좌표가 있는 장소와의 거리로 다시 계산.
+    # 첫 번째로 좌표가 있는 slot 은 비교할 직전 장소가 없으므로 그 slot 에 원래 있던 값을 사용
+    previous = None
+    for slot, (segment_index, segment) in enumerate(zip(order, reordered)):
+        node = located.get(segment_index)
+        if node is None:
+            continue
+        if previous is None:
+            segment["transport"] = segments[slot].get("transport", "")
+        else:
+            segment["transport"] = _transport(dist[previous, node], korean)
+        previous = node
+
+    day["segments"] = reordered
+    return before, after
+
+
+def optimize_itinerary(ai_result, days=None):
+    """
+    일정 전체(또는 지정한 날짜들)의 동선 최적화
+
+    Args:
+        days: 최적화할 날짜 번호 목록 (None 이면 전체)
+
+    Returns:
+        {날짜 번호: (최적화 전 km, 최적화 후 km)}
+    """
+    report = {}
+    for day in ai_result.get("itinerary") or []:
+        if not isinstance(day, dict) or (days is not None and day.get("day") not in days):
+            continue
+        result = optimize_day(day)
+        if result is not None:
+            report[day.get("day")] = result
+    return report
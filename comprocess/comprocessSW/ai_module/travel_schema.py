@@ -0,0 +1,128 @@
+"""
+여행 일정 JSON 스키마
+
+OpenAI Structured Outputs(strict 모드)에 그대로 전달되는 스키마입니다.
+strict 모드에서는 모든 객체가 additionalProperties=False 이고
+모든 속성이 required 에 포함되어야 합니다.
+"""
+
+SEGMENT_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "time": {"type": "string", "description": "HH:MM-HH:MM"},
+        "title": {"type": "string"},
+        "poi": {"type": "string"},
+        "duration_min": {"type": "integer"},
+        "transport": {"type": "string"},
+        "cost_local": {"type": "number"},
+        "booking_needed": {"type": "boolean"},
+    },
+    "required": ["time", "title", "poi", "duration_min", "transport", "cost_local", "booking_needed"],
+    "additionalProperties": False,
+}
+
+DAY_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "day": {"type": "integer"},
+        "segments": {"type": "array", "items": SEGMENT_SCHEMA},
+    },
+    "required": ["day", "segments"],
+    "additionalProperties": False,
+}
+
+TRAVEL_PLAN_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "destination": {"type": "string"},
+        "date": {
+            "type": "object",
+            "properties": {
+                "start": {"type": "string"},
+                "end": {"type": "string"},
+                "days": {"type": "integer"},
+            },
+            "required": ["start", "end", "days"],
+            "additionalProperties": False,
+        },
+        "travelers": {
+            "type": "object",
+            "properties": {
+                "count": {"type": "integer"},
+                "profile": {"type": "string"},
+            },
+            "required": ["count", "profile"],
+            "additionalProperties": False,
+        },
+        "preferences": {
+            "type": "object",
+            "properties": {
+                "themes": {"type": "array", "items": {"type": "string"}},
+                "pace": {"type": "string"},
+                "diet": {
+                    "type": "object",
+                    "properties": {
+                        "allergies": {"type": "array", "items": {"type": "string"}},
+                        "restrictions": {"type": "array", "items": {"type": "string"}},
+                    },
+                    "required": ["allergies", "restrictions"],
+                    "additionalProperties": False,
+                },
+            },
+            "required": ["themes", "pace", "diet"],
+            "additionalProperties": False,
+        },
+        "itinerary": {"type": "array", "items": DAY_SCHEMA},
+        # 합계와 원화 환산은 서버에서 계산 (ai_module.postprocess)
+        "costs": {
+            "type": "object",
+            "properties": {
+                "currency": {"type": "string", "description": "ISO 4217 code of cost_local (e.g. KRW, USD, JPY)"},
+            },
+            "required": ["currency"],
+            "additionalProperties": False,
+        },
+    },
+    "required": ["destination", "date", "travelers", "preferences", "itinerary", "costs"],
+    "additionalProperties": False,
+}
+
+# 장기 여행 분할 생성(fan-out)용 골격 스키마: 날짜별 테마와 대표 장소만 포함
+SKELETON_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "destination": TRAVEL_PLAN_SCHEMA["properties"]["destination"],
+        "date": TRAVEL_PLAN_SCHEMA["properties"]["date"],
+        "travelers": TRAVEL_PLAN_SCHEMA["properties"]["travelers"],
+        "preferences": TRAVEL_PLAN_SCHEMA["properties"]["preferences"],
+        "outline": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "day": {"type": "integer"},
+                    "date": {"type": "string"},
+                    "theme": {"type": "string"},
+                    "anchor_poi": {"type": "string"},
+                },
+                "required": ["day", "date", "theme", "anchor_poi"],
+                "additionalProperties": False,
+            },
+        },
+        "costs": TRAVEL_PLAN_SCHEMA["properties"]["costs"],
+    },
+    "required": ["destination", "date", "travelers", "preferences", "outline", "costs"],
+    "additionalProperties": False,
+}
+
+
+def json_schema_format(name, schema):
+    """Responses API 의 text.format 파라미터 생성"""
+    return {
+        "format": {
+            "type": "json_schema",
+            "name": name,
+            "schema": schema,
+            "strict": True,
+        }
+    }
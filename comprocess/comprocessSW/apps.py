@@ -1,6 +1,14 @@
 from django.apps import AppConfig
+from django.conf import settings
+from PIL import Image
 
 
 class ComprocessswConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'comprocessSW'
+
+    def ready(self):
+        from . import signals  # noqa: F401
+
+        # 업로드 검사를 거치지 않고 여는 이미지(기존 파일, 관리 명령)도 같은 픽셀 제한 적용
+        Image.MAX_IMAGE_PIXELS = settings.IMAGE_MAX_PIXELS
@@ -0,0 +1,51 @@
+"""
+비동기 APIView
+
+DRF APIView 는 동기 dispatch 만 지원하므로, ASGI(uvicorn)에서 핸들러를 코루틴으로
+실행할 수 있도록 dispatch 를 비동기로 바꾼 기반 클래스입니다.
+
+- 인증/권한/스로틀 검사(initial)는 DB 를 쓸 수 있으므로 sync_to_async 로 실행
+- 핸들러(get/post 등)는 async def 로 작성하고, DB 작업은 sync_to_async,
+  파일 I/O 나 이미지 처리처럼 오래 걸리는 동기 작업은 asyncio.to_thread 로 실행
+- Django 는 한 View 의 핸들러가 모두 async 여야 하므로 options 도 async 로 재정의
+"""
+from asgiref.sync import sync_to_async
+from rest_framework.views import APIView
+
+
+class AsyncAPIView(APIView):
+
+    async def dispatch(self, request, *args, **kwargs):
+        self.args = args
+        self.kwargs = kwargs
+        request = self.initialize_request(request, *args, **kwargs)
+        self.request = request
+        self.headers = self.default_response_headers
+
+        try:
+            await sync_to_async(self.initial)(request, *args, **kwargs)
+
+            if request.method.lower() in self.http_method_names:
+                handler = getattr(self, request.method.lower(), self.http_method_not_allowed)
+            else:
+                handler = self.http_method_not_allowed
+
+            response = handler(request, *args, **kwargs)
+            if hasattr(response, "__await__"):
+                response = await response
+
+        except Exception as exc:
+            response = self.handle_exception(exc)
+
+        self.response = self.finalize_response(request, response, *args, **kwargs)
+        return self.response
+
+    async def options(self, request, *args, **kwargs):
+        return super().options(request, *args, **kwargs)
+
+
+async def request_data(request):
+    """
+    request.data (멀티파트 파싱은 업로드 파일을 읽고 쓰므로 스레드에서 실행)
+    """
+    return await sync_to_async(lambda: request.data, thread_sensitive=False)()
@@ -1,11 +1,153 @@
+"""
+JWT 토큰 발급과 인증
+
+JWTAuthentication 은 요청마다 토큰의 user_id 로 User 를 조회합니다.
+CachedJWTAuthentication 은 조회한 사용자를 두 단계로 캐시해 대부분의 요청에서 DB 조회를 없앱니다.
+
+- 프로세스 메모리 LRU (AUTH_USER_CACHE_SIZE 개, AUTH_USER_CACHE_SECONDS 동안)
+- Django 캐시 (AUTH_USER_SHARED_CACHE_SECONDS 동안, 여러 워커가 공유)
+
+비밀번호 해시는 캐시하지 않고, 토큰 폐기 검사(CHECK_REVOKE_TOKEN)에 쓰는 md5 값만 캐시합니다.
+캐시에서 만든 User 는 password 가 지연 로딩 필드이므로 읽으면 DB 에서 다시 조회하고,
+save() 해도 password 는 덮어쓰지 않습니다.
+
+사용자가 저장/삭제되면 signals.py 에서 invalidate_user 로 두 캐시를 지웁니다.
+다른 워커의 메모리 캐시는 지울 수 없으므로, 계정 삭제/비활성화가 다른 워커에 반영되기까지
+최대 AUTH_USER_CACHE_SECONDS 가 걸립니다. (QuerySet.update() 로 바꾼 경우에는 직접 invalidate_user 호출)
+
+ClaimsJWTAuthentication 은 토큰에 담긴 username/created_at/updated_at 으로 만든 TokenUser 를 돌려주므로
+user/me/ 처럼 토큰 주인 정보만 읽는 API 는 DB 를 전혀 조회하지 않습니다.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.translation import gettext_lazy as _
+from rest_framework.fields import DateTimeField
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.models import TokenUser
+from rest_framework_simplejwt.settings import api_settings
 from rest_framework_simplejwt.tokens import RefreshToken
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
 from .models import User
 
+# 캐시 값 형식이 바뀌면 이전 형식을 읽지 않도록 버전을 올림
+CACHE_PREFIX = "auth_user:v2:"
+# 캐시하지 않는 필드
+UNCACHED_FIELDS = ("password",)
+# 토큰에 담는 사용자 정보 (ClaimsJWTAuthentication 에서 사용)
+USER_CLAIMS = ("username", "created_at", "updated_at")
+
+_users = OrderedDict()
+_users_lock = threading.Lock()
+
+
 def get_tokens_for_user(user):
-    """사용자를 위한 JWT 토큰 생성"""
+    """사용자를 위한 JWT 토큰 생성 (user/me/ 응답에 필요한 정보를 클레임으로 포함)"""
     refresh = RefreshToken.for_user(user)
-    
+    # UserDetailSerializer 와 같은 형식의 날짜 문자열
+    refresh["username"] = user.username
+    refresh["created_at"] = DateTimeField().to_representation(user.created_at)
+    refresh["updated_at"] = DateTimeField().to_representation(user.updated_at)
+
     return {
         'refresh': str(refresh),
         'access': str(refresh.access_token),
     }
+
+
+def _entry(user):
+    """캐시에 넣을 값: (password 를 뺀 필드 값, 토큰 폐기 검사용 비밀번호 md5)"""
+    fields = {
+        field.attname: getattr(user, field.attname)
+        for field in User._meta.concrete_fields
+        if field.attname not in UNCACHED_FIELDS
+    }
+    return fields, get_md5_hash_password(user.password)
+
+
+def _from_entry(entry):
+    """캐시 값 → User (요청마다 새 인스턴스, 다른 요청과 공유하지 않음)"""
+    fields, password_md5 = entry
+    # from_db 는 빠진 필드(password)를 지연 로딩 필드로 둠
+    user = User.from_db("default", list(fields), list(fields.values()))
+    user.password_md5 = password_md5
+    return user
+
+
+def invalidate_user(user_id):
+    """사용자 정보가 바뀌었을 때 캐시 삭제 (이 프로세스의 메모리 캐시 + 공유 캐시)"""
+    with _users_lock:
+        _users.pop(user_id, None)
+    cache.delete(f"{CACHE_PREFIX}{user_id}")
+
+
+def get_cached_user(user_id):
+    """
+    메모리 LRU → Django 캐시 → DB 순으로 사용자 조회
+
+    Returns:
+        User (password_md5 속성에 비밀번호 md5) 또는 None (없는 사용자)
+    """
+    now = time.monotonic()
+    with _users_lock:
+        cached = _users.get(user_id)
+        if cached is not None and cached[0] > now:
+            _users.move_to_end(user_id)
+            return _from_entry(cached[1])
+
+    key = f"{CACHE_PREFIX}{user_id}"
+    entry = cache.get(key)
+    if entry is None:
+        user = User.objects.filter(pk=user_id).first()
+        if user is None:
+            return None
+        entry = _entry(user)
+        cache.set(key, entry, settings.AUTH_USER_SHARED_CACHE_SECONDS)
+
+    with _users_lock:
+        _users[user_id] = (now + settings.AUTH_USER_CACHE_SECONDS, entry)
+        _users.move_to_end(user_id)
+        while len(_users) > settings.AUTH_USER_CACHE_SIZE:
+            _users.popitem(last=False)
+    return _from_entry(entry)
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """JWTAuthentication 과 같은 검사를 하되 사용자 조회를 캐시 (REST_FRAMEWORK 기본 인증)"""
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_("Token contained no recognizable user identification"))
+
+        user = get_cached_user(user_id)
+        if user is None:
+            raise AuthenticationFailed(_("User not found"), code="user_not_found")
+        if not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+        if api_settings.CHECK_REVOKE_TOKEN:
+            if validated_token.get(api_settings.REVOKE_TOKEN_CLAIM) != user.password_md5:
+                raise AuthenticationFailed(_("The user's password has been changed."), code="password_changed")
+        return user
+
+
+class ClaimsJWTAuthentication(CachedJWTAuthentication):
+    """
+    토큰 클레임만으로 만든 TokenUser (DB/캐시 조회 없음)
+
+    토큰이 유효한 동안은 삭제/비활성화된 계정도 통과하므로 읽기 전용 API 에만 사용합니다.
+    사용자 정보 클레임이 없는 예전 토큰은 CachedJWTAuthentication 과 같이 처리합니다.
+    """
+
+    def get_user(self, validated_token):
+        if api_settings.USER_ID_CLAIM in validated_token and all(
+            claim in validated_token for claim in USER_CLAIMS
+        ):
+            return TokenUser(validated_token)
+        return super().get_user(validated_token)
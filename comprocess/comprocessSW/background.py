@@ -0,0 +1,50 @@
+"""
+요청 처리와 분리된 백그라운드 작업 (프로세스 내 스레드 풀)
+
+썸네일 생성처럼 응답에 필요 없는 후처리를 요청 스레드에서 떼어 내기 위한 것으로,
+작업 큐 서버 없이 각 워커 프로세스의 스레드 풀(BACKGROUND_WORKERS)에서 실행합니다.
+프로세스가 재시작되면 대기 중인 작업은 사라지므로, 작업은 다시 실행해도 안전해야 하고
+누락분은 관리 명령으로 채울 수 있어야 합니다. (예: manage.py generate_image_variants)
+"""
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connections, transaction
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_lock = threading.Lock()
+
+
+def get_executor():
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.BACKGROUND_WORKERS,
+                thread_name_prefix="comprocess-bg"
+            )
+        return _executor
+
+
+def _run(fn, args, kwargs):
+    try:
+        return fn(*args, **kwargs)
+    except Exception:
+        logger.exception("백그라운드 작업 실패: %s", getattr(fn, "__name__", fn))
+    finally:
+        # 워커 스레드마다 열린 DB 연결 정리
+        connections.close_all()
+
+
+def submit(fn, *args, **kwargs):
+    """스레드 풀에서 fn 실행 (예외는 로그만 남김)"""
+    return get_executor().submit(_run, fn, args, kwargs)
+
+
+def submit_on_commit(fn, *args, **kwargs):
+    """현재 트랜잭션이 커밋된 뒤 실행 (작업이 아직 커밋되지 않은 행을 읽지 않도록)"""
+    transaction.on_commit(lambda: submit(fn, *args, **kwargs))
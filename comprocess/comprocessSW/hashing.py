@@ -0,0 +1,128 @@
+"""
+비밀번호 해시 전용 스레드 풀
+
+PBKDF2(기본 100만 회 반복)는 한 번에 CPU 코어 하나를 수십~수백 ms 동안 사용하므로
+로그인이 몰리면 요청 스레드/이벤트 루프가 막혀 다른 API 까지 느려집니다.
+인증 API(views.py 의 로그인/회원가입/계정 수정/삭제)는 해시 계산을 이 풀에서 실행합니다.
+
+- 스레드 수(PASSWORD_HASH_WORKERS)로 해시에 쓰는 코어 수를 제한
+  (hashlib.pbkdf2_hmac, argon2 는 계산 중 GIL 을 풀어 스레드로 병렬 실행됨)
+- 실행 중 + 대기 중인 작업이 PASSWORD_HASH_WORKERS + PASSWORD_HASH_QUEUE 개를 넘으면 기다리지 않고
+  바로 503 (Retry-After) 응답 (PASSWORD_HASH_WORKERS=0 이면 모든 해시 요청을 503 으로 거부)
+- 로그인할 때 저장된 해시의 알고리즘/반복 횟수가 현재 설정과 다르면 새 설정으로 다시 해시해 저장
+
+해시 알고리즘(PASSWORD_HASHERS)과 반복 횟수(PASSWORD_PBKDF2_ITERATIONS)는
+manage.py benchmark_hashers 로 서버에서 1회 계산 시간을 확인한 뒤 정합니다.
+"""
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import hashers
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+from . import metrics
+
+HASH_MS_EDGES = [10, 50, 100, 250, 500, 1000, 2000]
+
+_executor = None
+_lock = threading.Lock()
+_pending = 0
+
+
+class PBKDF2PasswordHasher(hashers.PBKDF2PasswordHasher):
+    """반복 횟수를 PASSWORD_PBKDF2_ITERATIONS 로 정하는 PBKDF2 (0 이면 Django 기본값)"""
+
+    @property
+    def iterations(self):
+        return settings.PASSWORD_PBKDF2_ITERATIONS or hashers.PBKDF2PasswordHasher.iterations
+
+
+class HashingBusy(APIException):
+    """해시 풀이 가득 참 (Retry-After 헤더와 함께 503 응답)"""
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = "요청이 많아 처리할 수 없습니다. 잠시 후 다시 시도해 주세요."
+    default_code = "hashing_busy"
+
+    def __init__(self):
+        super().__init__()
+        # DRF 예외 처리기가 wait 를 Retry-After 헤더로 보냄
+        self.wait = settings.PASSWORD_HASH_RETRY_AFTER
+
+
+def get_executor():
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.PASSWORD_HASH_WORKERS,
+                thread_name_prefix="comprocess-hash"
+            )
+        return _executor
+
+
+def _release(future):
+    global _pending
+    with _lock:
+        _pending -= 1
+
+
+async def run(fn, *args):
+    """
+    해시 풀에서 fn 실행 (대기열까지 가득 차 있으면 HashingBusy)
+    """
+    global _pending
+    with _lock:
+        # 스레드가 0 개면 풀을 만들 수 없으므로 항상 거부
+        if (
+            settings.PASSWORD_HASH_WORKERS <= 0
+            or _pending >= settings.PASSWORD_HASH_WORKERS + settings.PASSWORD_HASH_QUEUE
+        ):
+            metrics.incr("password_hash:rejected")
+            raise HashingBusy()
+        _pending += 1
+    executor = get_executor()
+    started = time.perf_counter()
+    future = executor.submit(fn, *args)
+    future.add_done_callback(_release)
+    try:
+        return await asyncio.wrap_future(future)
+    finally:
+        # 대기 시간 포함
+        metrics.observe("password_hash:ms", (time.perf_counter() - started) * 1000, HASH_MS_EDGES)
+
+
+async def make_password(raw_password):
+    """현재 기본 해시 알고리즘으로 해시"""
+    return await run(hashers.make_password, raw_password)
+
+
+async def check_password(user, raw_password):
+    """
+    비밀번호 확인 (맞으면서 해시 설정이 바뀌었으면 다시 해시해 저장)
+
+    Returns:
+        비밀번호가 맞는지
+    """
+    valid, must_update = await run(hashers.verify_password, raw_password, user.password)
+    if valid and must_update:
+        user.password = await make_password(raw_password)
+        await sync_to_async(user.save)(update_fields=["password"])
+        metrics.incr("password_hash:upgraded")
+    return valid
+
+
+def stats():
+    """show_metrics 출력용"""
+    return {
+        "workers": settings.PASSWORD_HASH_WORKERS,
+        "queue": settings.PASSWORD_HASH_QUEUE,
+        "hasher": hashers.get_hasher().algorithm,
+        "rejected": metrics.get("password_hash:rejected"),
+        "upgraded": metrics.get("password_hash:upgraded"),
+        "latency_ms": metrics.histogram("password_hash:ms", HASH_MS_EDGES),
+    }
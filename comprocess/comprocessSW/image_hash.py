@@ -0,0 +1,126 @@
+"""
+이미지 분석 결과 재사용을 위한 지각 해시(dHash)
+
+같은 관광지/음식 사진은 크기, 압축률, 약간의 보정이 달라도 해시가 거의 같습니다.
+업로드 시 UploadedImage.phash 에 저장하고, 새 업로드와의 해밍 거리가
+IMAGE_CACHE_MAX_DISTANCE 이하인 분석 완료 이미지가 있으면 그 ai_analysis 를 재사용합니다.
+가까운 이미지는 워커 메모리의 검색 인덱스(image_search)에서 찾으므로 전체 이미지가 대상입니다.
+"""
+import numpy as np
+from django.conf import settings
+from PIL import Image, ImageOps
+
+from comprocessSW import metrics
+from comprocessSW.models import UploadedImage
+
+HASH_SIZE = 8
+# 반경 안 이웃 중 분석 여부를 DB 에서 확인하는 최대 수 (가까운 순)
+NEIGHBOR_CANDIDATES = 200
+
+
+def dhash(file):
+    """
+    difference hash (64bit, 16자리 hex 문자열)
+
+    Args:
+        file: 파일 경로 또는 파일 객체 (읽은 뒤 처음 위치로 되돌림)
+
+    Returns:
+        hex 문자열. 이미지를 읽을 수 없으면 ''
+    """
+    try:
+        with Image.open(file) as image:
+            # JPEG 는 축소 디코딩으로 전체 해상도 디코딩을 피함
+            image.draft("L", (HASH_SIZE * 32, HASH_SIZE * 32))
+            gray = ImageOps.exif_transpose(image).convert("L")
+        return dhash_image(gray)
+    except (OSError, ValueError, Image.DecompressionBombError):
+        return ""
+    finally:
+        if hasattr(file, "seek"):
+            file.seek(0)
+
+
+def dhash_image(image):
+    """이미 연(회전 반영된) PIL 이미지의 dHash (image_search.fingerprint 와 공유)"""
+    gray = image.convert("L")
+    pixels = np.asarray(gray.resize((HASH_SIZE + 1, HASH_SIZE), Image.LANCZOS), dtype=np.int16)
+    bits = (pixels[:, 1:] > pixels[:, :-1]).flatten()
+    value = 0
+    for bit in bits:
+        value = (value << 1) | int(bit)
+    return f"{value:016x}"
+
+
+def hamming(a, b):
+    """두 hex 해시의 해밍 거리"""
+    return bin(int(a, 16) ^ int(b, 16)).count("1")
+
+
+def find_similar(phash, exclude_id=None):
+    """
+    분석 결과가 저장된 비슷한 이미지 검색
+
+    1) 같은 해시 (phash 인덱스 조회)
+    2) 검색 인덱스(image_search)에서 해밍 거리 IMAGE_CACHE_MAX_DISTANCE 이내인 이미지 중
+       분석이 끝난 가장 가까운 이미지
+
+    Returns:
+        (UploadedImage, 해밍 거리) 또는 None
+    """
+    from comprocessSW import image_search
+
+    if not phash:
+        return None
+    analyzed = UploadedImage.objects.filter(analyzed_at__isnull=False).exclude(phash="")
+    if exclude_id is not None:
+        analyzed = analyzed.exclude(id=exclude_id)
+
+    exact = analyzed.filter(phash=phash).order_by("-analyzed_at").first()
+    if exact is not None:
+        return exact, 0
+
+    max_distance = settings.IMAGE_CACHE_MAX_DISTANCE
+    if max_distance <= 0:
+        return None
+    candidates = image_search.neighbors(phash, max_distance, exclude_id)[:NEIGHBOR_CANDIDATES]
+    if not candidates:
+        return None
+    found = analyzed.in_bulk([image_id for image_id, _ in candidates])
+    for image_id, distance in candidates:
+        if image_id in found:
+            return found[image_id], distance
+    return None
+
+
+def lookup(phash, exclude_id=None, force_refresh=False):
+    """
+    캐시 조회 + 적중률 기록
+
+    Returns:
+        (ai_analysis, 캐시 정보 dict) 또는 None
+    """
+    metrics.incr("image_cache:lookups")
+    if force_refresh:
+        metrics.incr("image_cache:forced")
+        return None
+    found = find_similar(phash, exclude_id)
+    if found is None:
+        metrics.incr("image_cache:misses")
+        return None
+    source, distance = found
+    metrics.incr("image_cache:hits")
+    return source.ai_analysis, {"source_image_id": source.id, "distance": distance}
+
+
+def stats():
+    """show_metrics 출력용 적중률"""
+    lookups = metrics.get("image_cache:lookups")
+    hits = metrics.get("image_cache:hits")
+    return {
+        "lookups": lookups,
+        "hits": hits,
+        "misses": metrics.get("image_cache:misses"),
+        "forced": metrics.get("image_cache:forced"),
+        "hit_rate": metrics.ratio(hits, lookups),
+    }
@@ -0,0 +1,402 @@
+"""
+비슷한 이미지 검색 ("이런 사진 더 보기", 비슷한 사진의 분석 결과 재사용)
+
+업로드할 때 이미지마다 작은 시각 서명을 계산해 UploadedImage 에 저장합니다. (fingerprint)
+- phash: dHash 64bit (image_hash.dhash_image) - 밝기 배치/구도
+- signature: 24바이트 색/에지 기술자
+  - 색 15칸: 색상(hue) 12칸 + 무채색(어두움/회색/밝음) 비율
+  - 에지 9칸: 그래디언트 방향 8칸(세기 가중) + 에지 밀도
+
+검색 인덱스(ImageSearchIndex)는 워커 프로세스마다 메모리에 NumPy 배열로 유지합니다.
+- phash 를 16bit 4조각으로 나눈 multi-index hashing: 해밍 거리 r 이내인 해시는 적어도 한 조각이
+  r // 4 이내로 같으므로(비둘기집 원리) 조각별 정렬 배열에서 이웃 값만 찾아 후보를 모으고 전체 거리로 확인
+- 반경(IMAGE_SEARCH_MAX_DISTANCE) 안 후보가 k 개보다 적으면 반경을 MAX_PROBE_RADIUS 까지 넓히고,
+  그래도 부족하면 전체 phash 거리(SWAR popcount)에서 가까운 후보를 고름
+- 후보는 색/에지 거리를 더한 점수로 다시 정렬
+- 새 업로드는 id 기준으로 이어서 읽고(IMAGE_SEARCH_REFRESH_SECONDS), 삭제된 행을 비우기 위해
+  IMAGE_SEARCH_RELOAD_SECONDS 마다 전체를 다시 읽습니다. (결과는 DB 에서 다시 조회하므로 삭제된 이미지는 빠짐)
+
+100만 장 기준 인덱스 메모리는 약 60MB (id/phash 16MB, 서명 24MB, 조각 인덱스 24MB) 입니다.
+"""
+import threading
+import time
+from datetime import timedelta
+
+import numpy as np
+from django.conf import settings
+from django.db.models import Max, Q
+from django.utils import timezone
+from PIL import Image, ImageOps
+
+from . import metrics
+from .image_hash import HASH_SIZE, dhash_image
+from .models import UploadedImage
+
+SIGNATURE_BYTES = 24
+HUE_BINS = 12
+COLOR_BINS = HUE_BINS + 3
+EDGE_BINS = 8
+DESCRIBE_SIZE = 64
+# HSV(0~255) 기준 무채색 / 어두움 / 밝음 경계
+DARK_VALUE = 50
+GRAY_SATURATION = 40
+LIGHT_VALUE = 170
+EDGE_THRESHOLD = 32.0
+
+CHUNKS = 4
+CHUNK_BITS = 16
+# 반경 안 후보가 k 개보다 적으면 조각 반경을 1씩 늘려 이 반경까지 다시 찾음 (조각 반경 4 = 마스크 2517개)
+MAX_PROBE_RADIUS = 19
+# 그래도 부족하면 전체 phash 거리로 고르는 재정렬 후보 수 (k 의 배수, 최소값)
+RERANK_FACTOR = 50
+RERANK_MIN = 1000
+# 조각 인덱스에 아직 넣지 않은 새 행은 따로 전체 거리로 검사하고, 이보다 많아지면 재구성
+DELTA_REBUILD_MIN = 2048
+# 점수 가중치 (phash 해밍 거리 / 색 / 에지)
+PHASH_WEIGHT, COLOR_WEIGHT, EDGE_WEIGHT = 0.5, 0.3, 0.2
+# 서명이 없는 행(예전 업로드)의 색/에지 거리 (비슷하지도 다르지도 않은 값)
+MISSING_DESCRIPTOR_DISTANCE = 0.5
+# phash 가 아직 없는 행(저장소 직접 업로드 후처리 전)을 다시 확인하는 기간
+PENDING_SECONDS = 3600
+SEARCH_MS_EDGES = [1, 2, 5, 10, 20, 50, 100]
+
+# 16bit 값별 1 의 개수 (조각별 탐색 마스크 생성용)
+POPCOUNT16 = np.unpackbits(np.arange(1 << 16, dtype=np.uint16).view(np.uint8)).reshape(-1, 16).sum(axis=1).astype(np.uint8)
+
+
+M1, M2, M4, H01 = (np.uint64(m) for m in (0x5555555555555555, 0x3333333333333333, 0x0F0F0F0F0F0F0F0F, 0x0101010101010101))
+
+
+def popcount64(values):
+    """uint64 배열의 원소별 비트 수 (SWAR, uint8)"""
+    values = values - ((values >> np.uint64(1)) & M1)
+    values = (values & M2) + ((values >> np.uint64(2)) & M2)
+    values = (values + (values >> np.uint64(4))) & M4
+    return ((values * H01) >> np.uint64(56)).astype(np.uint8)
+
+
+def describe(image):
+    """RGB 이미지의 색/에지 기술자 (SIGNATURE_BYTES 바이트)"""
+    small = image.resize((DESCRIBE_SIZE, DESCRIBE_SIZE), Image.BILINEAR)
+    hsv = np.asarray(small.convert("HSV"), dtype=np.int32)
+    hue, saturation, value = hsv[..., 0], hsv[..., 1], hsv[..., 2]
+    dark = value < DARK_VALUE
+    gray = ~dark & (saturation < GRAY_SATURATION)
+    chromatic = ~dark & ~gray
+
+    color = np.zeros(COLOR_BINS)
+    color[:HUE_BINS] = np.bincount(hue[chromatic] * HUE_BINS // 256, minlength=HUE_BINS)
+    color[HUE_BINS] = dark.sum()
+    color[HUE_BINS + 1] = (gray & (value < LIGHT_VALUE)).sum()
+    color[HUE_BINS + 2] = (gray & (value >= LIGHT_VALUE)).sum()
+    color /= color.sum()
+
+    luma = np.asarray(small.convert("L"), dtype=np.float32)
+    gx = luma[1:-1, 2:] - luma[1:-1, :-2]
+    gy = luma[2:, 1:-1] - luma[:-2, 1:-1]
+    magnitude = np.hypot(gx, gy).ravel()
+    # 방향만 사용 (0~π, 밝음→어두움 / 어두움→밝음 구분 없음)
+    angle = np.mod(np.arctan2(gy, gx), np.pi).ravel()
+    bins = np.minimum((angle * EDGE_BINS / np.pi).astype(np.int32), EDGE_BINS - 1)
+    edges = np.bincount(bins, weights=magnitude, minlength=EDGE_BINS)
+    if edges.sum() > 0:
+        edges /= edges.sum()
+    density = (magnitude > EDGE_THRESHOLD).mean()
+
+    values = np.concatenate([color, edges, [density]])
+    return np.clip(np.round(values * 255), 0, 255).astype(np.uint8).tobytes()
+
+
+def fingerprint(file):
+    """
+    지각 해시와 색/에지 서명 (한 번만 디코딩)
+
+    Args:
+        file: 파일 경로 또는 파일 객체 (읽은 뒤 처음 위치로 되돌림)
+
+    Returns:
+        (phash hex, signature bytes). 이미지를 읽을 수 없으면 ("", None)
+    """
+    try:
+        with Image.open(file) as image:
+            # JPEG 는 축소 디코딩으로 전체 해상도 디코딩을 피함
+            image.draft("RGB", (HASH_SIZE * 32, HASH_SIZE * 32))
+            image = ImageOps.exif_transpose(image).convert("RGB")
+        return dhash_image(image), describe(image)
+    except (OSError, ValueError, Image.DecompressionBombError):
+        return "", None
+    finally:
+        if hasattr(file, "seek"):
+            file.seek(0)
+
+
+def _read(queryset):
+    """
+    (id, phash, signature, uploaded_at) 행 → 인덱스 배열
+
+    Returns:
+        (ids, hashes, descriptors, has_descriptor, phash 가 아직 없는 최근 행 id 목록)
+    """
+    ids, hashes, signatures, missing = [], [], [], []
+    recent = timezone.now() - timedelta(seconds=PENDING_SECONDS)
+    empty = bytes(SIGNATURE_BYTES)
+    rows = queryset.values_list("id", "phash", "signature", "uploaded_at").iterator(chunk_size=10000)
+    for image_id, phash, signature, uploaded_at in rows:
+        if not phash:
+            if uploaded_at and uploaded_at > recent:
+                missing.append(image_id)
+            continue
+        ids.append(image_id)
+        hashes.append(int(phash, 16))
+        signature = bytes(signature) if signature else b""
+        signatures.append(signature if len(signature) == SIGNATURE_BYTES else empty)
+
+    descriptors = np.frombuffer(b"".join(signatures), dtype=np.uint8).reshape(-1, SIGNATURE_BYTES)
+    has_descriptor = descriptors.any(axis=1)
+    return (
+        np.array(ids, dtype=np.int64),
+        np.array(hashes, dtype=np.uint64),
+        descriptors,
+        has_descriptor,
+        missing,
+    )
+
+
+def _build_tables(hashes):
+    """phash 조각별 (정렬 순서, 정렬된 조각 값)"""
+    tables = []
+    for chunk in range(CHUNKS):
+        values = ((hashes >> np.uint64(chunk * CHUNK_BITS)) & np.uint64(0xFFFF)).astype(np.uint16)
+        order = np.argsort(values, kind="stable").astype(np.int32)
+        tables.append((order, values[order]))
+    return tables
+
+
+def _probe(tables, query, sub_radius):
+    """어느 한 조각이 sub_radius 비트 이내로 같은 행 위치 (중복 제거 전)"""
+    masks = np.nonzero(POPCOUNT16 <= sub_radius)[0].astype(np.uint16)
+    found = []
+    for chunk, (order, sorted_values) in enumerate(tables):
+        probes = np.uint16((query >> (chunk * CHUNK_BITS)) & 0xFFFF) ^ masks
+        left = np.searchsorted(sorted_values, probes, "left")
+        lengths = np.searchsorted(sorted_values, probes, "right") - left
+        hit = lengths > 0
+        left, lengths = left[hit], lengths[hit]
+        if not len(left):
+            continue
+        # 여러 [left, left + length) 구간의 위치를 한 번에 이어 붙임
+        offsets = np.repeat(left - np.concatenate(([0], np.cumsum(lengths)[:-1])), lengths)
+        found.append(order[offsets + np.arange(lengths.sum())])
+    return np.concatenate(found) if found else np.zeros(0, dtype=np.int32)
+
+
+class ImageSearchIndex:
+    """phash multi-index hash + 서명 배열 (워커 프로세스마다 하나)"""
+
+    def __init__(self):
+        # lock: 배열 교체/읽기, update_lock: DB 에서 다시 읽는 작업은 한 스레드만
+        self.lock = threading.Lock()
+        self.update_lock = threading.Lock()
+        self.loaded_at = None
+        self.refreshed_at = 0.0
+        self._reset()
+
+    def _reset(self):
+        self.ids = np.zeros(0, dtype=np.int64)
+        self.hashes = np.zeros(0, dtype=np.uint64)
+        self.descriptors = np.zeros((0, SIGNATURE_BYTES), dtype=np.uint8)
+        self.has_descriptor = np.zeros(0, dtype=bool)
+        self.tables = _build_tables(self.hashes)
+        self.indexed = 0
+        self.last_id = 0
+        self.pending = {}
+
+    @property
+    def size(self):
+        return len(self.ids)
+
+    def load(self):
+        """전체 다시 읽기"""
+        top = UploadedImage.objects.aggregate(top=Max("id"))["top"] or 0
+        ids, hashes, descriptors, has_descriptor, missing = _read(
+            UploadedImage.objects.filter(id__lte=top).order_by("id")
+        )
+        tables = _build_tables(hashes)
+        now = time.monotonic()
+        with self.lock:
+            self.ids, self.hashes = ids, hashes
+            self.descriptors, self.has_descriptor = descriptors, has_descriptor
+            self.tables, self.indexed = tables, len(ids)
+            self.last_id = top
+            self.pending = dict.fromkeys(missing, now)
+            self.loaded_at = now
+
+    def _append_new(self):
+        """마지막으로 읽은 id 이후의 행과, phash 가 늦게 채워지는 행 추가"""
+        top = UploadedImage.objects.aggregate(top=Max("id"))["top"] or 0
+        condition = Q(id__gt=self.last_id, id__lte=top)
+        if self.pending:
+            condition |= Q(id__in=list(self.pending))
+        if top <= self.last_id and not self.pending:
+            return
+        ids, hashes, descriptors, has_descriptor, missing = _read(
+            UploadedImage.objects.filter(condition).order_by("id")
+        )
+
+        now = time.monotonic()
+        pending = {
+            image_id: seen for image_id, seen in self.pending.items()
+            if image_id in set(missing) and now - seen < PENDING_SECONDS
+        }
+        pending.update((image_id, now) for image_id in missing if image_id not in pending)
+
+        all_hashes = np.concatenate([self.hashes, hashes])
+        # 새 행이 많아지면 조각 인덱스를 다시 만들고, 그 전에는 새 행만 따로 전체 거리로 검사
+        rebuild = len(all_hashes) - self.indexed > max(DELTA_REBUILD_MIN, self.indexed // 8)
+        tables = _build_tables(all_hashes) if rebuild else self.tables
+        with self.lock:
+            self.ids = np.concatenate([self.ids, ids])
+            self.hashes = all_hashes
+            self.descriptors = np.concatenate([self.descriptors, descriptors])
+            self.has_descriptor = np.concatenate([self.has_descriptor, has_descriptor])
+            if rebuild:
+                self.tables, self.indexed = tables, len(all_hashes)
+            self.last_id = max(self.last_id, top)
+            self.pending = pending
+
+    def refresh(self):
+        """오래되었으면 DB 에서 새 행을 읽음 (처음 한 번은 전체 로드를 기다림)"""
+        now = time.monotonic()
+        if (
+            self.loaded_at is not None
+            and now - self.loaded_at < settings.IMAGE_SEARCH_RELOAD_SECONDS
+            and now - self.refreshed_at < settings.IMAGE_SEARCH_REFRESH_SECONDS
+        ):
+            return
+        # 다른 스레드가 갱신 중이면 지금 인덱스로 검색
+        if not self.update_lock.acquire(blocking=self.loaded_at is None):
+            return
+        try:
+            now = time.monotonic()
+            if self.loaded_at is None or now - self.loaded_at >= settings.IMAGE_SEARCH_RELOAD_SECONDS:
+                self.load()
+            elif now - self.refreshed_at >= settings.IMAGE_SEARCH_REFRESH_SECONDS:
+                self._append_new()
+            self.refreshed_at = time.monotonic()
+        finally:
+            self.update_lock.release()
+
+    def _snapshot(self):
+        with self.lock:
+            return self.ids, self.hashes, self.descriptors, self.has_descriptor, self.tables, self.indexed
+
+    def _within(self, snapshot, query, radius):
+        """해밍 거리 radius 이내 행 위치와 거리"""
+        ids, hashes, _, _, tables, indexed = snapshot
+        positions = _probe(tables, query, radius // CHUNKS)
+        # 조각 인덱스에 아직 없는 새 행
+        positions = np.unique(np.concatenate([positions, np.arange(indexed, len(ids), dtype=np.int32)]))
+        distances = popcount64(hashes[positions] ^ np.uint64(query))
+        close = distances <= radius
+        return positions[close], distances[close]
+
+    def neighbors(self, phash, radius, exclude_id=None):
+        """
+        phash 해밍 거리 radius 이내 이미지
+
+        Returns:
+            [(image_id, 거리), ...] 거리 오름차순
+        """
+        self.refresh()
+        snapshot = self._snapshot()
+        positions, distances = self._within(snapshot, int(phash, 16), radius)
+        ids = snapshot[0][positions]
+        order = np.argsort(distances, kind="stable")
+        return [
+            (int(ids[i]), int(distances[i]))
+            for i in order if exclude_id is None or ids[i] != exclude_id
+        ]
+
+    def search(self, phash, signature, k, exclude_id=None):
+        """
+        비슷한 이미지 top-k (phash 거리 + 색/에지 거리 점수)
+
+        Returns:
+            [(image_id, phash 거리, 유사도 0~1), ...] 유사도 내림차순
+        """
+        self.refresh()
+        snapshot = self._snapshot()
+        ids, hashes, descriptors, has_descriptor, _, _ = snapshot
+        if not len(ids):
+            return []
+        query = int(phash, 16)
+
+        radius = settings.IMAGE_SEARCH_MAX_DISTANCE
+        while True:
+            positions, distances = self._within(snapshot, query, radius)
+            if len(positions) > k or radius >= MAX_PROBE_RADIUS:
+                break
+            # 같은 조각 반경으로 찾을 수 있는 최대 반경(조각 반경 * 4 + 3)까지 넓힘
+            radius = min((radius // CHUNKS + 1) * CHUNKS + CHUNKS - 1, MAX_PROBE_RADIUS)
+        if len(positions) <= k:
+            # 비슷한 해시가 거의 없으면 전체 phash 거리에서 가까운 순으로 후보를 고름
+            metrics.incr("image_search:full_scans")
+            all_distances = popcount64(hashes ^ np.uint64(query))
+            count = max(RERANK_MIN, k * RERANK_FACTOR)
+            # 거리는 0~64 정수이므로 정렬 대신 누적 개수로 기준 거리를 찾음
+            cutoff = int(np.searchsorted(np.cumsum(np.bincount(all_distances, minlength=65)), count))
+            positions = np.flatnonzero(all_distances <= cutoff)
+            distances = all_distances[positions]
+
+        color = edge = np.full(len(positions), MISSING_DESCRIPTOR_DISTANCE)
+        if signature:
+            query_descriptor = np.frombuffer(signature, dtype=np.uint8).astype(np.int16)
+            diff = np.abs(descriptors[positions].astype(np.int16) - query_descriptor)
+            # 색/에지 칸은 각각 합이 255 인 분포라 L1 거리 최대 510, 에지 밀도 칸은 최대 255
+            color = np.where(has_descriptor[positions], diff[:, :COLOR_BINS].sum(axis=1) / 510.0, color)
+            edge = np.where(has_descriptor[positions], diff[:, COLOR_BINS:].sum(axis=1) / 765.0, edge)
+        # 무관한 이미지끼리 phash 거리는 평균 32
+        score = 1.0 - np.minimum(PHASH_WEIGHT * distances.astype(np.float64) / 32.0 + COLOR_WEIGHT * color + EDGE_WEIGHT * edge, 1.0)
+
+        order = np.argsort(-score, kind="stable")
+        results = []
+        for i in order:
+            if exclude_id is not None and ids[positions[i]] == exclude_id:
+                continue
+            results.append((int(ids[positions[i]]), int(distances[i]), round(float(score[i]), 4)))
+            if len(results) == k:
+                break
+        return results
+
+
+_index = ImageSearchIndex()
+
+
+def neighbors(phash, radius, exclude_id=None):
+    if not phash:
+        return []
+    return _index.neighbors(phash, radius, exclude_id)
+
+
+def search(phash, signature, k, exclude_id=None):
+    """검색 + 지표 기록 (API 뷰에서 사용)"""
+    if not phash:
+        return []
+    started = time.perf_counter()
+    results = _index.search(phash, signature, k, exclude_id)
+    metrics.incr("image_search:queries")
+    metrics.observe("image_search:ms", (time.perf_counter() - started) * 1000, SEARCH_MS_EDGES)
+    return results
+
+
+def stats():
+    """show_metrics 출력용 (검색 지표 + 서명 채움 현황)"""
+    queries = metrics.get("image_search:queries")
+    images = UploadedImage.objects.exclude(image="")
+    return {
+        "queries": queries,
+        "full_scan_rate": metrics.ratio(metrics.get("image_search:full_scans"), queries),
+        "images": images.count(),
+        "missing_signature": images.filter(Q(phash="") | Q(signature__isnull=True)).count(),
+        "latency_ms": metrics.histogram("image_search:ms", SEARCH_MS_EDGES),
+    }
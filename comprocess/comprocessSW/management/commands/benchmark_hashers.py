@@ -0,0 +1,71 @@
+import time
+
+from django.conf import settings
+from django.contrib.auth.hashers import get_hashers
+from django.core.management.base import BaseCommand
+
+from comprocessSW.hashing import PBKDF2PasswordHasher
+
+SAMPLE_PASSWORD = "benchmark-password-1234"
+
+
+class Command(BaseCommand):
+    help = (
+        "설정된 비밀번호 해시 알고리즘(PASSWORD_HASHERS)의 1회 계산 시간과 처리량을 측정합니다. "
+        "PASSWORD_PBKDF2_ITERATIONS, PASSWORD_HASH_WORKERS 를 정할 때 사용합니다."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rounds", type=int, default=5, help="알고리즘별 측정 횟수 (중앙값 사용)")
+        parser.add_argument("--target-ms", type=float, default=100.0, help="권장 PBKDF2 반복 횟수를 계산할 목표 시간 (ms)")
+        parser.add_argument(
+            "--iterations", type=int, nargs="*", default=[],
+            help="추가로 측정할 PBKDF2 반복 횟수 (예: --iterations 260000 600000)"
+        )
+
+    def handle(self, *args, **options):
+        workers = settings.PASSWORD_HASH_WORKERS
+        self.stdout.write(f"해시 스레드: {workers}개 / 프로세스, 측정 {options['rounds']}회 중앙값\n")
+
+        pbkdf2 = PBKDF2PasswordHasher()
+        measured = None
+        for hasher in get_hashers():
+            name = f"{hasher.__class__.__module__}.{hasher.__class__.__name__}"
+            try:
+                elapsed = self.measure(lambda: hasher.encode(SAMPLE_PASSWORD, hasher.salt()), options["rounds"])
+            except ValueError as e:  # argon2-cffi, bcrypt 등 라이브러리가 설치되지 않은 경우
+                self.stdout.write(f"  {name}: 건너뜀 ({e})")
+                continue
+            self.report(name, elapsed, workers)
+            if hasher.algorithm == pbkdf2.algorithm:
+                measured = elapsed, hasher.iterations
+
+        for iterations in options["iterations"]:
+            measured = self.measure(
+                lambda: pbkdf2.encode(SAMPLE_PASSWORD, pbkdf2.salt(), iterations), options["rounds"]
+            ), iterations
+            self.report(f"pbkdf2_sha256 (iterations={iterations})", measured[0], workers)
+
+        if measured is None:
+            return
+        elapsed, iterations = measured
+        recommended = int(iterations * options["target_ms"] / (elapsed * 1000) // 1000 * 1000)
+        self.stdout.write(self.style.SUCCESS(
+            f"\n1회 {options['target_ms']:g}ms 기준 권장 PASSWORD_PBKDF2_ITERATIONS: {recommended} "
+            f"(현재 {pbkdf2.iterations}, 바꾸면 다음 로그인 때 다시 해시됨)"
+        ))
+
+    def measure(self, fn, rounds):
+        fn()  # 첫 호출(라이브러리 로드 등) 제외
+        samples = []
+        for _ in range(max(rounds, 1)):
+            started = time.perf_counter()
+            fn()
+            samples.append(time.perf_counter() - started)
+        return sorted(samples)[len(samples) // 2]
+
+    def report(self, name, elapsed, workers):
+        self.stdout.write(
+            f"  {name}: {elapsed * 1000:.1f}ms / 회, "
+            f"코어당 {1 / elapsed:.1f}회/초, 프로세스당 최대 {workers / elapsed:.1f}회/초"
+        )
@@ -0,0 +1,61 @@
+import os
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from comprocessSW.models import UploadSession
+from comprocessSW.resumable import discard, session_dir, session_path
+
+
+class Command(BaseCommand):
+    help = (
+        "UPLOAD_SESSION_TTL_HOURS 동안 진행이 없는 이어 올리기 세션과 임시 파일, "
+        "세션 행이 없는 임시 파일을 삭제합니다. (cron 등으로 주기 실행)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--ttl-hours", type=int, default=settings.UPLOAD_SESSION_TTL_HOURS,
+            help="이 시간 동안 진행이 없으면 삭제"
+        )
+        parser.add_argument("--dry-run", action="store_true", help="삭제 대상만 출력")
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(hours=options["ttl_hours"])
+        # 완료 처리 중 멈춘 세션도 만료되면 정리 (완료된 세션은 임시 파일이 이미 blob 으로 옮겨짐)
+        expired = UploadSession.objects.filter(updated_at__lt=cutoff)
+
+        sessions = freed = 0
+        for session in expired.iterator():
+            sessions += 1
+            path = session_path(session)
+            if os.path.exists(path):
+                freed += os.path.getsize(path)
+            if not options["dry_run"]:
+                discard(session)
+
+        orphans = self.orphan_files(cutoff.timestamp())
+        for path in orphans:
+            freed += os.path.getsize(path)
+            if not options["dry_run"]:
+                os.unlink(path)
+
+        action = "삭제 대상" if options["dry_run"] else "삭제"
+        self.stdout.write(self.style.SUCCESS(
+            f"{action}: 세션 {sessions}개, 세션 없는 임시 파일 {len(orphans)}개, {freed / 1024 / 1024:.1f}MB"
+        ))
+
+    def orphan_files(self, cutoff):
+        """세션 행이 삭제되었는데 남은 임시 파일 (수정 시각이 cutoff 이전인 것만)"""
+        directory = session_dir()
+        if not os.path.isdir(directory):
+            return []
+        active = {str(pk) for pk in UploadSession.objects.values_list("id", flat=True)}
+        orphans = []
+        for filename in os.listdir(directory):
+            path = os.path.join(directory, filename)
+            if filename.removesuffix(".part") not in active and os.path.getmtime(path) < cutoff:
+                orphans.append(path)
+        return orphans
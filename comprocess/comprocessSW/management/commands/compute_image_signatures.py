@@ -0,0 +1,63 @@
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.db.models import Q
+
+from comprocessSW.image_search import fingerprint
+from comprocessSW.models import UploadedImage
+from comprocessSW.storage import upload_storage
+
+
+class Command(BaseCommand):
+    help = (
+        "비슷한 이미지 검색용 지각 해시/색·에지 서명이 없는 업로드 이미지의 서명을 병렬로 계산합니다. "
+        "같은 파일을 참조하는 행은 한 번만 읽으며, 중단 후 다시 실행하면 남은 이미지부터 이어서 진행합니다."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=4, help="동시에 처리할 이미지 수 (Pillow 디코딩은 GIL 을 풀어 스레드로 병렬 처리됨)")
+        parser.add_argument("--limit", type=int, default=0, help="이번 실행에서 처리할 최대 파일 수 (0: 전체)")
+        parser.add_argument("--dry-run", action="store_true", help="처리할 파일 수만 출력")
+
+    def handle(self, *args, **options):
+        rows = UploadedImage.objects.exclude(image="").filter(Q(phash="") | Q(signature__isnull=True))
+        names = list(rows.order_by("image").values_list("image", flat=True).distinct())
+        if options["limit"]:
+            names = names[:options["limit"]]
+
+        if options["dry_run"] or not names:
+            self.stdout.write(f"처리할 파일: {len(names)}개")
+            return
+
+        started = time.monotonic()
+        done = failed = 0
+        with ThreadPoolExecutor(max_workers=options["workers"]) as executor:
+            futures = {executor.submit(self.compute, name): name for name in names}
+            for future in as_completed(futures):
+                error = future.result()
+                if error:
+                    failed += 1
+                    self.stderr.write(f"  실패: {futures[future]} ({error})")
+                else:
+                    done += 1
+                if (done + failed) % 100 == 0:
+                    self.stdout.write(f"  {done + failed}/{len(names)}")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"완료: {done}개 계산, 실패 {failed}개 ({time.monotonic() - started:.1f}초)"
+        ))
+
+    def compute(self, name):
+        try:
+            with upload_storage.open(name) as f:
+                phash, signature = fingerprint(f)
+            if not phash:
+                return "이미지를 읽을 수 없음"
+            UploadedImage.objects.filter(image=name).update(phash=phash, signature=signature)
+        except Exception as e:  # 파일 없음 등은 건너뛰고 계속 진행
+            return str(e) or e.__class__.__name__
+        finally:
+            connections.close_all()
+        return None
@@ -0,0 +1,84 @@
+import os
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from comprocessSW.models import UploadedImage
+from comprocessSW.storage import BLOB_DIR, TMP_DIR, content_hash_from_name, tmp_path, upload_storage
+from comprocessSW.variants import VARIANT_NAME
+
+
+class Command(BaseCommand):
+    help = (
+        "어떤 UploadedImage 도 참조하지 않는 blob 과 그 축소본, 남은 임시 업로드 파일을 삭제합니다. "
+        "(유예 기간 안에 저장된 파일은 건너뜀)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--grace-seconds", type=int, default=settings.BLOB_GC_GRACE_SECONDS,
+            help="이 시간(초)보다 최근에 저장된 파일은 삭제하지 않음"
+        )
+        parser.add_argument("--dry-run", action="store_true", help="삭제 대상만 출력")
+
+    def handle(self, *args, **options):
+        cutoff = time.time() - options["grace_seconds"]
+        referenced = set(
+            UploadedImage.objects.filter(image__startswith=f"{BLOB_DIR}/")
+            .values_list("image", flat=True)
+            .iterator()
+        )
+        # 축소본은 원본 blob 경로(확장자 제외)가 참조 중이면 유지
+        referenced_roots = {os.path.splitext(name)[0] for name in referenced}
+        if settings.IMAGE_TRANSCODE_KEEP_ORIGINAL:
+            # 형식 변환 전 원본 (축소본은 변환된 파일 기준이므로 원본의 축소본은 정리)
+            referenced.update(
+                UploadedImage.objects.exclude(original_image="")
+                .values_list("original_image", flat=True)
+                .iterator()
+            )
+
+        removed = 0
+        freed = 0
+        # 저장소(로컬 디스크 또는 S3)의 blob 과 축소본
+        for name, size, mtime in upload_storage.iter_files(BLOB_DIR):
+            if name.startswith(f"{BLOB_DIR}/{TMP_DIR}/") or mtime > cutoff:
+                continue
+            if not self.is_garbage(name, referenced, referenced_roots):
+                continue
+            removed += 1
+            freed += size
+            if options["dry_run"]:
+                self.stdout.write(f"  {name}")
+            else:
+                upload_storage.delete(name)
+
+        # 저장 중 중단되어 남은 로컬 임시 파일 (이어 올리기 세션 파일은 cleanup_upload_sessions 가 정리)
+        tmp_dir = tmp_path()
+        entries = list(os.scandir(tmp_dir)) if os.path.isdir(tmp_dir) else []
+        for entry in entries:
+            if not entry.is_file():
+                continue
+            stat = entry.stat()
+            if stat.st_mtime > cutoff:
+                continue
+            removed += 1
+            freed += stat.st_size
+            if options["dry_run"]:
+                self.stdout.write(f"  {BLOB_DIR}/{TMP_DIR}/{entry.name}")
+            else:
+                os.unlink(entry.path)
+
+        action = "삭제 대상" if options["dry_run"] else "삭제"
+        self.stdout.write(self.style.SUCCESS(
+            f"{action}: {removed}개 파일, {freed / 1024 / 1024:.1f}MB (참조 중인 blob {len(referenced)}개)"
+        ))
+
+    def is_garbage(self, name, referenced, referenced_roots):
+        """참조되지 않는 blob 이거나 그런 blob 의 축소본인지"""
+        variant = VARIANT_NAME.match(name)
+        if variant:
+            root = variant.group("root")
+            return bool(content_hash_from_name(root)) and root not in referenced_roots
+        return bool(content_hash_from_name(name)) and name not in referenced
@@ -0,0 +1,121 @@
+import time
+
+from django.core.files import File
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from comprocessSW.models import UploadedImage
+from comprocessSW.storage import BLOB_DIR, content_hash_from_name, upload_storage
+from comprocessSW.variants import candidate_names
+
+
+class Command(BaseCommand):
+    help = (
+        "평평한 uploads/ 디렉터리의 기존 이미지를 해시 기반 하위 디렉터리(blobs/ab/cd/...)로 옮기고 "
+        "UploadedImage.image 경로를 일괄 변경합니다. 중단 후 다시 실행하면 남은 행부터 이어서 진행합니다. "
+        "(--dry-run 은 파일과 DB 를 바꾸지 않음)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=500, help="한 번에 옮기고 커밋할 행 수")
+        parser.add_argument("--limit", type=int, default=0, help="이번 실행에서 처리할 최대 행 수 (0: 전체)")
+        parser.add_argument("--sleep", type=float, default=0.0, help="배치 사이 대기 시간 (초, 디스크 부하 조절)")
+        parser.add_argument("--keep-originals", action="store_true", help="예전 파일을 지우지 않음")
+        parser.add_argument(
+            "--purge-originals", action="store_true",
+            help="이미 옮겨진 행의 예전 파일만 삭제 (--keep-originals 로 옮긴 뒤 또는 중단 후 정리)"
+        )
+        parser.add_argument("--dry-run", action="store_true", help="옮길 행 수만 출력")
+
+    def legacy_rows(self):
+        return (
+            UploadedImage.objects.exclude(image="")
+            .exclude(image__startswith=f"{BLOB_DIR}/")
+            .order_by("id")
+        )
+
+    def handle(self, *args, **options):
+        if options["purge_originals"]:
+            self.purge_originals(options["batch_size"])
+            return
+
+        if options["dry_run"]:
+            self.stdout.write(f"옮길 행: {self.legacy_rows().count()}개")
+            return
+
+        last_id = 0
+        moved = missing = 0
+        limit = options["limit"]
+        while not limit or moved + missing < limit:
+            size = options["batch_size"]
+            if limit:
+                size = min(size, limit - moved - missing)
+            batch = list(self.legacy_rows().filter(id__gt=last_id)[:size])
+            if not batch:
+                break
+            last_id = batch[-1].id
+
+            updated, originals, batch_missing = self.copy_batch(batch)
+            missing += batch_missing
+            # 경로 변경은 배치 단위로 커밋: 중단되어도 커밋된 배치는 다시 처리하지 않음
+            with transaction.atomic():
+                UploadedImage.objects.bulk_update(updated, ["image", "content_hash", "legacy_path", "variants"])
+            moved += len(updated)
+
+            # 예전 파일은 경로 변경이 커밋된 뒤에만 삭제하므로 어느 시점에 중단되어도 행은 있는 파일을 가리킴
+            # - 복사 후 커밋 전 중단: 다시 실행하면 같은 행을 다시 복사 (같은 blob), 쓰이지 않은 blob 은 gc_blobs 가 정리
+            # - 커밋 후 삭제 전 중단: 남은 예전 파일은 --purge-originals 로 정리
+            if not options["keep_originals"]:
+                for name in originals:
+                    upload_storage.delete(name)
+
+            self.stdout.write(f"  ~{last_id}: {moved}개 이동, 파일 없음 {missing}개")
+            if options["sleep"]:
+                time.sleep(options["sleep"])
+
+        self.stdout.write(self.style.SUCCESS(
+            f"완료: {moved}개 이동, 파일 없음 {missing}개, 남은 행 {self.legacy_rows().count()}개"
+        ))
+        if moved:
+            self.stdout.write("옮긴 이미지의 축소본은 manage.py generate_image_variants 로 다시 만드세요.")
+
+    def copy_batch(self, batch):
+        """
+        예전 파일을 blob 으로 복사 (같은 내용은 하나의 blob 으로 합쳐짐)
+
+        Returns:
+            (경로를 바꾼 행 목록, 삭제할 예전 경로 목록, 파일이 없는 행 수)
+        """
+        updated = []
+        originals = []
+        missing = 0
+        for row in batch:
+            old_name = row.image.name
+            if not upload_storage.exists(old_name):
+                missing += 1
+                continue
+            with upload_storage.open(old_name) as f:
+                new_name = upload_storage.save(old_name, File(f, old_name))
+            row.image.name = new_name
+            row.content_hash = content_hash_from_name(new_name)
+            row.legacy_path = old_name
+            # 예전 경로 옆의 축소본은 새 경로 기준으로 다시 만들어야 함 (generate_image_variants)
+            row.variants = None
+            updated.append(row)
+            originals.append(old_name)
+            originals.extend(n for n in candidate_names(old_name) if upload_storage.exists(n))
+        return updated, originals, missing
+
+    def purge_originals(self, batch_size):
+        removed = 0
+        rows = (
+            UploadedImage.objects.exclude(legacy_path="")
+            .values_list("legacy_path", flat=True)
+            .iterator(chunk_size=batch_size)
+        )
+        for name in rows:
+            for path in [name] + candidate_names(name):
+                if upload_storage.exists(path):
+                    upload_storage.delete(path)
+                    removed += 1
+        self.stdout.write(self.style.SUCCESS(f"예전 파일 {removed}개 삭제"))
@@ -0,0 +1,126 @@
+import asyncio
+from collections import Counter
+from datetime import time, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from comprocessSW import plan_cache
+from comprocessSW.ai_module.kjy import count_travel_days, generate_travel_plan_result, merge_usage
+from comprocessSW.models import Travel_Schedule
+
+
+def parse_window(value):
+    """'02:00-06:00' → (time(2, 0), time(6, 0))"""
+    try:
+        start, end = value.split("-")
+        return time.fromisoformat(start.strip()), time.fromisoformat(end.strip())
+    except ValueError:
+        raise CommandError(f"시간대 형식이 올바르지 않습니다: {value} (예: 02:00-06:00)")
+
+
+def in_window(now, window):
+    start, end = window
+    if start <= end:
+        return start <= now <= end
+    return now >= start or now <= end  # 자정을 넘는 시간대 (예: 23:00-05:00)
+
+
+class Command(BaseCommand):
+    help = (
+        "최근 Travel_Schedule 에서 가장 많이 요청된 (목적지, 일수, 테마, 예산 구간) 조합을 찾아 "
+        "비혼잡 시간에 일정을 미리 생성하고 일정 캐시에 저장합니다. (cron 등으로 주기 실행) "
+        "미리 생성한 일정은 예산 구간이 같은 요청에만 사용됩니다."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--days-back", type=int, default=30, help="집계할 최근 기간 (일)")
+        parser.add_argument("--top", type=int, default=20, help="미리 생성할 조합 수")
+        parser.add_argument("--min-count", type=int, default=3, help="조합의 최소 요청 횟수")
+        parser.add_argument("--concurrency", type=int, default=4, help="동시에 진행할 생성 요청 수")
+        parser.add_argument("--off-peak", default="02:00-06:00", help="실행을 허용할 시간대 (서버 시간)")
+        parser.add_argument("--force", action="store_true", help="시간대와 무관하게 실행")
+        parser.add_argument("--refresh", action="store_true", help="이미 캐시된 조합도 다시 생성")
+        parser.add_argument("--dry-run", action="store_true", help="조합만 출력하고 생성하지 않음")
+
+    def handle(self, *args, **options):
+        now = timezone.localtime()
+        if not options["force"] and not in_window(now.time(), parse_window(options["off_peak"])):
+            self.stdout.write(f"비혼잡 시간대({options['off_peak']})가 아니므로 건너뜁니다. (--force 로 강제 실행)")
+            return
+
+        combos = self.trending_combinations(options["days_back"], options["top"], options["min_count"])
+        if not options["refresh"]:
+            combos = [
+                c for c in combos
+                if not plan_cache.has_template(c["destination"], c["days"], c["preferences"], c["budget"])
+            ]
+
+        for combo in combos:
+            self.stdout.write(
+                f"  {combo['count']:>5}회  {combo['destination']} / {combo['days']}일 / "
+                f"{combo['preferences']} / {combo['budget']}"
+            )
+        if options["dry_run"] or not combos:
+            self.stdout.write(f"생성 대상 조합: {len(combos)}개")
+            return
+
+        results = asyncio.run(self.generate_all(combos, options["concurrency"], now.date()))
+
+        stored = sum(1 for ok, _ in results if ok)
+        usage = merge_usage([u for _, u in results if u], latency_ms=0)
+        self.stdout.write(self.style.SUCCESS(
+            f"미리 생성 완료: {stored}/{len(combos)}개 저장, "
+            f"호출 {usage['calls']}회, 토큰 {usage['total_tokens']}개"
+        ))
+
+    def trending_combinations(self, days_back, top, min_count):
+        """최근 요청에서 (목적지, 일수, 테마, 예산 구간) 조합별 요청 횟수 집계"""
+        since = timezone.now() - timedelta(days=days_back)
+        rows = Travel_Schedule.objects.filter(created_at__gte=since).values_list(
+            "destination", "travel_date", "preferences", "budget"
+        )
+
+        counts = Counter()
+        labels = {}
+        for destination, travel_date, preferences, budget in rows.iterator():
+            days = count_travel_days(travel_date)
+            if days is None:
+                continue
+            themes = tuple(plan_cache.normalize_terms(preferences))
+            key = (plan_cache.canonical_destination(destination), days, themes, plan_cache.budget_bucket(budget))
+            counts[key] += 1
+            # 조합별로 처음 본 입력 표기를 대표값으로 사용 (일정은 이 예산으로 생성)
+            labels.setdefault(key, (destination, preferences, budget))
+
+        return [
+            {
+                "destination": labels[key][0], "days": key[1], "preferences": labels[key][1],
+                "budget": labels[key][2], "count": count,
+            }
+            for key, count in counts.most_common(top)
+            if count >= min_count
+        ]
+
+    async def generate_all(self, combos, concurrency, today):
+        semaphore = asyncio.Semaphore(concurrency)
+        start = today + timedelta(days=30)
+
+        async def generate(combo):
+            end = start + timedelta(days=combo["days"] - 1)
+            travel_date = f"{start.isoformat()} ~ {end.isoformat()}"
+            async with semaphore:
+                try:
+                    ai_result, usage, json_status = await generate_travel_plan_result(
+                        combo["destination"], combo["budget"], travel_date, combo["preferences"], ""
+                    )
+                    if json_status in ("partial", "failed"):
+                        raise ValueError(f"JSON {json_status}")
+                except Exception as e:
+                    self.stderr.write(f"생성 실패: {combo['destination']} / {combo['days']}일 ({e})")
+                    return False, None
+            return plan_cache.store_template(
+                combo["destination"], combo["days"], combo["preferences"], combo["budget"], ai_result
+            ), usage
+
+        return await asyncio.gather(*(generate(combo) for combo in combos))
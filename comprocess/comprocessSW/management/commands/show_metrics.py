@@ -0,0 +1,44 @@
+from django.core.management.base import BaseCommand
+
+from comprocessSW import hashing, image_hash, image_search, metrics, plan_cache, transcode
+from comprocessSW.ai_module.image_preprocess import PEAK_MB_EDGES
+
+# kjy.generate_travel_plan_result 가 반환하는 JSON 복구 상태
+PLAN_JSON_STATUSES = ("valid", "repaired", "continued", "partial", "failed")
+
+
+class Command(BaseCommand):
+    help = "캐시 적중률 등 운영 지표를 출력합니다."
+
+    def handle(self, *args, **options):
+        self.print_section("Travel plan cache", plan_cache.stats())
+        self.print_section("Travel plan JSON", self.plan_json_stats())
+        self.print_section("Image analysis cache", image_hash.stats())
+        self.print_section("Image analysis memory", {
+            "peak_mb": metrics.histogram("image_analysis:peak_mb", PEAK_MB_EDGES),
+        })
+        self.print_section("Upload transcoding", transcode.stats())
+        self.print_section("Similar image search", image_search.stats())
+        self.print_section("Password hashing", hashing.stats())
+
+    def plan_json_stats(self):
+        counts = {status: metrics.get(f"plan_json:{status}") for status in PLAN_JSON_STATUSES}
+        broken = sum(counts.values()) - counts["valid"]
+        return {
+            "responses": sum(counts.values()),
+            "repair_rate": metrics.ratio(counts["repaired"] + counts["continued"], broken),
+            "local_repair_rate": metrics.ratio(counts["repaired"], broken),
+            "statuses": list(counts.items()),
+        }
+
+    def print_section(self, title, stats):
+        self.stdout.write(self.style.MIGRATE_HEADING(title))
+        for key, value in stats.items():
+            if isinstance(value, list):
+                self.stdout.write(f"  {key}:")
+                total = sum(count for _, count in value) or 1
+                for label, count in value:
+                    bar = "#" * round(40 * count / total)
+                    self.stdout.write(f"    {label:>10} {count:>8} {bar}")
+            else:
+                self.stdout.write(f"  {key}: {value}")
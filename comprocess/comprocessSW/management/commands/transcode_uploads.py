@@ -0,0 +1,74 @@
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from comprocessSW.models import UploadedImage
+from comprocessSW.transcode import SOURCE_EXTENSIONS, enabled, transcode_upload
+from comprocessSW.variants import generate_variants
+
+
+class Command(BaseCommand):
+    help = (
+        "이미 저장된 PNG/HEIC 등 무손실 업로드를 IMAGE_TRANSCODE 설정(webp / jpeg)에 따라 변환하고 "
+        "절약된 용량을 출력합니다. --dry-run 이면 변환 없이 예상 절약량만 계산합니다."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=4, help="동시에 변환할 이미지 수")
+        parser.add_argument("--limit", type=int, default=0, help="이번 실행에서 처리할 최대 파일 수 (0: 전체)")
+        parser.add_argument("--dry-run", action="store_true", help="변환하지 않고 예상 절약량만 계산")
+
+    def handle(self, *args, **options):
+        if not enabled():
+            raise CommandError(f"IMAGE_TRANSCODE 가 webp 또는 jpeg 이어야 합니다. (현재: {settings.IMAGE_TRANSCODE})")
+
+        names = [
+            name for name in
+            UploadedImage.objects.exclude(image="").order_by("image").values_list("image", flat=True).distinct()
+            if os.path.splitext(name)[1].lower() in SOURCE_EXTENSIONS
+        ]
+        if options["limit"]:
+            names = names[:options["limit"]]
+        self.stdout.write(f"변환 후보: {len(names)}개")
+
+        started = time.monotonic()
+        converted = skipped = failed = 0
+        before = after = 0
+        with ThreadPoolExecutor(max_workers=options["workers"]) as executor:
+            futures = {executor.submit(self.transcode, name, options["dry_run"]): name for name in names}
+            for future in as_completed(futures):
+                result, error = future.result()
+                if error:
+                    failed += 1
+                    self.stderr.write(f"  실패: {futures[future]} ({error})")
+                elif result is None:
+                    skipped += 1
+                else:
+                    converted += 1
+                    before += result["before"]
+                    after += result["after"]
+                    self.stdout.write(
+                        f"  {futures[future]}: {result['before'] / 1024:.0f}KB → {result['after'] / 1024:.0f}KB ({result['kind']})"
+                    )
+
+        action = "변환 예정" if options["dry_run"] else "변환"
+        self.stdout.write(self.style.SUCCESS(
+            f"{action}: {converted}개, 건너뜀 {skipped}개, 실패 {failed}개, "
+            f"{before / 1024 / 1024:.1f}MB → {after / 1024 / 1024:.1f}MB "
+            f"({(before - after) / 1024 / 1024:.1f}MB 절약, {time.monotonic() - started:.1f}초)"
+        ))
+
+    def transcode(self, name, dry_run):
+        try:
+            result = transcode_upload(name, dry_run=dry_run)
+            if result and not dry_run:
+                generate_variants(result["name"])
+            return result, None
+        except Exception as e:  # 파일 없음, 손상된 이미지 등은 건너뛰고 계속 진행
+            return None, str(e) or e.__class__.__name__
+        finally:
+            connections.close_all()
@@ -0,0 +1,222 @@
+"""
+업로드 파일 제공 (MEDIA_URL)
+
+요청을 확인(권한, 경로)한 뒤 실제 전송은 MEDIA_SERVE_MODE 에 따라 처리합니다.
+
+- accel:    nginx 에 X-Accel-Redirect 헤더로 넘김 (MEDIA_ACCEL_REDIRECT_PREFIX 의 internal location)
+- sendfile: Apache(mod_xsendfile)/lighttpd 에 X-Sendfile 헤더로 넘김
+- django:   FileResponse 로 직접 전송 (Range/ETag/Last-Modified 지원)
+            ASGI(uvicorn) 워커에는 sendfile 이 없어 파일을 조각으로 읽어 보내므로 개발/소규모 배포용
+
+accel/sendfile 에서는 파이썬 워커가 파일 내용을 읽지 않고, Range 요청도 프록시가 처리합니다.
+
+blob 경로는 내용이 바뀌지 않으므로 오래 캐시하고,
+blob 으로 옮겨진 예전 경로(uploads/...)와 형식 변환 전 경로는 새 경로로 영구 리다이렉트합니다.
+UPLOAD_STORAGE=s3 이면 파일이 로컬에 없으므로 저장소 URL(공개 URL 또는 presigned GET)로 리다이렉트합니다.
+"""
+import mimetypes
+import os
+import posixpath
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.db.models import Q
+from django.http import FileResponse, Http404, HttpResponse, HttpResponsePermanentRedirect, HttpResponseRedirect
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, parse_http_date_safe
+from django.views.decorators.http import require_safe
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+
+from .authentication import CachedJWTAuthentication
+from .models import UploadedImage
+from .storage import BLOB_DIR, TMP_DIR, content_hash_from_name, upload_storage
+
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+# 축소본은 설정(크기/품질)을 바꾸고 다시 만들면 같은 이름으로 내용이 바뀔 수 있음
+DERIVED_CACHE_CONTROL = "public, max-age=86400"
+PRIVATE_CACHE_CONTROL = "private, max-age=3600"
+RANGE = re.compile(r"^bytes=(\d*)-(\d*)$")
+# 업로드 중인 임시 파일 등 외부에 제공하지 않는 경로
+INTERNAL_PREFIX = f"{BLOB_DIR}/{TMP_DIR}/"
+
+
+class RangeFile:
+    """파일의 [start, start + length) 구간만 읽는 래퍼 (FileResponse 가 조각 단위로 read 호출)"""
+
+    def __init__(self, file, start, length):
+        file.seek(start)
+        self.file = file
+        self.remaining = length
+
+    def read(self, size=-1):
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def close(self):
+        self.file.close()
+
+
+def authorize(request, path):
+    """
+    MEDIA_REQUIRE_AUTH 이면 JWT(Authorization 헤더) 인증 또는 서명된 URL(storage.download_url)만 허용
+
+    Returns:
+        거부 응답 또는 None (허용)
+    """
+    if not settings.MEDIA_REQUIRE_AUTH:
+        return None
+    if upload_storage.local and upload_storage.check_download_signature(
+        path, request.GET.get("expires"), request.GET.get("signature")
+    ):
+        return None
+    try:
+        result = CachedJWTAuthentication().authenticate(request)
+    except (InvalidToken, AuthenticationFailed):
+        result = None
+    if result is None:
+        response = HttpResponse("인증이 필요합니다.", status=401, content_type="text/plain; charset=utf-8")
+        response["WWW-Authenticate"] = 'Bearer realm="media"'
+        return response
+    return None
+
+
+def cache_control(path):
+    if settings.MEDIA_REQUIRE_AUTH:
+        return PRIVATE_CACHE_CONTROL
+    if content_hash_from_name(path):
+        return IMMUTABLE_CACHE_CONTROL
+    return DERIVED_CACHE_CONTROL
+
+
+def make_etag(path, stat):
+    digest = content_hash_from_name(path)
+    if digest:
+        return f'"{digest}"'
+    return f'"{stat.st_size:x}-{stat.st_mtime_ns:x}"'
+
+
+def parse_range(header, size):
+    """
+    Range 헤더 해석 (단일 구간만 지원)
+
+    Returns:
+        (start, end) (end 포함), 헤더를 무시해야 하면 None, 범위를 벗어나면 "invalid"
+    """
+    match = RANGE.match(header.replace(" ", ""))
+    if not match or not (match.group(1) or match.group(2)):
+        # 여러 구간 등은 전체 파일로 응답 (RFC 9110 에서 허용)
+        return None
+    start, end = match.groups()
+    if not start:
+        # bytes=-N: 마지막 N 바이트
+        length = int(end)
+        if length == 0:
+            return "invalid"
+        return max(size - length, 0), size - 1
+    start = int(start)
+    end = min(int(end), size - 1) if end else size - 1
+    if start >= size or start > end:
+        return "invalid"
+    return start, end
+
+
+def if_range_matches(request, etag, last_modified):
+    """If-Range 가 없거나 현재 파일과 같으면 True (다르면 Range 를 무시하고 전체 전송)"""
+    value = request.META.get("HTTP_IF_RANGE")
+    if not value:
+        return True
+    if value.startswith('"') or value.startswith("W/"):
+        return value == etag
+    return parse_http_date_safe(value) == int(last_modified)
+
+
+def file_response(request, path, fullpath, stat, content_type):
+    size = stat.st_size
+    byte_range = None
+    if request.META.get("HTTP_RANGE") and if_range_matches(request, make_etag(path, stat), stat.st_mtime):
+        byte_range = parse_range(request.META["HTTP_RANGE"], size)
+    if byte_range == "invalid":
+        response = HttpResponse(status=416)
+        response["Content-Range"] = f"bytes */{size}"
+        return response
+
+    if byte_range is None:
+        response = FileResponse(open(fullpath, "rb"), content_type=content_type)
+    else:
+        start, end = byte_range
+        response = FileResponse(RangeFile(open(fullpath, "rb"), start, end - start + 1), content_type=content_type)
+        response.status_code = 206
+        response["Content-Length"] = str(end - start + 1)
+        response["Content-Range"] = f"bytes {start}-{end}/{size}"
+    return response
+
+
+def serve_file(request, path, fullpath):
+    stat = os.stat(fullpath)
+    etag = make_etag(path, stat)
+    not_modified = get_conditional_response(request, etag=etag, last_modified=int(stat.st_mtime))
+    if not_modified is not None:
+        not_modified["Cache-Control"] = cache_control(path)
+        return not_modified
+
+    content_type = mimetypes.guess_type(path)[0] or "application/octet-stream"
+    mode = settings.MEDIA_SERVE_MODE
+    if mode == "accel":
+        # Content-Length/Range 는 nginx 가 실제 파일 기준으로 처리
+        response = HttpResponse(content_type=content_type)
+        response["X-Accel-Redirect"] = settings.MEDIA_ACCEL_REDIRECT_PREFIX.rstrip("/") + "/" + quote(path)
+    elif mode == "sendfile":
+        response = HttpResponse(content_type=content_type)
+        response["X-Sendfile"] = fullpath
+    else:
+        response = file_response(request, path, fullpath, stat, content_type)
+        if response.status_code == 416:
+            return response
+        response["Accept-Ranges"] = "bytes"
+
+    response["ETag"] = etag
+    response["Last-Modified"] = http_date(stat.st_mtime)
+    response["Cache-Control"] = cache_control(path)
+    return response
+
+
+def resolve(path):
+    """요청 경로 → MEDIA_ROOT 안의 실제 파일 경로 (없거나 제공하지 않는 경로면 None)"""
+    path = posixpath.normpath(path).lstrip("/")
+    if path.startswith(INTERNAL_PREFIX) or any(part.startswith(".") for part in path.split("/")):
+        return path, None
+    try:
+        fullpath = safe_join(settings.MEDIA_ROOT, path)
+    except SuspiciousFileOperation:
+        return path, None
+    if not os.path.isfile(fullpath):
+        return path, None
+    return path, fullpath
+
+
+@require_safe
+def serve_media(request, path):
+    path, fullpath = resolve(path)
+    denied = authorize(request, path)
+    if denied is not None:
+        return denied
+
+    if fullpath is not None:
+        return serve_file(request, path, fullpath)
+    if not upload_storage.local and not path.startswith(INTERNAL_PREFIX) and upload_storage.exists(path):
+        return HttpResponseRedirect(upload_storage.url(path))
+
+    moved = (
+        UploadedImage.objects.filter(Q(legacy_path=path) | Q(original_image=path))
+        .values_list("image", flat=True)
+        .first()
+    )
+    if moved:
+        return HttpResponsePermanentRedirect(upload_storage.url(moved))
+    raise Http404("파일을 찾을 수 없습니다.")
@@ -0,0 +1,51 @@
+"""
+간단한 운영 지표 카운터
+
+Django 캐시(settings.CACHES)에 저장되므로 여러 워커 프로세스의 값이 합산되고,
+관리 명령(manage.py show_metrics)에서 조회할 수 있습니다.
+"""
+import bisect
+
+from django.core.cache import cache
+
+PREFIX = "metrics:"
+
+
+def incr(name, amount=1):
+    """카운터 증가"""
+    key = PREFIX + name
+    try:
+        cache.incr(key, amount)
+    except ValueError:
+        # 아직 없는 키: 생성 후 증가 (동시에 생성되어도 add 는 한 번만 성공)
+        cache.add(key, 0, timeout=None)
+        cache.incr(key, amount)
+
+
+def get(name):
+    """카운터 값 조회"""
+    return cache.get(PREFIX + name, 0)
+
+
+def bucket_labels(edges):
+    """히스토그램 구간 이름 목록 (edges 는 오름차순)"""
+    labels = [f"<{edges[0]}"]
+    labels += [f"{low}-{high}" for low, high in zip(edges, edges[1:])]
+    labels.append(f">={edges[-1]}")
+    return labels
+
+
+def observe(name, value, edges):
+    """값이 속한 히스토그램 구간의 카운터 증가"""
+    label = bucket_labels(edges)[bisect.bisect_right(edges, value)]
+    incr(f"{name}:{label}")
+
+
+def histogram(name, edges):
+    """[(구간 이름, 개수), ...]"""
+    return [(label, get(f"{name}:{label}")) for label in bucket_labels(edges)]
+
+
+def ratio(numerator, denominator):
+    """0 으로 나누지 않는 비율 (소수 넷째 자리 반올림)"""
+    return round(numerator / denominator, 4) if denominator else 0.0
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-19 00:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('comprocessSW', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='travel_schedule',
+            name='ai_usage',
+            field=models.JSONField(blank=True, null=True),
+        ),
+    ]
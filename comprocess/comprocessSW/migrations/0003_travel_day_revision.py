@@ -0,0 +1,26 @@
+# Generated by Django 5.2.8 on 2026-10-19 00:56
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('comprocessSW', '0002_travel_schedule_ai_usage'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TravelDayRevision',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.PositiveIntegerField()),
+                ('segments', models.JSONField(default=list)),
+                ('ai_usage', models.JSONField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('schedule', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='day_revisions', to='comprocessSW.travel_schedule')),
+            ],
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.8 on 2026-10-19 01:12
+
+import comprocessSW.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('comprocessSW', '0004_uploadedimage_phash'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='uploadedimage',
+            name='content_hash',
+            field=models.CharField(blank=True, db_index=True, default='', max_length=64),
+        ),
+        migrations.AlterField(
+            model_name='uploadedimage',
+            name='image',
+            field=models.ImageField(storage=comprocessSW.storage.get_upload_storage, upload_to='uploads/'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-19 01:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('comprocessSW', '0005_uploadedimage_content_hash'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='uploadedimage',
+            name='legacy_path',
+            field=models.CharField(blank=True, db_index=True, default='', max_length=255),
+        ),
+    ]
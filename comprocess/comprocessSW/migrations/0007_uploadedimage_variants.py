@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-19 01:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('comprocessSW', '0006_uploadedimage_legacy_path'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='uploadedimage',
+            name='variants',
+            field=models.JSONField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-19 01:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('comprocessSW', '0007_uploadedimage_variants'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='uploadedimage',
+            name='original_image',
+            field=models.CharField(blank=True, db_index=True, default='', max_length=255),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-19 01:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('comprocessSW', '0010_uploadsession_content_hash'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='uploadedimage',
+            name='signature',
+            field=models.BinaryField(blank=True, null=True),
+        ),
+    ]
@@ -1,8 +1,12 @@
+import uuid
+
 from django.db import models
 from django.contrib.auth.models import AbstractBaseUser, BaseUserManager
 from django.contrib.auth.hashers import make_password, check_password
 from django.utils import timezone
 
+from .storage import content_hash_from_name, get_upload_storage
+
 # Create your views here.
 class UserManager(BaseUserManager):
     def create_user(self, username, password=None):
@@ -32,6 +36,12 @@ class User(AbstractBaseUser):
     USERNAME_FIELD = 'username'
     REQUIRED_FIELDS = []
 
+    class Meta:
+        indexes = [
+            # 유저 목록 keyset 페이지네이션 (pagination.py, 최신순)
+            models.Index(fields=['-created_at', '-id'], name='user_created_id_idx'),
+        ]
+
     def __str__(self):
         return self.username
 
@@ -54,18 +64,88 @@ class Travel_Schedule(models.Model):
     preferences = models.CharField(max_length=255)
     extra = models.CharField(max_length=255)
     ai_result = models.JSONField(null=True, blank=True)
+    ai_usage = models.JSONField(null=True, blank=True)
     created_at = models.DateTimeField(default=timezone.now)
 
     def __str__(self):
         return f"{self.destination} ({self.travel_date})"
 
 
+class TravelDayRevision(models.Model):
+    """하루 단위 재생성 시 교체되기 전의 일정"""
+    schedule = models.ForeignKey(Travel_Schedule, on_delete=models.CASCADE, related_name='day_revisions')
+    day = models.PositiveIntegerField()
+    segments = models.JSONField(default=list)
+    ai_usage = models.JSONField(null=True, blank=True)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"{self.schedule_id} day {self.day} ({self.created_at})"
+
+
 class UploadedImage(models.Model):
-    image = models.ImageField(upload_to='uploads/')
+    # 내용 주소 기반 저장 (blobs/ab/cd/<sha256>.ext), 같은 파일은 여러 행이 공유
+    image = models.ImageField(upload_to='uploads/', storage=get_upload_storage)
+    content_hash = models.CharField(max_length=64, blank=True, default='', db_index=True)
+    # blob 으로 옮기기 전의 예전 경로 (예전 URL 리다이렉트용, manage.py migrate_media_layout)
+    legacy_path = models.CharField(max_length=255, blank=True, default='', db_index=True)
     title = models.CharField(max_length=100, blank=True)
     description = models.TextField(blank=True)
     uploaded_at = models.DateTimeField(auto_now_add=True)
+    # 분석 결과 재사용용 지각 해시 (image_hash.dhash, 16자리 hex)
+    phash = models.CharField(max_length=16, blank=True, default='', db_index=True)
+    # 비슷한 이미지 검색용 색/에지 서명 (image_search.describe, 24바이트)
+    signature = models.BinaryField(null=True, blank=True)
+    ai_analysis = models.JSONField(null=True, blank=True)
+    analyzed_at = models.DateTimeField(null=True, blank=True)
+    # 형식 변환 전 경로 (transcode.py, 파일은 IMAGE_TRANSCODE_KEEP_ORIGINAL 일 때만 보관)
+    original_image = models.CharField(max_length=255, blank=True, default='', db_index=True)
+    # 썸네일/너비별 축소본 (variants.py, 업로드 후 백그라운드에서 채워짐)
+    variants = models.JSONField(null=True, blank=True)
+
+    def save(self, *args, **kwargs):
+        # 파일을 먼저 저장해야 blob 경로(= sha256)를 알 수 있음
+        if self.image and not self.image._committed:
+            self.image.save(self.image.name, self.image.file, save=False)
+        self.content_hash = content_hash_from_name(self.image.name)
+        super().save(*args, **kwargs)
 
     def __str__(self):
         return self.title or f"Image {self.id}"
 
+
+class UploadSession(models.Model):
+    """
+    이어 올리기(resumable) 업로드 세션 (resumable.py)
+
+    조각은 임시 파일(blobs/tmp/sessions/<id>.part)에 이어 붙이고,
+    완료하면 blob 으로 옮겨 UploadedImage 를 만듭니다.
+    content_hash 가 있으면 직접 업로드 세션으로, 클라이언트가 presigned URL 로 저장소에 바로 올립니다.
+    """
+    STATUS_ACTIVE = 'active'
+    STATUS_COMPLETING = 'completing'
+    STATUS_COMPLETED = 'completed'
+    STATUS_CHOICES = [
+        (STATUS_ACTIVE, '업로드 중'),
+        (STATUS_COMPLETING, '완료 처리 중'),
+        (STATUS_COMPLETED, '완료'),
+    ]
+
+    # 추측할 수 없는 id 가 세션 접근 권한 (로그인한 사용자가 만든 세션은 본인만 접근)
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='upload_sessions', null=True, blank=True)
+    file_name = models.CharField(max_length=255)
+    total_size = models.BigIntegerField()
+    offset = models.BigIntegerField(default=0)
+    header_checked = models.BooleanField(default=False)
+    # 직접 업로드 세션: 클라이언트가 계산한 sha256 (저장소가 이 값으로 받은 내용을 검증)
+    content_hash = models.CharField(max_length=64, blank=True, default='')
+    title = models.CharField(max_length=100, blank=True)
+    description = models.TextField(blank=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_ACTIVE)
+    uploaded_image = models.ForeignKey(UploadedImage, on_delete=models.SET_NULL, null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    def __str__(self):
+        return f"{self.file_name} ({self.offset}/{self.total_size})"
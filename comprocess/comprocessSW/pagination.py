@@ -0,0 +1,87 @@
+"""
+목록 API 의 keyset(커서) 페이지네이션
+
+OFFSET 페이지네이션은 뒤 페이지로 갈수록 건너뛸 행을 모두 읽어야 하지만,
+keyset 방식은 마지막으로 받은 행의 정렬 키 (created_at, id) 다음부터 인덱스로 바로 읽으므로
+테이블 크기와 관계없이 한 페이지를 읽는 비용이 같습니다.
+
+- 커서는 마지막 행의 정렬 키를 서명한 문자열 (위조/손상이면 InvalidCursor)
+- 행은 values() 로 필요한 컬럼만 읽고 모델 인스턴스/Serializer 를 거치지 않음
+- 전체 개수는 선택 사항: none(계산 안 함) / approx(캐시된 개수) / exact(COUNT 쿼리)
+"""
+from django.core import signing
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Q
+from rest_framework import serializers
+
+CURSOR_SALT = "comprocessSW.pagination"
+COUNT_CACHE_PREFIX = "list_count:"
+
+_datetime_field = serializers.DateTimeField()
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def iso(value):
+    """Serializer(DateTimeField) 와 같은 형식의 날짜 문자열 (UTC 는 'Z')"""
+    return _datetime_field.to_representation(value) if value is not None else None
+
+
+def encode_cursor(row):
+    return signing.dumps([iso(row["created_at"]), row["id"]], salt=CURSOR_SALT, compress=True)
+
+
+def decode_cursor(cursor):
+    """커서 → (created_at, id)"""
+    try:
+        created_at, row_id = signing.loads(cursor, salt=CURSOR_SALT)
+        return _datetime_field.to_internal_value(created_at), int(row_id)
+    except (signing.BadSignature, ValueError, TypeError, serializers.ValidationError):
+        raise InvalidCursor("잘못된 커서입니다.")
+
+
+def keyset_page(queryset, fields, limit, cursor=None):
+    """
+    (created_at, id) 내림차순(최신순) 한 페이지
+
+    Args:
+        queryset: created_at, id 필드가 있는 QuerySet
+        fields: values() 로 읽을 필드 (created_at, id 포함)
+        limit: 페이지 크기
+        cursor: 이전 응답의 next (없으면 첫 페이지)
+
+    Returns:
+        (행 dict 목록, 다음 페이지 커서 또는 None)
+    """
+    if cursor:
+        created_at, row_id = decode_cursor(cursor)
+        # created_at <= 커서 조건을 따로 두어 인덱스 범위 검색이 되도록 함 (OR 만 있으면 앞부분부터 훑음)
+        queryset = queryset.filter(
+            Q(created_at__lte=created_at) & (Q(created_at__lt=created_at) | Q(id__lt=row_id))
+        )
+    # 한 행 더 읽어서 다음 페이지가 있는지 확인 (COUNT 쿼리 없이)
+    rows = list(queryset.order_by("-created_at", "-id").values(*fields)[:limit + 1])
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, encode_cursor(rows[-1])
+
+
+def approximate_count(model, timeout):
+    """
+    테이블 전체 행 수 근사값
+
+    PostgreSQL 은 통계(pg_class.reltuples)를 읽고, 그 외에는 COUNT 결과를 timeout 초 동안 캐시합니다.
+    """
+    if connection.vendor == "postgresql":
+        with connection.cursor() as db:
+            db.execute("SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass", [model._meta.db_table])
+            row = db.fetchone()
+        # 아직 ANALYZE 되지 않은 테이블은 -1
+        if row and row[0] >= 0:
+            return row[0]
+    key = f"{COUNT_CACHE_PREFIX}{model._meta.label_lower}"
+    return cache.get_or_set(key, lambda: model.objects.count(), timeout)
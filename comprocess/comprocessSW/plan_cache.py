@@ -0,0 +1,408 @@
+"""
+여행 일정 캐시
+
+1) 정확히 같은 요청(정규화 후)은 Django 캐시에서 바로 반환하고
+   인기 조합은 비혼잡 시간에 미리 생성된 일정(manage.py pregenerate_plans)을 사용하며
+   (미리 생성한 일정은 예산 구간이 같은 요청에만 사용, budget_bucket 참고)
+2) 표현만 다른 요청("부산" / "Busan", "맛집, 해변" / "해변 맛집")은
+   과거 Travel_Schedule 입력으로 만든 로컬 유사도 인덱스에서 찾아 재사용합니다.
+
+유사도 인덱스는 문자 n-gram TF-IDF 벡터를 NumPy 행렬로 워커 프로세스마다 메모리에 유지하며
+외부 서비스를 사용하지 않습니다. 목적지, 여행 일수, 예산 구간(budget_bucket)과
+추가 요청사항(알레르기, 휠체어 등)이 모두 같은 일정끼리만 비교하므로
+표현이 비슷해도 예산 규모나 필수 조건이 다른 일정은 재사용하지 않습니다.
+"""
+import copy
+import hashlib
+import json
+import math
+import re
+import threading
+import zlib
+from collections import deque
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+
+from . import metrics
+from .ai_module.kjy import count_travel_days, parse_travel_dates
+from .models import Travel_Schedule
+
+CACHE_PREFIX = "plan_cache:"
+VECTOR_DIM = 2048
+NGRAM_SIZES = (2, 3)
+SIMILARITY_EDGES = [0.5, 0.6, 0.7, 0.8, 0.85, 0.9, 0.95, 1.0]
+
+# 같은 목적지를 가리키는 다른 표기 → 대표 키
+DESTINATION_ALIASES = {
+    "서울": "seoul", "seoul": "seoul",
+    "부산": "busan", "busan": "busan", "pusan": "busan",
+    "제주": "jeju", "jeju": "jeju", "jejuisland": "jeju", "jejudo": "jeju",
+    "인천": "incheon", "incheon": "incheon",
+    "대구": "daegu", "daegu": "daegu",
+    "대전": "daejeon", "daejeon": "daejeon",
+    "광주": "gwangju", "gwangju": "gwangju",
+    "울산": "ulsan", "ulsan": "ulsan",
+    "경주": "gyeongju", "gyeongju": "gyeongju",
+    "강릉": "gangneung", "gangneung": "gangneung",
+    "속초": "sokcho", "sokcho": "sokcho",
+    "여수": "yeosu", "yeosu": "yeosu",
+    "전주": "jeonju", "jeonju": "jeonju",
+    "도쿄": "tokyo", "동경": "tokyo", "tokyo": "tokyo",
+    "오사카": "osaka", "osaka": "osaka",
+    "교토": "kyoto", "kyoto": "kyoto",
+    "후쿠오카": "fukuoka", "fukuoka": "fukuoka",
+    "삿포로": "sapporo", "sapporo": "sapporo",
+    "오키나와": "okinawa", "okinawa": "okinawa",
+    "방콕": "bangkok", "bangkok": "bangkok",
+    "다낭": "danang", "danang": "danang",
+    "하노이": "hanoi", "hanoi": "hanoi",
+    "타이베이": "taipei", "타이페이": "taipei", "taipei": "taipei",
+    "홍콩": "hongkong", "hongkong": "hongkong",
+    "싱가포르": "singapore", "싱가폴": "singapore", "singapore": "singapore",
+    "파리": "paris", "paris": "paris",
+    "런던": "london", "london": "london",
+    "뉴욕": "newyork", "newyork": "newyork", "nyc": "newyork",
+    "하와이": "hawaii", "hawaii": "hawaii",
+}
+
+# 행정구역 접미사 ("부산광역시" → "부산", "제주도" → "제주")
+DESTINATION_SUFFIXES = ("특별자치도", "특별자치시", "특별시", "광역시", "시", "도", "city")
+
+TERM_SPLIT = re.compile(r"[\s,./;:|·+&()\[\]{}~\-]+")
+
+BUDGET_AMOUNT = re.compile(r"(\d[\d,]*(?:\.\d+)?)\s*(억|천만|백만|만|천|k(?![a-z])|m(?![a-z]))?")
+BUDGET_UNITS = {"억": 1e8, "천만": 1e7, "백만": 1e6, "만": 1e4, "천": 1e3, "k": 1e3, "m": 1e6}
+BUDGET_CURRENCIES = (
+    ("krw", ("원", "krw", "₩")),
+    ("jpy", ("엔", "yen", "jpy", "¥")),
+    ("usd", ("달러", "usd", "$")),
+    ("eur", ("유로", "eur", "€")),
+)
+
+
+def _threshold():
+    return getattr(settings, "PLAN_CACHE_SIMILARITY_THRESHOLD", 0.85)
+
+
+def _timeout():
+    return getattr(settings, "PLAN_CACHE_TIMEOUT", 60 * 60 * 24 * 7)
+
+
+def _index_size():
+    return getattr(settings, "PLAN_CACHE_INDEX_SIZE", 5000)
+
+
+def canonical_destination(destination):
+    """목적지 표기를 비교용 대표 키로 변환"""
+    text = re.sub(r"[\s\-_.,]+", "", (destination or "").lower())
+    if text in DESTINATION_ALIASES:
+        return DESTINATION_ALIASES[text]
+    for suffix in DESTINATION_SUFFIXES:
+        if text.endswith(suffix) and text[:-len(suffix)] in DESTINATION_ALIASES:
+            return DESTINATION_ALIASES[text[:-len(suffix)]]
+    return text
+
+
+def normalize_terms(text):
+    """어순/구분자와 무관하도록 단어를 소문자 정렬 목록으로 변환"""
+    return sorted({term for term in TERM_SPLIT.split((text or "").lower()) if term})
+
+
+def request_text(budget, preferences, extra):
+    """유사도 비교에 사용하는 입력 텍스트"""
+    return " ".join(normalize_terms(budget) + normalize_terms(preferences) + normalize_terms(extra))
+
+
+def exact_key(destination, budget, travel_date, preferences, extra):
+    """정규화된 입력의 캐시 키 (날짜 자체가 아니라 여행 일수만 반영)"""
+    payload = json.dumps([
+        canonical_destination(destination),
+        count_travel_days(travel_date),
+        normalize_terms(budget),
+        normalize_terms(preferences),
+        normalize_terms(extra),
+    ], ensure_ascii=False)
+    return CACHE_PREFIX + "exact:" + hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def budget_bucket(budget):
+    """
+    예산 구간 ("50만원", "500,000원" → "krw:18")
+
+    통화와 금액의 log2 (2배 단위 구간)로 나눕니다. 금액을 읽을 수 없으면 정규화한 단어 그대로 사용합니다.
+    """
+    text = (budget or "").lower().replace(" ", "")
+    match = BUDGET_AMOUNT.search(text)
+    if match is None:
+        return " ".join(normalize_terms(budget))
+    amount = float(match.group(1).replace(",", "")) * BUDGET_UNITS.get(match.group(2), 1)
+    if amount <= 0:
+        return " ".join(normalize_terms(budget))
+    currency = next((code for code, marks in BUDGET_CURRENCIES if any(mark in text for mark in marks)), "")
+    return f"{currency}:{math.floor(math.log2(amount))}"
+
+
+def template_key(destination, days, preferences, budget):
+    """인기 조합용으로 미리 생성한 일정의 캐시 키 (목적지, 여행 일수, 테마, 예산 구간)"""
+    payload = json.dumps([
+        canonical_destination(destination),
+        days,
+        normalize_terms(preferences),
+        budget_bucket(budget),
+    ], ensure_ascii=False)
+    return CACHE_PREFIX + "template:" + hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def vectorize(text):
+    """문자 n-gram 해싱 TF 벡터 (1 + log tf)"""
+    vector = np.zeros(VECTOR_DIM, dtype=np.float32)
+    for term in text.split():
+        padded = f" {term} "
+        grams = [term]
+        for size in NGRAM_SIZES:
+            grams.extend(padded[i:i + size] for i in range(len(padded) - size + 1))
+        for gram in grams:
+            vector[zlib.crc32(gram.encode("utf-8")) % VECTOR_DIM] += 1.0
+    np.log1p(vector, out=vector)
+    return vector
+
+
+def similarity_group(destination, budget, travel_date, extra):
+    """
+    유사도 비교 그룹 (목적지, 여행 일수, 예산 구간, 추가 요청사항 단어)
+
+    Returns:
+        그룹 튜플. 여행 일수를 알 수 없으면 None
+    """
+    days = count_travel_days(travel_date)
+    if days is None:
+        return None
+    return canonical_destination(destination), days, budget_bucket(budget), " ".join(normalize_terms(extra))
+
+
+class PlanSimilarityIndex:
+    """similarity_group 별 TF 행렬과 전체 문서 빈도(df)를 유지하는 인덱스"""
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.lock = threading.Lock()
+        self.loaded = False
+        self._reset()
+
+    def _reset(self):
+        self.groups = {}
+        self.df = np.zeros(VECTOR_DIM, dtype=np.float32)
+        self.size = 0
+        # 추가된 순서의 그룹 (가장 오래된 항목부터 버리기 위해 사용)
+        self.order = deque()
+
+    def _add(self, schedule_id, group, vector):
+        ids, matrix = self.groups.get(group, ([], np.zeros((0, VECTOR_DIM), dtype=np.float32)))
+        self.groups[group] = (ids + [schedule_id], np.vstack([matrix, vector]))
+        self.df += vector > 0
+        self.size += 1
+        self.order.append(group)
+
+    def _evict_oldest(self):
+        """가장 먼저 추가된 항목 제거 (그룹 안에서도 추가된 순서이므로 그룹의 첫 행)"""
+        group = self.order.popleft()
+        ids, matrix = self.groups[group]
+        self.df -= matrix[0] > 0
+        self.size -= 1
+        if len(ids) == 1:
+            del self.groups[group]
+        else:
+            self.groups[group] = (ids[1:], matrix[1:])
+
+    def load(self):
+        """최근 일정으로 인덱스 재구성 (정상 일정 여부는 DB 에서 거르고 ai_result 는 읽지 않음)"""
+        rows = (
+            cacheable_schedules()
+            .order_by("-id")
+            .values_list("id", "destination", "budget", "travel_date", "preferences", "extra")
+            [:self.capacity]
+        )
+        collected = {}
+        order = []
+        for schedule_id, destination, budget, travel_date, preferences, extra in reversed(list(rows)):
+            group = similarity_group(destination, budget, travel_date, extra)
+            if group is None:
+                continue
+            ids, vectors = collected.setdefault(group, ([], []))
+            ids.append(schedule_id)
+            vectors.append(vectorize(request_text(budget, preferences, extra)))
+            order.append(group)
+
+        with self.lock:
+            self._reset()
+            for group, (ids, vectors) in collected.items():
+                matrix = np.vstack(vectors)
+                self.groups[group] = (ids, matrix)
+                self.df += (matrix > 0).sum(axis=0)
+                self.size += len(ids)
+            self.order.extend(order)
+            self.loaded = True
+
+    def add(self, schedule_id, group, text):
+        if not self.loaded:
+            self.load()
+            return
+        vector = vectorize(text)
+        with self.lock:
+            while self.size >= self.capacity:
+                self._evict_oldest()
+            self._add(schedule_id, group, vector)
+
+    def query(self, group, text):
+        """
+        같은 그룹에서 가장 유사한 일정
+
+        Returns:
+            (schedule_id, 코사인 유사도) 또는 None
+        """
+        if not self.loaded:
+            self.load()
+        with self.lock:
+            if group not in self.groups:
+                return None
+            ids, matrix = self.groups[group]
+            idf = np.log((1.0 + self.size) / (1.0 + self.df)) + 1.0
+
+        weighted = matrix * idf
+        norms = np.linalg.norm(weighted, axis=1)
+        norms[norms == 0] = 1.0
+        query = vectorize(text) * idf
+        query_norm = np.linalg.norm(query)
+        if query_norm == 0:
+            return None
+        scores = (weighted @ query) / (norms * query_norm)
+        best = int(np.argmax(scores))
+        return ids[best], float(scores[best])
+
+
+_index = PlanSimilarityIndex(capacity=_index_size())
+
+
+def is_cacheable(ai_result):
+    """오류가 아닌 정상 일정만 캐시"""
+    return isinstance(ai_result, dict) and "error" not in ai_result and bool(ai_result.get("itinerary"))
+
+
+def cacheable_schedules():
+    """is_cacheable 과 같은 조건을 DB 에서 거른 Travel_Schedule QuerySet"""
+    return (
+        Travel_Schedule.objects.filter(ai_result__has_key="itinerary")
+        .exclude(ai_result__has_key="error")
+        .exclude(ai_result__itinerary=None)
+        .exclude(ai_result__itinerary=[])
+    )
+
+
+def adapt_plan(ai_result, destination, travel_date):
+    """재사용할 일정의 목적지 표기와 날짜를 새 요청에 맞게 수정"""
+    plan = copy.deepcopy(ai_result)
+    plan["destination"] = destination
+    dates = parse_travel_dates(travel_date)
+    if dates and isinstance(plan.get("date"), dict):
+        start, end = dates
+        plan["date"].update({
+            "start": start.isoformat(),
+            "end": end.isoformat(),
+            "days": (end - start).days + 1,
+        })
+    return plan
+
+
+def lookup(destination, budget, travel_date, preferences, extra):
+    """
+    재사용 가능한 일정 조회
+
+    Returns:
+        (새 요청에 맞게 수정한 ai_result, 캐시 정보 dict) 또는 None
+    """
+    metrics.incr("plan_cache:requests")
+
+    entry = cache.get(exact_key(destination, budget, travel_date, preferences, extra))
+    if entry is not None:
+        metrics.incr("plan_cache:hits:exact")
+        info = {"type": "exact", "similarity": 1.0, "source_schedule_id": entry["schedule_id"]}
+        return adapt_plan(entry["ai_result"], destination, travel_date), info
+
+    days = count_travel_days(travel_date)
+
+    # 미리 생성된 인기 조합 일정은 추가 요청사항(알레르기 등)이 없고 예산 구간이 같은 경우에만 사용
+    # (예산 구간이 키에 들어가므로 10만원 요청에 100만원 기준 일정을 주지 않음)
+    if days is not None and not normalize_terms(extra):
+        entry = cache.get(template_key(destination, days, preferences, budget))
+        if entry is not None:
+            metrics.incr("plan_cache:hits:template")
+            info = {"type": "template", "similarity": 1.0, "source_schedule_id": None}
+            return adapt_plan(entry["ai_result"], destination, travel_date), info
+
+    group = similarity_group(destination, budget, travel_date, extra)
+    match = _index.query(group, request_text(budget, preferences, extra)) if group else None
+    if match is not None:
+        schedule_id, similarity = match
+        metrics.observe("plan_cache:similarity", similarity, SIMILARITY_EDGES)
+        if similarity >= _threshold():
+            ai_result = (
+                Travel_Schedule.objects.filter(id=schedule_id)
+                .values_list("ai_result", flat=True)
+                .first()
+            )
+            if is_cacheable(ai_result):
+                metrics.incr("plan_cache:hits:similar")
+                info = {
+                    "type": "similar",
+                    "similarity": round(similarity, 4),
+                    "source_schedule_id": schedule_id,
+                }
+                return adapt_plan(ai_result, destination, travel_date), info
+
+    metrics.incr("plan_cache:misses")
+    return None
+
+
+def store(schedule):
+    """새로 생성된 일정을 정확 일치 캐시와 유사도 인덱스에 등록"""
+    if not is_cacheable(schedule.ai_result):
+        return
+    key = exact_key(schedule.destination, schedule.budget, schedule.travel_date,
+                    schedule.preferences, schedule.extra)
+    cache.set(key, {"schedule_id": schedule.id, "ai_result": schedule.ai_result}, timeout=_timeout())
+
+    group = similarity_group(schedule.destination, schedule.budget, schedule.travel_date, schedule.extra)
+    if group is not None:
+        _index.add(schedule.id, group, request_text(schedule.budget, schedule.preferences, schedule.extra))
+
+
+def has_template(destination, days, preferences, budget):
+    return cache.get(template_key(destination, days, preferences, budget)) is not None
+
+
+def store_template(destination, days, preferences, budget, ai_result):
+    """미리 생성한 인기 조합 일정 등록"""
+    if not is_cacheable(ai_result):
+        return False
+    cache.set(template_key(destination, days, preferences, budget), {"ai_result": ai_result}, timeout=_timeout())
+    return True
+
+
+def stats():
+    """캐시 적중률과 유사도 분포"""
+    requests = metrics.get("plan_cache:requests")
+    exact_hits = metrics.get("plan_cache:hits:exact")
+    template_hits = metrics.get("plan_cache:hits:template")
+    similar_hits = metrics.get("plan_cache:hits:similar")
+    return {
+        "requests": requests,
+        "hits_exact": exact_hits,
+        "hits_template": template_hits,
+        "hits_similar": similar_hits,
+        "misses": metrics.get("plan_cache:misses"),
+        "hit_rate": metrics.ratio(exact_hits + template_hits + similar_hits, requests),
+        "threshold": _threshold(),
+        "similarity_histogram": metrics.histogram("plan_cache:similarity", SIMILARITY_EDGES),
+    }
@@ -0,0 +1,338 @@
+"""
+이어 올리기(resumable) 업로드
+
+모바일 네트워크에서 큰 사진을 올리다 연결이 끊겨도 처음부터 다시 보내지 않도록
+세션을 만들고 조각(chunk)을 offset 과 함께 나눠 보냅니다.
+
+    POST   image-upload/sessions/                   세션 생성 (파일 이름, 전체 크기)
+    PUT    image-upload/sessions/<id>/              조각 전송 (Upload-Offset 헤더, 본문은 원본 바이트)
+    GET    image-upload/sessions/<id>/              진행 상황 (받은 바이트 수)
+    POST   image-upload/sessions/<id>/complete/     완료 → UploadedImage 생성 (analyze=true 면 분석까지)
+
+- 조각은 임시 파일(blobs/tmp/sessions/<id>.part)의 offset 위치에 바로 쓰고,
+  SHA-256 은 받는 동안 이어서 계산하므로 완료할 때 파일을 다시 읽거나 복사하지 않고
+  blob 경로로 이동(rename)만 합니다.
+- 해시 진행 상태는 프로세스 메모리에 두고, 다른 워커가 세션을 이어받은 경우에만
+  임시 파일의 받은 부분을 한 번 읽어 따라잡습니다.
+- 같은 세션의 조각 요청이 동시에 와도 임시 파일 잠금과 세션 행 잠금으로 한 번에 하나씩 기록합니다.
+- 파일 앞부분(헤더)이 도착하면 upload_handlers 와 같은 형식/해상도 제한으로 검사합니다.
+- UPLOAD_SESSION_TTL_HOURS 동안 진행이 없는 세션은 manage.py cleanup_upload_sessions 로 정리합니다.
+
+직접 업로드: 세션을 만들 때 sha256 을 함께 보내면 조각을 Django 로 보내지 않고
+응답의 upload(presigned PUT URL)로 저장소(S3 등)에 바로 올린 뒤 complete 를 호출합니다.
+완료할 때는 저장소에서 크기와 파일 앞부분(헤더)만 확인합니다.
+"""
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .image_search import fingerprint
+from .models import UploadedImage, UploadSession
+from .storage import blob_name, normalize_extension, tmp_path, upload_storage
+from .upload_handlers import HEADER_MAX_BYTES, ImageRejected, validate_header
+
+try:
+    # 같은 세션 조각의 동시 기록 방지 (Windows 는 없음: 세션 행 잠금만 사용)
+    import fcntl
+except ImportError:
+    fcntl = None
+
+COPY_CHUNK = 64 * 1024
+# 프로세스별로 보관하는 해시 진행 상태 수 (넘으면 오래된 것부터 버리고 필요할 때 다시 계산)
+MAX_HASHERS = 256
+
+
+class UploadSessionError(Exception):
+    """세션 요청 오류 (status_code 로 응답)"""
+    status_code = 400
+
+
+class OffsetMismatch(UploadSessionError):
+    """보낸 offset 이 서버가 받은 위치와 다름 (클라이언트는 GET 으로 위치를 다시 확인)"""
+    status_code = 409
+
+    def __init__(self, offset):
+        super().__init__(f"offset 이 맞지 않습니다. 서버가 받은 위치: {offset}")
+        self.offset = offset
+
+
+class SessionExpired(UploadSessionError):
+    status_code = 410
+
+
+_hashers = OrderedDict()
+_hashers_lock = threading.Lock()
+
+
+def session_dir():
+    """조각을 모으는 로컬 임시 디렉터리 (blobs/tmp/sessions)"""
+    return tmp_path("sessions")
+
+
+def session_path(session):
+    return os.path.join(session_dir(), f"{session.id}.part")
+
+
+def direct_blob_name(session):
+    """직접 업로드 세션의 blob 경로"""
+    return blob_name(session.content_hash, normalize_extension(os.path.splitext(session.file_name)[1]))
+
+
+def is_expired(session):
+    return session.updated_at < timezone.now() - timedelta(hours=settings.UPLOAD_SESSION_TTL_HOURS)
+
+
+def create_session(file_name, total_size, user=None, title="", description="", sha256=""):
+    """세션 생성 (sha256 이 있으면 직접 업로드 세션)"""
+    if total_size > settings.IMAGE_UPLOAD_MAX_BYTES:
+        raise ImageRejected(f"파일이 너무 큽니다 (최대 {settings.IMAGE_UPLOAD_MAX_BYTES / 1024 / 1024:g}MB)")
+    session = UploadSession.objects.create(
+        file_name=os.path.basename(file_name)[:255],
+        total_size=total_size,
+        user=user,
+        title=title,
+        description=description,
+        content_hash=sha256,
+    )
+    if sha256:
+        return session
+    path = session_path(session)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    open(path, "wb").close()
+    return session
+
+
+def _hasher_for(session):
+    """session.offset 까지 계산된 sha256 (없거나 위치가 다르면 임시 파일에서 따라잡음)"""
+    with _hashers_lock:
+        entry = _hashers.pop(session.pk, None)
+    if entry is not None and entry[0] == session.offset:
+        return entry[1]
+
+    hasher = hashlib.sha256()
+    remaining = session.offset
+    with open(session_path(session), "rb") as f:
+        while remaining:
+            data = f.read(min(COPY_CHUNK, remaining))
+            if not data:
+                break
+            hasher.update(data)
+            remaining -= len(data)
+    return hasher
+
+
+def _keep_hasher(session_id, offset, hasher):
+    with _hashers_lock:
+        _hashers[session_id] = (offset, hasher)
+        _hashers.move_to_end(session_id)
+        while len(_hashers) > MAX_HASHERS:
+            _hashers.popitem(last=False)
+
+
+def direct_upload(session):
+    """
+    직접 업로드 세션의 presigned PUT 정보
+
+    Returns:
+        {"method", "url", "headers"} 또는 None (같은 파일이 이미 저장되어 있어 올릴 필요 없음)
+    """
+    name = direct_blob_name(session)
+    if upload_storage.exists(name) and upload_storage.size(name) == session.total_size:
+        return None
+    upload = upload_storage.presigned_upload(
+        session.content_hash, session.total_size, os.path.splitext(session.file_name)[1]
+    )
+    return {key: upload[key] for key in ("method", "url", "headers")}
+
+
+def _check_active(session):
+    if session.status != UploadSession.STATUS_ACTIVE:
+        raise UploadSessionError("이미 완료된 업로드 세션입니다.")
+    if is_expired(session):
+        raise SessionExpired("만료된 업로드 세션입니다. 새 세션을 만들어 주세요.")
+
+
+@contextmanager
+def _open_part(session):
+    """쓰기용으로 연 임시 파일 (다른 요청/프로세스가 쓰는 중이면 끝날 때까지 대기)"""
+    try:
+        f = open(session_path(session), "r+b")
+    except FileNotFoundError:
+        raise UploadSessionError("업로드 세션의 임시 파일이 없습니다. 새 세션을 만들어 주세요.")
+    with f:
+        if fcntl is not None:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        yield f
+
+
+def append_chunk(session, stream, offset, length):
+    """
+    stream 에서 length 바이트를 읽어 offset 위치에 기록
+
+    연결이 중간에 끊겨 일부만 받은 경우에도 받은 만큼은 저장하므로
+    클라이언트는 GET 으로 확인한 위치부터 이어서 보내면 됩니다.
+
+    같은 세션에 동시에 온 조각 요청은 임시 파일 잠금(flock)과 세션 행 잠금(select_for_update)으로
+    한 번에 하나씩 기록합니다. 잠금을 잡은 뒤 offset 을 다시 확인하므로 같은 offset 으로 온
+    두 번째 요청은 파일에 쓰지 않고 409 가 됩니다. (SQLite 는 행 잠금이 없어 파일 잠금이 순서를 보장)
+
+    Returns:
+        새 offset
+    """
+    _check_active(session)
+    if session.content_hash:
+        raise UploadSessionError("직접 업로드 세션입니다. 세션 생성 응답의 upload URL 로 파일을 올려 주세요.")
+
+    rejected = None
+    with _open_part(session) as f, transaction.atomic():
+        # 잠금을 잡은 뒤의 상태로 다시 확인 (먼저 온 요청이 offset 을 옮겼거나 완료했을 수 있음)
+        locked = UploadSession.objects.select_for_update().get(pk=session.pk)
+        _check_active(locked)
+        if offset != locked.offset:
+            raise OffsetMismatch(locked.offset)
+        if offset + length > locked.total_size:
+            raise UploadSessionError(f"선언한 파일 크기({locked.total_size} 바이트)를 넘습니다.")
+
+        hasher = _hasher_for(locked)
+        written = 0
+        f.seek(offset)
+        # 이전 요청이 중간에 끊기며 남긴 offset 이후의 데이터 제거
+        f.truncate()
+        while written < length:
+            data = stream.read(min(COPY_CHUNK, length - written))
+            if not data:
+                break
+            f.write(data)
+            hasher.update(data)
+            written += len(data)
+        f.flush()
+
+        new_offset = offset + written
+        if not locked.header_checked and new_offset >= min(HEADER_MAX_BYTES, locked.total_size):
+            f.seek(0)
+            try:
+                validate_header(f.read(HEADER_MAX_BYTES), locked.total_size)
+            except ImageRejected as e:
+                rejected = e
+            else:
+                locked.header_checked = True
+
+        if rejected is None:
+            locked.offset = new_offset
+            locked.save(update_fields=["offset", "header_checked", "updated_at"])
+
+    if rejected is not None:
+        # 잠금을 푼 뒤 세션과 임시 파일 삭제
+        discard(locked)
+        raise rejected
+    _keep_hasher(locked.pk, new_offset, hasher)
+    session.offset = new_offset
+    session.header_checked = locked.header_checked
+    session.updated_at = locked.updated_at
+    return new_offset
+
+
+def complete_session(session):
+    """
+    받은 파일을 blob 으로 옮기고 UploadedImage 생성 (이미 완료된 세션이면 그 이미지 반환)
+
+    Returns:
+        (UploadedImage, 새로 만들었는지)
+    """
+    if session.status == UploadSession.STATUS_COMPLETED and session.uploaded_image_id:
+        return session.uploaded_image, False
+    _check_active(session)
+    if session.content_hash:
+        return _complete_direct(session)
+    if session.offset != session.total_size:
+        raise UploadSessionError(f"아직 모든 데이터를 받지 못했습니다. ({session.offset}/{session.total_size} 바이트)")
+    if not session.header_checked:
+        raise ImageRejected("이미지 파일이 아니거나 손상된 파일입니다.")
+
+    # 완료 요청이 동시에 와도 한 번만 처리
+    claimed = UploadSession.objects.filter(pk=session.pk, status=UploadSession.STATUS_ACTIVE).update(
+        status=UploadSession.STATUS_COMPLETING
+    )
+    if not claimed:
+        raise UploadSessionError("다른 요청에서 완료 처리 중입니다.")
+
+    try:
+        path = session_path(session)
+        digest = _hasher_for(session).hexdigest()
+        phash, signature = fingerprint(path)
+        name = upload_storage.commit_file(path, digest, os.path.splitext(session.file_name)[1].lower())
+    except BaseException:
+        UploadSession.objects.filter(pk=session.pk).update(status=UploadSession.STATUS_ACTIVE)
+        raise
+
+    uploaded_image = UploadedImage(
+        image=name,
+        content_hash=digest,
+        phash=phash,
+        signature=signature,
+        title=session.title,
+        description=session.description,
+    )
+    uploaded_image.save()
+    _mark_completed(session, uploaded_image)
+    with _hashers_lock:
+        _hashers.pop(session.pk, None)
+    return uploaded_image, True
+
+
+def _mark_completed(session, uploaded_image):
+    session.status = UploadSession.STATUS_COMPLETED
+    session.uploaded_image = uploaded_image
+    session.offset = session.total_size
+    session.save(update_fields=["status", "uploaded_image", "offset", "updated_at"])
+
+
+def _complete_direct(session):
+    """
+    저장소에 직접 올라온 blob 확인 후 UploadedImage 생성
+
+    내용은 저장소가 업로드할 때 sha256 으로 검증하므로 여기서는 크기와 헤더만 읽습니다.
+    지각 해시(phash)와 검색용 서명은 업로드 후처리(transcode.process_upload)에서 채웁니다.
+    """
+    name = direct_blob_name(session)
+    if not upload_storage.exists(name):
+        raise UploadSessionError("아직 파일이 업로드되지 않았습니다. upload URL 로 파일을 올린 뒤 완료해 주세요.")
+    if upload_storage.size(name) != session.total_size:
+        raise UploadSessionError(f"업로드된 파일 크기가 선언한 크기({session.total_size} 바이트)와 다릅니다.")
+    # 검사에 실패한 blob 은 참조가 없으므로 gc_blobs 가 정리
+    validate_header(upload_storage.read_header(name, HEADER_MAX_BYTES), session.total_size)
+
+    claimed = UploadSession.objects.filter(pk=session.pk, status=UploadSession.STATUS_ACTIVE).update(
+        status=UploadSession.STATUS_COMPLETING
+    )
+    if not claimed:
+        raise UploadSessionError("다른 요청에서 완료 처리 중입니다.")
+
+    uploaded_image = UploadedImage(
+        image=name,
+        content_hash=session.content_hash,
+        title=session.title,
+        description=session.description,
+    )
+    uploaded_image.save()
+    _mark_completed(session, uploaded_image)
+    return uploaded_image, True
+
+
+def discard(session):
+    """임시 파일과 세션 삭제"""
+    with _hashers_lock:
+        _hashers.pop(session.pk, None)
+    if not session.content_hash:
+        try:
+            os.unlink(session_path(session))
+        except FileNotFoundError:
+            pass
+    session.delete()
@@ -1,5 +1,9 @@
+from django.conf import settings
 from rest_framework import serializers
-from .models import Travel_Schedule, UploadedImage, User
+from .models import Travel_Schedule, TravelDayRevision, UploadedImage, UploadSession, User
+from .image_search import fingerprint
+from .storage import content_hash_from_name
+from .variants import variant_urls
 
 class UserRegisterSerializer(serializers.ModelSerializer):
     """회원가입 Serializer"""
@@ -12,7 +16,12 @@ class UserRegisterSerializer(serializers.ModelSerializer):
     
     def create(self, validated_data):
         user = User(username=validated_data['username'])
-        user.set_password(validated_data['password'])
+        # 뷰에서 해시 풀(hashing.py)로 미리 계산한 해시가 있으면 사용
+        encoded_password = validated_data.get('encoded_password')
+        if encoded_password:
+            user.password = encoded_password
+        else:
+            user.set_password(validated_data['password'])
         user.save()
         return user
 
@@ -44,6 +53,21 @@ class UserDetailSerializer(serializers.ModelSerializer):
         read_only_fields = ('id', 'username', 'created_at', 'updated_at')
 
 
+class UserListQuerySerializer(serializers.Serializer):
+    """유저 목록 조회 파라미터 Serializer"""
+    COUNT_CHOICES = ('none', 'approx', 'exact')
+
+    limit = serializers.IntegerField(
+        min_value=1, max_value=settings.USER_LIST_MAX_PAGE_SIZE, required=False, default=settings.USER_LIST_PAGE_SIZE,
+        help_text=f"📄 페이지 크기 (기본 {settings.USER_LIST_PAGE_SIZE}, 최대 {settings.USER_LIST_MAX_PAGE_SIZE})"
+    )
+    cursor = serializers.CharField(required=False, allow_blank=True, default='', help_text="➡️ 이전 응답의 next 값")
+    count = serializers.ChoiceField(
+        choices=COUNT_CHOICES, required=False, default='approx',
+        help_text="🔢 전체 유저 수: none(생략) / approx(근사값, 기본) / exact(정확한 값)"
+    )
+
+
 class TravelScheduleSerializer(serializers.ModelSerializer):
     class Meta:
         model = Travel_Schedule
@@ -70,16 +94,121 @@ class TravelScheduleDetailSerializer(serializers.ModelSerializer):
         read_only_fields = ('id', 'username', 'created_at')
 
 
+class TravelDayRegenerateSerializer(serializers.Serializer):
+    """하루 일정 재생성 요청 Serializer"""
+    feedback = serializers.CharField(
+        required=False,
+        allow_blank=True,
+        default='',
+        max_length=255,
+        help_text="💬 수정 요청 (예: 실내 위주로, 오전 일정은 여유 있게)"
+    )
+
+
+class TravelDayRevisionSerializer(serializers.ModelSerializer):
+    """교체되기 전 하루 일정 Serializer"""
+
+    class Meta:
+        model = TravelDayRevision
+        fields = ['id', 'day', 'segments', 'created_at']
+        read_only_fields = fields
+
+
 class ImageUploadSerializer(serializers.ModelSerializer):
     image = serializers.ImageField()
     title = serializers.CharField(max_length=100, required=False, allow_blank=True, default='')
     description = serializers.CharField(required=False, allow_blank=True, default='')
+    variants = serializers.SerializerMethodField(
+        help_text="썸네일/너비별 축소본 {thumb, w320, ...: {url, width, height}} (생성 전이면 null)"
+    )
     
     class Meta:
         model = UploadedImage
-        fields = ['id', 'image', 'title', 'description', 'uploaded_at']
+        fields = ['id', 'image', 'title', 'description', 'uploaded_at', 'variants']
         read_only_fields = ('id', 'uploaded_at')
 
+    def get_variants(self, obj):
+        return variant_urls(obj.variants, self.context.get('request'))
+
+    def create(self, validated_data):
+        instance = build_uploaded_image(**validated_data)
+        instance.save()
+        return instance
+
+
+class ImageBatchUploadSerializer(serializers.Serializer):
+    """여러 이미지 일괄 분석 요청 Serializer"""
+    images = serializers.ListField(
+        child=serializers.ImageField(),
+        allow_empty=False,
+        max_length=settings.IMAGE_BATCH_MAX_FILES,
+        help_text=f"분석할 이미지 파일들 (최대 {settings.IMAGE_BATCH_MAX_FILES}장)"
+    )
+    force_refresh = serializers.BooleanField(required=False, default=False)
+
+
+class ImageSearchQuerySerializer(serializers.Serializer):
+    """저장된 이미지로 비슷한 이미지 검색 요청 Serializer"""
+    image_id = serializers.IntegerField(min_value=1, help_text="🖼️ 기준 이미지 ID")
+    k = serializers.IntegerField(
+        min_value=1, max_value=settings.IMAGE_SEARCH_MAX_RESULTS, required=False, default=10,
+        help_text=f"🔢 결과 수 (최대 {settings.IMAGE_SEARCH_MAX_RESULTS})"
+    )
+
+
+class ImageSearchUploadSerializer(serializers.Serializer):
+    """사진 파일로 비슷한 이미지 검색 요청 Serializer (파일은 저장하지 않음)"""
+    image = serializers.ImageField(help_text="📁 검색할 이미지 파일")
+    k = serializers.IntegerField(
+        min_value=1, max_value=settings.IMAGE_SEARCH_MAX_RESULTS, required=False, default=10,
+        help_text=f"🔢 결과 수 (최대 {settings.IMAGE_SEARCH_MAX_RESULTS})"
+    )
+
+
+class UploadSessionCreateSerializer(serializers.Serializer):
+    """이어 올리기 세션 생성 요청 Serializer"""
+    file_name = serializers.CharField(max_length=255, help_text="📁 원본 파일 이름 (확장자 포함, 예: IMG_0001.jpg)")
+    total_size = serializers.IntegerField(min_value=1, help_text="📦 전체 파일 크기 (바이트)")
+    title = serializers.CharField(max_length=100, required=False, allow_blank=True, default='')
+    description = serializers.CharField(required=False, allow_blank=True, default='')
+    sha256 = serializers.RegexField(
+        r'^[0-9a-fA-F]{64}$', required=False, allow_blank=True, default='',
+        help_text="🔐 파일의 SHA-256 (hex). 보내면 presigned URL 로 저장소에 직접 올리는 세션이 됩니다"
+    )
+
+    def validate_sha256(self, value):
+        return value.lower()
+
+
+class UploadSessionSerializer(serializers.ModelSerializer):
+    """이어 올리기 세션 진행 상황 Serializer"""
+
+    class Meta:
+        model = UploadSession
+        fields = ['id', 'file_name', 'total_size', 'offset', 'status', 'content_hash', 'uploaded_image', 'created_at', 'updated_at']
+        read_only_fields = fields
+
+
+class UploadSessionCompleteSerializer(serializers.Serializer):
+    """이어 올리기 완료 요청 Serializer"""
+    analyze = serializers.BooleanField(required=False, default=False, help_text="🤖 완료 후 AI 분석까지 실행")
+    force_refresh = serializers.BooleanField(required=False, default=False)
+
+
+def build_uploaded_image(image, **fields):
+    """
+    업로드 파일을 blob 으로 저장하고, 아직 DB 에 저장하지 않은 UploadedImage 반환
+
+    지각 해시(phash), 검색용 서명(signature), 내용 해시(content_hash)를 채워 두므로
+    save() 를 거치지 않는 bulk_create 에도 그대로 사용할 수 있습니다.
+    """
+    # 저장 전에 업로드 파일에서 바로 지각 해시/서명 계산 (분석 결과 재사용, 비슷한 이미지 검색용)
+    phash, signature = fingerprint(image)
+    instance = UploadedImage(phash=phash, signature=signature, **fields)
+    instance.image.save(image.name, image, save=False)
+    instance.content_hash = content_hash_from_name(instance.image.name)
+    return instance
+
 
 class ExchangeRatePredictionSerializer(serializers.Serializer):
     """환율 예측 요청 Serializer"""
@@ -0,0 +1,59 @@
+"""
+UploadedImage 저장/삭제 시 후처리
+
+- 새 행이 저장되면 커밋 후 백그라운드에서 형식 변환과 썸네일/축소본 생성 (transcode.py)
+- blob 은 여러 행이 공유하므로 마지막 참조 행이 삭제된 경우에만 blob 과 축소본을 지웁니다.
+- User 가 저장/삭제되면 인증 캐시(authentication.py)를 지웁니다.
+"""
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from . import transcode, variants
+from .authentication import invalidate_user
+from .models import UploadedImage, User
+from .storage import content_hash_from_name
+
+
+def is_referenced(name):
+    """name 을 참조하는 행이 있는지 (보관 중인 변환 전 원본 포함)"""
+    condition = Q(image=name)
+    if settings.IMAGE_TRANSCODE_KEEP_ORIGINAL:
+        condition |= Q(original_image=name)
+    return UploadedImage.objects.filter(condition).exists()
+
+
+def release_blob(storage, name):
+    """참조하는 행이 없고 최근에 다시 올라오지 않은 blob 삭제"""
+    if is_referenced(name):
+        return
+    # 방금 같은 파일이 다시 업로드되었을 수 있으므로 유예 기간 안의 blob 은 gc_blobs 에 맡김
+    if storage.is_recent(name):
+        return
+    storage.delete(name)
+    variants.delete_variants(storage, name)
+
+
+@receiver(post_save, sender=UploadedImage)
+def schedule_postprocess(sender, instance, created, **kwargs):
+    # bulk_create 는 post_save 를 보내지 않으므로 호출하는 쪽에서 transcode.schedule 사용
+    if created and instance.image and not instance.variants:
+        transcode.schedule([instance.image.name])
+
+
+@receiver(post_delete, sender=UploadedImage)
+def delete_unreferenced_blob(sender, instance, **kwargs):
+    storage = instance.image.storage
+    for name in (instance.image.name, instance.original_image):
+        if content_hash_from_name(name):
+            transaction.on_commit(lambda name=name: release_blob(storage, name))
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_cached_user(sender, instance, **kwargs):
+    invalidate_user(instance.pk)
+    # 커밋 전에 다른 요청이 예전 값을 다시 캐시했을 수 있으므로 커밋 후 한 번 더
+    transaction.on_commit(lambda: invalidate_user(instance.pk))
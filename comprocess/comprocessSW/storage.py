@@ -0,0 +1,476 @@
+"""
+내용 주소 기반(content-addressed) 업로드 저장소
+
+업로드 파일을 임시 파일에 쓰는 동안 SHA-256 을 계산하고
+blobs/<앞 2자리>/<다음 2자리>/<sha256><확장자> 경로에 한 번만 저장합니다.
+(샤드 깊이/폭은 MEDIA_SHARD_DEPTH, MEDIA_SHARD_WIDTH 로 설정)
+같은 파일을 여러 번 올려도 blob 은 하나이고, 여러 UploadedImage 행이 같은 경로를 참조합니다.
+
+- 참조 수는 같은 경로를 가리키는 UploadedImage 행 수입니다 (별도 카운터 없음).
+- 행이 삭제되어 참조가 0 이 되면 signals.py 에서 blob 을 지우고,
+  남은 고아 blob/임시 파일은 manage.py gc_blobs 로 정리합니다.
+
+저장 위치는 UPLOAD_STORAGE 로 선택합니다.
+- local: MEDIA_ROOT 디스크 (ContentAddressedStorage, 개발/테스트용 대역도 겸함)
+- s3:    S3 호환 오브젝트 스토리지 (S3ContentAddressedStorage, pip install boto3 필요)
+
+두 저장소 모두 presigned 업로드/다운로드 URL 을 만들 수 있어서,
+클라이언트가 이미지 바이트를 Django 를 거치지 않고 직접 올리고 받을 수 있습니다.
+임시 파일(이어 올리기 조각 등)은 어느 저장소든 로컬 MEDIA_ROOT/blobs/tmp 에 둡니다.
+"""
+import base64
+import hashlib
+import mimetypes
+import os
+import re
+import tempfile
+import time
+from urllib.parse import quote, urlencode
+
+from django.conf import settings
+from django.core import signing
+from django.core.exceptions import ImproperlyConfigured
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage, Storage
+from django.urls import reverse
+from django.utils.deconstruct import deconstructible
+from django.utils.functional import cached_property
+
+try:
+    # S3 저장소는 선택 사항 (pip install boto3)
+    import boto3
+    from botocore.config import Config
+    from botocore.exceptions import ClientError
+except ImportError:
+    boto3 = None
+
+BLOB_DIR = "blobs"
+TMP_DIR = "tmp"
+# 샤드 설정이 바뀌어도 예전 경로를 그대로 인식하도록 깊이는 고정하지 않음
+BLOB_NAME = re.compile(r"^blobs/(?:[0-9a-f]+/)*([0-9a-f]{64})(\.[a-z0-9]+)?$")
+EXTENSION = re.compile(r"^\.[a-z0-9]{1,8}$")
+DIRECT_UPLOAD_SALT = "comprocessSW.storage.direct-upload"
+DOWNLOAD_SALT = "comprocessSW.storage.download"
+# S3 에서 읽은 파일은 이 크기까지 메모리에 두고 넘으면 임시 파일로
+SPOOL_MAX_BYTES = 8 * 1024 * 1024
+
+
+class BlobVerificationError(ValueError):
+    """직접 업로드한 파일의 크기/해시가 선언한 값과 다름"""
+
+
+def shard_path(digest, depth=None, width=None):
+    """
+    해시 앞부분으로 만든 하위 디렉터리 경로
+
+    기본값(MEDIA_SHARD_DEPTH=2, MEDIA_SHARD_WIDTH=2)이면 'ab/cd' 이고
+    디렉터리 하나에 최대 256개 하위 디렉터리만 생깁니다.
+    """
+    depth = settings.MEDIA_SHARD_DEPTH if depth is None else depth
+    width = settings.MEDIA_SHARD_WIDTH if width is None else width
+    return "/".join(digest[i * width:(i + 1) * width] for i in range(depth))
+
+
+def normalize_extension(extension):
+    extension = (extension or "").lower()
+    return extension if EXTENSION.match(extension) else ""
+
+
+def blob_name(digest, extension=""):
+    """sha256 hex 에 해당하는 저장 경로"""
+    shards = shard_path(digest)
+    return f"{BLOB_DIR}/{shards}/{digest}{extension}" if shards else f"{BLOB_DIR}/{digest}{extension}"
+
+
+def content_hash_from_name(name):
+    """blob 경로에서 sha256 추출 (blob 경로가 아니면 '')"""
+    match = BLOB_NAME.match(name or "")
+    return match.group(1) if match else ""
+
+
+def tmp_path(*parts):
+    """로컬 임시 파일 경로 (MEDIA_ROOT/blobs/tmp/...)"""
+    return os.path.join(settings.MEDIA_ROOT, BLOB_DIR, TMP_DIR, *parts)
+
+
+def content_type_for(name):
+    return mimetypes.guess_type(name)[0] or "application/octet-stream"
+
+
+class ContentAddressedMixin:
+    """
+    업로드 저장소 공통 동작
+
+    저장소별로 commit_file, save_derived, is_recent, iter_files, read_header,
+    presigned_upload, download_url 을 구현합니다.
+    """
+    # MEDIA_ROOT 디스크에 파일이 있는지 (media.py 가 직접 전송할 수 있는지)
+    local = False
+
+    def tmp_dir(self):
+        return tmp_path()
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, "chunks"):
+            content = File(content, name)
+
+        extension = os.path.splitext(name)[1].lower()
+
+        tmp_dir = self.tmp_dir()
+        os.makedirs(tmp_dir, exist_ok=True)
+        digest = hashlib.sha256()
+        # 스트리밍으로 임시 파일에 쓰면서 해시 계산 (같은 파일 시스템이라 이후 rename 은 원자적)
+        with tempfile.NamedTemporaryFile(dir=tmp_dir, suffix=".part", delete=False) as tmp:
+            try:
+                for chunk in content.chunks():
+                    digest.update(chunk)
+                    tmp.write(chunk)
+            except BaseException:
+                tmp.close()
+                os.unlink(tmp.name)
+                raise
+
+        return self.commit_file(tmp.name, digest.hexdigest(), extension)
+
+    def receive_blob(self, stream, digest, size, extension=""):
+        """
+        선언한 sha256/크기로 stream 을 받아 blob 으로 저장 (로컬 직접 업로드 대역)
+
+        Raises:
+            BlobVerificationError: 받은 데이터의 크기나 sha256 이 선언과 다름
+        """
+        tmp_dir = self.tmp_dir()
+        os.makedirs(tmp_dir, exist_ok=True)
+        hasher = hashlib.sha256()
+        received = 0
+        with tempfile.NamedTemporaryFile(dir=tmp_dir, suffix=".part", delete=False) as tmp:
+            try:
+                while received <= size:
+                    data = stream.read(min(64 * 1024, size + 1 - received))
+                    if not data:
+                        break
+                    hasher.update(data)
+                    tmp.write(data)
+                    received += len(data)
+                if received != size:
+                    raise BlobVerificationError(f"크기가 다릅니다. (선언 {size}, 받은 {received} 바이트)")
+                if hasher.hexdigest() != digest:
+                    raise BlobVerificationError("sha256 이 선언한 값과 다릅니다.")
+            except BaseException:
+                tmp.close()
+                os.unlink(tmp.name)
+                raise
+        return self.commit_file(tmp.name, digest, extension)
+
+
+@deconstructible
+class ContentAddressedStorage(ContentAddressedMixin, FileSystemStorage):
+    """같은 내용의 파일을 한 번만 저장하는 FileSystemStorage (로컬 디스크)"""
+    local = True
+
+    def tmp_dir(self):
+        # blob 과 같은 파일 시스템이어야 rename 으로 옮길 수 있음
+        return self.path(f"{BLOB_DIR}/{TMP_DIR}")
+
+    def commit_file(self, tmp_path, digest, extension=""):
+        """
+        해시를 이미 계산한 임시 파일을 blob 경로로 이동 (복사/재해시 없음)
+
+        tmp_path 는 MEDIA_ROOT 와 같은 파일 시스템에 있어야 합니다. (blobs/tmp 아래)
+        """
+        final_name = blob_name(digest, normalize_extension(extension))
+        final_path = self.path(final_name)
+        if os.path.exists(final_path):
+            # 이미 있는 blob: 새로 쓰지 않고 수정 시각만 갱신 (GC 유예 기간 기준)
+            os.unlink(tmp_path)
+            os.utime(final_path)
+        else:
+            os.makedirs(os.path.dirname(final_path), exist_ok=True)
+            os.replace(tmp_path, final_path)
+            if self.file_permissions_mode is not None:
+                os.chmod(final_path, self.file_permissions_mode)
+        return final_name
+
+    def save_derived(self, name, data):
+        """
+        원본에서 만든 파일(썸네일 등)을 정해진 경로에 그대로 저장
+
+        save() 와 달리 내용 해시로 경로를 바꾸지 않고, 같은 경로가 있으면 덮어씁니다.
+        """
+        path = self.path(name)
+        tmp_dir = self.tmp_dir()
+        os.makedirs(tmp_dir, exist_ok=True)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with tempfile.NamedTemporaryFile(dir=tmp_dir, suffix=".part", delete=False) as tmp:
+            tmp.write(data)
+        os.replace(tmp.name, path)
+        if self.file_permissions_mode is not None:
+            os.chmod(path, self.file_permissions_mode)
+        return name
+
+    def is_recent(self, name, seconds=None):
+        """GC 유예 기간 안에 저장(또는 재업로드)된 blob 인지"""
+        if seconds is None:
+            seconds = settings.BLOB_GC_GRACE_SECONDS
+        try:
+            return time.time() - os.path.getmtime(self.path(name)) < seconds
+        except FileNotFoundError:
+            return False
+
+    def iter_files(self, prefix):
+        """prefix 디렉터리 아래 모든 파일 (name, 크기, 수정 시각 timestamp)"""
+        root = self.path(prefix)
+        for directory, _, files in os.walk(root):
+            for filename in files:
+                path = os.path.join(directory, filename)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                name = os.path.relpath(path, self.location).replace(os.sep, "/")
+                yield name, stat.st_size, stat.st_mtime
+
+    def read_header(self, name, length):
+        with self.open(name) as f:
+            return f.read(length)
+
+    def presigned_upload(self, digest, size, extension=""):
+        """
+        직접 업로드 URL (S3 presigned PUT 의 로컬 대역: 서명된 토큰으로 image-upload/direct/ 에 PUT)
+
+        Returns:
+            {"method", "url", "headers", "name"} (url 은 상대 경로일 수 있음)
+        """
+        name = blob_name(digest, normalize_extension(extension))
+        token = signing.dumps({"sha256": digest, "size": size, "ext": normalize_extension(extension)}, salt=DIRECT_UPLOAD_SALT)
+        return {
+            "method": "PUT",
+            "url": reverse("direct-upload", args=[token]),
+            "headers": {"Content-Type": content_type_for(name)},
+            "name": name,
+        }
+
+    @staticmethod
+    def load_upload_token(token):
+        """presigned_upload 토큰 확인. 만료/위조면 signing.BadSignature"""
+        return signing.loads(token, salt=DIRECT_UPLOAD_SALT, max_age=settings.UPLOAD_PRESIGN_EXPIRES)
+
+    def download_url(self, name, expires=None):
+        """
+        서명된 다운로드 URL (MEDIA_REQUIRE_AUTH 여도 인증 없이 받을 수 있음)
+
+        만료 시각을 expires 단위로 올림해서 같은 구간 안에서는 URL 이 같으므로 브라우저 캐시가 유지됩니다.
+        """
+        expires = expires or settings.UPLOAD_PRESIGN_EXPIRES
+        deadline = (int(time.time()) // expires + 2) * expires
+        signature = signing.Signer(salt=DOWNLOAD_SALT).signature(f"{name}:{deadline}")
+        return f"{self.url(name)}?{urlencode({'expires': deadline, 'signature': signature})}"
+
+    @staticmethod
+    def check_download_signature(name, deadline, signature):
+        try:
+            deadline = int(deadline)
+        except (TypeError, ValueError):
+            return False
+        expected = signing.Signer(salt=DOWNLOAD_SALT).signature(f"{name}:{deadline}")
+        return deadline > time.time() and signing.constant_time_compare(expected, signature or "")
+
+
+@deconstructible
+class S3ContentAddressedStorage(ContentAddressedMixin, Storage):
+    """
+    S3 호환 오브젝트 스토리지 (AWS S3, MinIO, Cloudflare R2 등)
+
+    파일 이름(blob 경로)을 그대로 오브젝트 키로 사용합니다. (UPLOAD_S3_PREFIX 를 앞에 붙임)
+    """
+
+    def __init__(self, bucket=None, prefix=None):
+        if boto3 is None:
+            raise ImproperlyConfigured("UPLOAD_STORAGE=s3 를 사용하려면 boto3 를 설치하세요. (pip install boto3)")
+        self.bucket = bucket or settings.UPLOAD_S3_BUCKET
+        if not self.bucket:
+            raise ImproperlyConfigured("UPLOAD_S3_BUCKET 을 설정하세요.")
+        self.prefix = (settings.UPLOAD_S3_PREFIX if prefix is None else prefix).strip("/")
+
+    @cached_property
+    def client(self):
+        # boto3 클라이언트는 스레드 간 공유 가능 (자격 증명이 비어 있으면 기본 체인 사용: 환경 변수, IAM 역할 등)
+        return boto3.client(
+            "s3",
+            endpoint_url=settings.UPLOAD_S3_ENDPOINT_URL or None,
+            region_name=settings.UPLOAD_S3_REGION or None,
+            aws_access_key_id=settings.UPLOAD_S3_ACCESS_KEY_ID or None,
+            aws_secret_access_key=settings.UPLOAD_S3_SECRET_ACCESS_KEY or None,
+            config=Config(
+                signature_version="s3v4",
+                # AWS 는 리전 주소로 서명해야 presigned URL 이 리다이렉트 없이 동작, MinIO 등은 경로 방식
+                s3={"addressing_style": "path" if settings.UPLOAD_S3_ENDPOINT_URL else "virtual"},
+                retries={"max_attempts": 5, "mode": "standard"},
+            ),
+        )
+
+    def key(self, name):
+        return f"{self.prefix}/{name}" if self.prefix else name
+
+    def name_from_key(self, key):
+        return key[len(self.prefix) + 1:] if self.prefix else key
+
+    def _head(self, name):
+        try:
+            return self.client.head_object(Bucket=self.bucket, Key=self.key(name))
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+                return None
+            raise
+
+    def _open(self, name, mode="rb"):
+        if "w" in mode or "a" in mode:
+            raise ValueError("S3 저장소 파일은 읽기 전용으로만 열 수 있습니다.")
+        # Pillow 는 seek 가 필요하므로 스트림을 그대로 넘기지 않고 받아 둠
+        spooled = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_BYTES)
+        try:
+            self.client.download_fileobj(self.bucket, self.key(name), spooled)
+        except ClientError as e:
+            spooled.close()
+            if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+                raise FileNotFoundError(name) from e
+            raise
+        spooled.seek(0)
+        return File(spooled, name)
+
+    def _save(self, name, content):
+        content.seek(0)
+        self.client.upload_fileobj(
+            content, self.bucket, self.key(name), ExtraArgs={"ContentType": content_type_for(name)}
+        )
+        return name
+
+    def commit_file(self, tmp_path, digest, extension=""):
+        """해시를 이미 계산한 로컬 임시 파일을 blob 키로 업로드하고 임시 파일 삭제"""
+        final_name = blob_name(digest, normalize_extension(extension))
+        try:
+            if self._head(final_name) is None:
+                self.client.upload_file(
+                    tmp_path, self.bucket, self.key(final_name),
+                    ExtraArgs={
+                        "ContentType": content_type_for(final_name),
+                        "ChecksumSHA256": base64.b64encode(bytes.fromhex(digest)).decode(),
+                    },
+                )
+            else:
+                self._touch(final_name)
+        finally:
+            os.unlink(tmp_path)
+        return final_name
+
+    def _touch(self, name):
+        """이미 있는 blob 의 LastModified 갱신 (GC 유예 기간 기준, 같은 키로 복사)"""
+        self.client.copy_object(
+            Bucket=self.bucket, Key=self.key(name),
+            CopySource={"Bucket": self.bucket, "Key": self.key(name)},
+            MetadataDirective="REPLACE", ContentType=content_type_for(name),
+        )
+
+    def save_derived(self, name, data):
+        self.client.put_object(Bucket=self.bucket, Key=self.key(name), Body=data, ContentType=content_type_for(name))
+        return name
+
+    def delete(self, name):
+        self.client.delete_object(Bucket=self.bucket, Key=self.key(name))
+
+    def exists(self, name):
+        return self._head(name) is not None
+
+    def size(self, name):
+        head = self._head(name)
+        if head is None:
+            raise FileNotFoundError(name)
+        return head["ContentLength"]
+
+    def get_modified_time(self, name):
+        head = self._head(name)
+        if head is None:
+            raise FileNotFoundError(name)
+        return head["LastModified"]
+
+    def is_recent(self, name, seconds=None):
+        if seconds is None:
+            seconds = settings.BLOB_GC_GRACE_SECONDS
+        head = self._head(name)
+        return head is not None and time.time() - head["LastModified"].timestamp() < seconds
+
+    def listdir(self, path):
+        prefix = self.key(path).rstrip("/") + "/" if path else (f"{self.prefix}/" if self.prefix else "")
+        directories, files = [], []
+        paginator = self.client.get_paginator("list_objects_v2")
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=prefix, Delimiter="/"):
+            directories.extend(p["Prefix"][len(prefix):].rstrip("/") for p in page.get("CommonPrefixes", []))
+            files.extend(o["Key"][len(prefix):] for o in page.get("Contents", []))
+        return directories, files
+
+    def iter_files(self, prefix):
+        paginator = self.client.get_paginator("list_objects_v2")
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=self.key(prefix).rstrip("/") + "/"):
+            for item in page.get("Contents", []):
+                yield self.name_from_key(item["Key"]), item["Size"], item["LastModified"].timestamp()
+
+    def read_header(self, name, length):
+        response = self.client.get_object(Bucket=self.bucket, Key=self.key(name), Range=f"bytes=0-{length - 1}")
+        return response["Body"].read()
+
+    def url(self, name):
+        if settings.UPLOAD_S3_PUBLIC_URL:
+            # CDN/공개 버킷: 서명 없이 고정 URL (blob 은 내용이 바뀌지 않아 오래 캐시 가능)
+            return f"{settings.UPLOAD_S3_PUBLIC_URL.rstrip('/')}/{quote(self.key(name))}"
+        return self.download_url(name)
+
+    def download_url(self, name, expires=None):
+        return self.client.generate_presigned_url(
+            "get_object",
+            Params={"Bucket": self.bucket, "Key": self.key(name)},
+            ExpiresIn=expires or settings.UPLOAD_PRESIGN_EXPIRES,
+        )
+
+    def presigned_upload(self, digest, size, extension=""):
+        """
+        presigned PUT URL
+
+        x-amz-checksum-sha256 헤더를 서명에 포함하므로 S3 가 받은 내용이 선언한 sha256 과 다르면 거부합니다.
+        """
+        name = blob_name(digest, normalize_extension(extension))
+        checksum = base64.b64encode(bytes.fromhex(digest)).decode()
+        url = self.client.generate_presigned_url(
+            "put_object",
+            Params={
+                "Bucket": self.bucket,
+                "Key": self.key(name),
+                "ContentType": content_type_for(name),
+                "ContentLength": size,
+                "ChecksumSHA256": checksum,
+            },
+            ExpiresIn=settings.UPLOAD_PRESIGN_EXPIRES,
+        )
+        return {
+            "method": "PUT",
+            "url": url,
+            "headers": {"Content-Type": content_type_for(name), "x-amz-checksum-sha256": checksum},
+            "name": name,
+        }
+
+
+def create_upload_storage():
+    if settings.UPLOAD_STORAGE == "s3":
+        return S3ContentAddressedStorage()
+    if settings.UPLOAD_STORAGE != "local":
+        raise ImproperlyConfigured(f"UPLOAD_STORAGE 는 local 또는 s3 이어야 합니다. (현재: {settings.UPLOAD_STORAGE})")
+    return ContentAddressedStorage()
+
+
+upload_storage = create_upload_storage()
+
+
+def get_upload_storage():
+    """UploadedImage.image 의 storage (마이그레이션에는 이 함수 경로만 기록됨)"""
+    return upload_storage
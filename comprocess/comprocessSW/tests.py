@@ -1,3 +1,1438 @@
-from django.test import TestCase
+import asyncio
+import base64
+import hashlib
+import io
+import json
+import os
+import tempfile
+import threading
+import time
+import types
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+
+from django.conf import settings
+from django.core import signing
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.files.uploadhandler import SkipFile
+from django.core.management import CommandError, call_command
+from django.db import connections
+from django.test import AsyncClient, RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from PIL import Image, ImageDraw
+from rest_framework.test import APIClient
+
+from comprocessSW import (
+    authentication, background, hashing, image_hash, image_search, pagination, plan_cache, resumable, signals, storage,
+    transcode, upload_handlers, variants, views,
+)
+from comprocessSW.ai_module import image_preprocess, kjy, kwy, postprocess, route_optimizer, travel_schema
+from comprocessSW.ai_module.json_repair import parse_plan
+from comprocessSW.ai_module.travel_schema import TRAVEL_PLAN_SCHEMA
+from comprocessSW.models import Travel_Schedule, TravelDayRevision, UploadedImage, UploadSession, User
+from comprocessSW.serializers import ImageUploadSerializer
+
+SKELETON = {
+    "destination": "오사카",
+    "date": {"start": "2026-03-01", "end": "2026-03-03", "days": 3},
+    "travelers": {"count": 2, "profile": ""},
+    "preferences": {"themes": [], "pace": "", "diet": {"allergies": [], "restrictions": []}},
+    "outline": [
+        {"day": day, "date": f"2026-03-0{day}", "theme": "", "anchor_poi": ""} for day in (1, 2, 3)
+    ],
+    "costs": {"currency": "JPY"},
+}
+LOCMEM_CACHE = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+USAGE = {"model": "m", "calls": 1, "prompt_tokens": 1, "completion_tokens": 1, "cached_tokens": 0, "total_tokens": 2}
+
+
+def fake_create_json(failing_days=(), attempts=None):
+    """골격은 SKELETON, 날짜는 failing_days 에 있으면 잘못된 JSON(ValueError)을 돌려주는 _create_json"""
+    async def create_json(instructions, prompt, name, schema):
+        if name == "travel_skeleton":
+            return SKELETON, dict(USAGE)
+        day = int(prompt.rsplit("plan day: ", 1)[1].split()[0])
+        if attempts is not None:
+            attempts[day] = attempts.get(day, 0) + 1
+        if day in failing_days:
+            raise ValueError("Invalid JSON returned from AI (travel_day: unrecoverable)")
+        segment = {"time": "10:00-12:00", "title": "t", "poi": f"poi{day}", "duration_min": 120,
+                   "transport": "", "cost_local": 0, "booking_needed": False}
+        return {"day": day, "segments": [segment]}, dict(USAGE)
+    return create_json
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class FanoutFailureTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def generate(self, **kwargs):
+        with mock.patch.object(kjy, "_create_json", fake_create_json(**kwargs)), \
+                mock.patch.object(kjy, "FANOUT_MIN_DAYS", 3):
+            return asyncio.run(kjy.generate_travel_plan_result("오사카", "", "2026-03-01 ~ 2026-03-03", "", ""))
+
+    def test_failed_day_is_retried_and_marked(self):
+        attempts = {}
+        plan, usage, status = self.generate(failing_days=(2,), attempts=attempts)
+        self.assertEqual(status, "partial")
+        self.assertEqual(usage["failed_days"], [2])
+        self.assertEqual(usage["mode"], "fanout")
+        self.assertEqual(attempts[2], kjy.FANOUT_DAY_RETRIES + 1)
+        self.assertEqual([len(day["segments"]) for day in plan["itinerary"]], [1, 0, 1])
+
+    def test_every_day_failing_is_a_handled_failure(self):
+        plan, usage, status = self.generate(failing_days=(1, 2, 3))
+        self.assertEqual(status, "failed")
+        self.assertIn("error", plan)
+
+    def test_view_returns_502_and_keeps_usage(self):
+        async def failed(*args):
+            return {"error": "AI request failed"}, {"calls": 1}, "failed"
+
+        with mock.patch("comprocessSW.views.generate_travel_plan_result", failed):
+            response = APIClient().post("/comprocessSW/travel-plan/", {
+                "destination": "오사카", "budget": "10만엔", "travel_date": "2026-03-01", "preferences": "맛집", "extra": "없음"
+            }, format="json")
+        self.assertEqual(response.status_code, 502)
+        schedule = Travel_Schedule.objects.get(id=response.json()["schedule_id"])
+        self.assertEqual(schedule.ai_result, {"error": "AI request failed"})
+        self.assertEqual(schedule.ai_usage["json_status"], "failed")
+
+    def test_merge_usage_keeps_mode(self):
+        merged = kjy.merge_usage([dict(USAGE, mode="fanout"), dict(USAGE)], 10)
+        self.assertEqual(merged["mode"], "fanout")
+        self.assertEqual(merged["calls"], 2)
+
+
+class PlanSimilarityIndexTests(TestCase):
+    def schedule(self, destination, preferences, ai_result):
+        return Travel_Schedule.objects.create(
+            destination=destination, budget="50만원", travel_date="2026-03-01 ~ 2026-03-02",
+            preferences=preferences, extra="", ai_result=ai_result
+        )
+
+    def test_load_skips_unusable_plans_in_db(self):
+        ok = self.schedule("부산", "해변", {"itinerary": [{"day": 1}]})
+        self.schedule("부산", "맛집", {"error": "AI request failed"})
+        self.schedule("부산", "카페", {"itinerary": []})
+        index = plan_cache.PlanSimilarityIndex(capacity=10)
+        index.load()
+        self.assertEqual(index.size, 1)
+        group = plan_cache.similarity_group("부산", "50만원", "2026-03-01 ~ 2026-03-02", "")
+        self.assertEqual(index.groups[group][0], [ok.id])
+
+    def test_add_when_full_evicts_oldest_without_reloading(self):
+        index = plan_cache.PlanSimilarityIndex(capacity=2)
+        index.load()
+        busan, jeju = ("busan", 2), ("jeju", 2)
+        index.add(1, busan, "해변")
+        index.add(2, jeju, "오름")
+        with self.assertNumQueries(0):
+            index.add(3, busan, "맛집")
+            index.add(4, busan, "카페")
+        self.assertEqual(index.size, 2)
+        self.assertNotIn(jeju, index.groups)
+        self.assertEqual(index.groups[busan][0], [3, 4])
+        expected = (index.groups[busan][1] > 0).sum(axis=0)
+        self.assertTrue((index.df == expected).all())
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class PlanTemplateBudgetTests(TestCase):
+    PLAN = {"itinerary": [{"day": 1, "segments": []}], "date": {}}
+
+    def setUp(self):
+        cache.clear()
+
+    def test_budget_bucket(self):
+        self.assertEqual(plan_cache.budget_bucket("50만원"), plan_cache.budget_bucket("500,000 원"))
+        self.assertEqual(plan_cache.budget_bucket("500krw"), "krw:8")
+        self.assertNotEqual(plan_cache.budget_bucket("10만원"), plan_cache.budget_bucket("100만원"))
+        self.assertNotEqual(plan_cache.budget_bucket("10만엔"), plan_cache.budget_bucket("10만원"))
+
+    def test_template_is_served_only_for_same_budget_bucket(self):
+        plan_cache.store_template("부산", 1, "해변", "100만원", self.PLAN)
+        plan, info = plan_cache.lookup("부산", "80만원", "2026-03-01", "해변", "")
+        self.assertEqual(info["type"], "template")
+        self.assertIsNone(plan_cache.lookup("부산", "10만원", "2026-03-01", "해변", ""))
+
+
+class KrwRateTests(TestCase):
+    def setUp(self):
+        postprocess._rates.clear()
+
+    def test_failure_is_not_cached(self):
+        predictor = mock.Mock()
+        predictor.predict_exchange_rate.return_value = {"success": True, "predicted_rate": 1400.0}
+        with mock.patch.object(postprocess, "get_predictor", side_effect=RuntimeError):
+            self.assertIsNone(postprocess.krw_rate("USD", 2026, 3))
+        with mock.patch.object(postprocess, "get_predictor", return_value=predictor):
+            self.assertEqual(postprocess.krw_rate("USD", 2026, 3), 1400.0)
+            self.assertEqual(postprocess.krw_rate("USD", 2026, 3), 1400.0)
+        predictor.predict_exchange_rate.assert_called_once()
+
+    def test_failed_load_is_retried_after_backoff(self):
+        with mock.patch.object(postprocess, "_predictor", None), \
+                mock.patch.object(postprocess, "_predictor_failed_at", None), \
+                mock.patch.object(postprocess, "ExchangeRatePredictor", side_effect=FileNotFoundError) as load:
+            for _ in range(3):
+                with self.assertRaises(Exception):
+                    postprocess.get_predictor()
+            self.assertEqual(load.call_count, 1)
+            postprocess._predictor_failed_at -= postprocess.PREDICTOR_RETRY_SECONDS
+            with self.assertRaises(FileNotFoundError):
+                postprocess.get_predictor()
+            self.assertEqual(load.call_count, 2)
+
+
+class RouteOptimizerTests(TestCase):
+    def segment(self, time, poi, duration_min):
+        return {"time": time, "title": poi, "poi": poi, "duration_min": duration_min,
+                "transport": "도보", "cost_local": 0, "booking_needed": False}
+
+    def test_only_slots_of_equal_length_are_swapped(self):
+        day = {"day": 1, "segments": [
+            self.segment("09:00-10:00", "경복궁", 60),
+            self.segment("10:00-14:00", "롯데월드", 240),
+            self.segment("14:00-15:00", "창덕궁", 60),
+            self.segment("15:00-16:00", "코엑스", 50),
+        ]}
+        before, after = route_optimizer.optimize_day(day)
+        self.assertLess(after, before)
+
+        segments = day["segments"]
+        self.assertEqual([s["poi"] for s in segments], ["코엑스", "롯데월드", "창덕궁", "경복궁"])
+        self.assertEqual(segments[1]["time"], "10:00-14:00")
+        # 각 장소는 자기 소요 시간을 유지
+        self.assertEqual({s["poi"]: s["duration_min"] for s in segments},
+                         {"경복궁": 60, "롯데월드": 240, "창덕궁": 60, "코엑스": 50})
+
+    def test_first_located_slot_keeps_its_own_transport(self):
+        day = {"day": 1, "segments": [
+            self.segment("09:00-10:00", "경복궁", 60),
+            self.segment("10:00-14:00", "롯데월드", 240),
+            self.segment("14:00-15:00", "창덕궁", 60),
+            self.segment("15:00-16:00", "코엑스", 50),
+        ]}
+        day["segments"][0]["transport"] = "지하철 (약 30분)"
+        route_optimizer.optimize_day(day)
+
+        segments = day["segments"]
+        self.assertEqual(segments[0]["poi"], "코엑스")
+        self.assertEqual(segments[0]["transport"], "지하철 (약 30분)")
+        # 뒤로 옮겨진 경복궁은 창덕궁에서 오는 거리로 다시 계산
+        self.assertEqual(segments[3]["poi"], "경복궁")
+        self.assertEqual(segments[3]["transport"], "대중교통 (약 12분)")
+
+    def test_gazetteer_matches_whole_tokens_only(self):
+        self.assertEqual(route_optimizer.lookup_coords("경복궁 근정전"),
+                         route_optimizer.lookup_coords("경복궁"))
+        self.assertEqual(route_optimizer.lookup_coords("Udo Island bike tour"),
+                         route_optimizer.lookup_coords("우도"))
+        self.assertIsNone(route_optimizer.lookup_coords("Seoul Studio"))
+        self.assertIsNone(route_optimizer.lookup_coords("광주 송정역"))
+
+
+class ParsePlanStatusTests(TestCase):
+    def parse(self, raw):
+        return parse_plan(raw, TRAVEL_PLAN_SCHEMA, essential=("itinerary",))
+
+    def test_complete_document_without_itinerary_is_unrecoverable(self):
+        plan, info = self.parse('{"destination": "부산", "itinerary": []}')
+        self.assertIsNone(plan)
+        self.assertEqual(info["status"], "unrecoverable")
+
+    def test_repaired_but_complete_document_is_unrecoverable(self):
+        plan, info = self.parse("```json\n{'destination': '부산', 'itinerary': [],}\n```")
+        self.assertIsNone(plan)
+        self.assertEqual(info["status"], "unrecoverable")
+
+    def test_truncated_document_is_incomplete(self):
+        plan, info = self.parse('{"destination": "부산", "itinerary": [{"day": 1, "segments": [{"time": "09:')
+        self.assertIsNone(plan)
+        self.assertEqual(info["status"], "incomplete")
+        self.assertIn("truncated", info["steps"])
+
+
+def jpeg_bytes(size=(800, 600), gradient=Image.linear_gradient):
+    buffer = io.BytesIO()
+    gradient("L").resize(size).convert("RGB").save(buffer, "JPEG")
+    return buffer.getvalue()
+
+
+class FakeCompletions:
+    def __init__(self, delay=0.05):
+        self.delay = delay
+
+    async def create(self, **kwargs):
+        await asyncio.sleep(self.delay)
+        usage = types.SimpleNamespace(prompt_tokens=1, completion_tokens=1, total_tokens=2)
+        message = types.SimpleNamespace(content='{"type": "음식"}')
+        return types.SimpleNamespace(model="m", usage=usage, choices=[types.SimpleNamespace(message=message)])
+
+
+def fake_async_openai(delay=0.05):
+    def factory(**kwargs):
+        return types.SimpleNamespace(chat=types.SimpleNamespace(completions=FakeCompletions(delay)))
+    return factory
+
+
+def decode_data_url(data_url):
+    header, payload = data_url.split(",", 1)
+    return header, base64.b64decode(payload)
+
+
+class ImagePreprocessTests(TestCase):
+    def test_large_image_is_downscaled_and_reencoded(self):
+        original = jpeg_bytes((4000, 3000))
+        result = image_preprocess.prepare_image(io.BytesIO(original), detail="high")
+
+        header, data = decode_data_url(result["data_url"])
+        self.assertEqual(header, "data:image/jpeg;base64")
+        self.assertEqual((result["width"], result["height"]), (1024, 768))
+        self.assertEqual(Image.open(io.BytesIO(data)).size, (1024, 768))
+        self.assertEqual(result["bytes"], len(data))
+        self.assertLess(result["bytes"], len(original))
+        self.assertEqual(result["estimated_tokens"], 85 + 170 * 2 * 2)
+
+    def test_already_small_image_is_sent_as_is(self):
+        buffer = io.BytesIO()
+        Image.linear_gradient("L").resize((400, 300)).convert("RGB").save(buffer, "JPEG", quality=30, optimize=True)
+        original = buffer.getvalue()
+        result = image_preprocess.prepare_image(io.BytesIO(original), detail="low")
+
+        header, data = decode_data_url(result["data_url"])
+        self.assertEqual(header, "data:image/jpeg;base64")
+        self.assertEqual(data, original)
+        self.assertEqual(result["estimated_tokens"], 85)
+
+    def test_exif_rotation_is_applied(self):
+        image = Image.linear_gradient("L").resize((400, 300)).convert("RGB")
+        exif = Image.Exif()
+        exif[image_preprocess.EXIF_ORIENTATION] = 6
+        buffer = io.BytesIO()
+        image.save(buffer, "JPEG", exif=exif)
+        result = image_preprocess.prepare_image(buffer, detail="low")
+
+        _, data = decode_data_url(result["data_url"])
+        self.assertEqual(Image.open(io.BytesIO(data)).size, (300, 400))
+
+    def test_transparent_image_is_encoded_as_webp(self):
+        image = Image.new("RGBA", (600, 600), (255, 0, 0, 0))
+        image.paste((0, 0, 255, 255), (100, 100, 500, 500))
+        buffer = io.BytesIO()
+        image.save(buffer, "PNG")
+        result = image_preprocess.prepare_image(buffer, detail="low")
+
+        self.assertEqual(result["mime"], "image/webp")
+        _, data = decode_data_url(result["data_url"])
+        self.assertEqual(Image.open(io.BytesIO(data)).size, (512, 512))
+
+
+class MemoryBudgetTests(TestCase):
+    def test_waiting_for_budget_does_not_block_executor(self):
+        """스레드 풀보다 많은 이미지가 한도를 넘어도 (한 장씩) 모두 처리됨"""
+        images = [io.BytesIO(jpeg_bytes()) for _ in range(6)]
+        budget = image_preprocess.MemoryBudget(1)
+
+        async def analyze_all():
+            asyncio.get_running_loop().set_default_executor(ThreadPoolExecutor(max_workers=2))
+            analyzer = kwy.KoreanImageAnalyzer(api_key="sk-test")
+            return await asyncio.wait_for(
+                asyncio.gather(*(analyzer.analyze_image_async(image) for image in images)), timeout=10
+            )
+
+        with mock.patch.object(kwy, "AsyncOpenAI", fake_async_openai()), \
+                mock.patch.object(kwy, "memory_budget", budget):
+            results = asyncio.run(analyze_all())
+        self.assertTrue(all(result["success"] for result in results))
+        self.assertEqual(budget.used, 0)
+        self.assertEqual(budget.waiters, [])
+
+    def test_cancelled_waiter_does_not_leak_budget(self):
+        budget = image_preprocess.MemoryBudget(10)
+
+        async def run():
+            held = await budget.acquire_async(10)
+            waiting = asyncio.create_task(budget.acquire_async(5))
+            await asyncio.sleep(0)
+            waiting.cancel()
+            budget.release(held)
+            await asyncio.sleep(0)
+            return await budget.acquire_async(10)
+
+        self.assertEqual(asyncio.run(run()), 10)
+        self.assertEqual(budget.used, 10)
+
+
+class GatedCompletions:
+    """두 번째 호출부터는 release 가 set 될 때까지 응답하지 않는 Vision API"""
+
+    def __init__(self):
+        self.calls = 0
+        self.release = asyncio.Event()
+
+    async def create(self, **kwargs):
+        self.calls += 1
+        if self.calls > 1:
+            await self.release.wait()
+        return await FakeCompletions(delay=0).create(**kwargs)
+
+
+@override_settings(CACHES=LOCMEM_CACHE, MEDIA_ROOT=tempfile.mkdtemp(), IMAGE_BATCH_CONCURRENCY=4)
+class ImageAnalyzeBatchStreamTests(TestCase):
+    async def test_results_are_streamed_as_each_analysis_finishes(self):
+        completions = GatedCompletions()
+        client = types.SimpleNamespace(chat=types.SimpleNamespace(completions=completions))
+        files = [
+            SimpleUploadedFile("a.jpg", jpeg_bytes(), "image/jpeg"),
+            SimpleUploadedFile("b.jpg", jpeg_bytes(gradient=Image.radial_gradient), "image/jpeg"),
+        ]
+        with mock.patch.object(kwy, "AsyncOpenAI", lambda **kwargs: client):
+            response = await AsyncClient().post("/comprocessSW/image-analyze/batch/", {"images": files})
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response["Content-Type"], "application/x-ndjson")
+
+            chunks = aiter(response.streaming_content)
+            # 두 번째 분석이 끝나기 전에 첫 번째 결과를 받을 수 있어야 함
+            first = json.loads(await asyncio.wait_for(anext(chunks), timeout=10))
+            self.assertTrue(first["ai_analysis"]["success"])
+            self.assertFalse(completions.release.is_set())
+
+            completions.release.set()
+            second = json.loads(await asyncio.wait_for(anext(chunks), timeout=10))
+            self.assertEqual({first["index"], second["index"]}, {0, 1})
+            with self.assertRaises(StopAsyncIteration):
+                await anext(chunks)
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class AsyncTravelViewTests(TestCase):
+    PLAN = {
+        "destination": "오사카",
+        "itinerary": [{"day": 1, "segments": [{"time": "10:00-12:00", "poi": "오사카성", "duration_min": 120}]}],
+        "costs": {"currency": "KRW"},
+    }
+    INPUT = {"destination": "오사카", "budget": "10만엔", "travel_date": "2026-03-01", "preferences": "맛집", "extra": "없음"}
+
+    def setUp(self):
+        cache.clear()
+
+    async def test_plan_and_day_regeneration(self):
+        async def generated(*args):
+            return json.loads(json.dumps(self.PLAN)), {"calls": 1}, "valid"
+
+        async def regenerated(*args):
+            return {"day": 1, "segments": [{"time": "13:00-15:00", "poi": "도톤보리", "duration_min": 120}]}, {"calls": 1}
+
+        client = AsyncClient()
+        with mock.patch("comprocessSW.views.generate_travel_plan_result", generated):
+            response = await client.post("/comprocessSW/travel-plan/", self.INPUT, content_type="application/json")
+        self.assertEqual(response.status_code, 200)
+        schedule_id = response.json()["schedule_id"]
+        self.assertEqual(response.json()["ai_result"]["costs"]["total_local"], 0)
+
+        with mock.patch("comprocessSW.views.regenerate_travel_day", regenerated):
+            response = await client.post(
+                f"/comprocessSW/travel-plan/{schedule_id}/days/1/", {}, content_type="application/json"
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["segments"][0]["poi"], "도톤보리")
+
+        response = await client.get(f"/comprocessSW/travel-plan/{schedule_id}/days/1/")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["revisions"][0]["segments"][0]["poi"], "오사카성")
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class CachedUserTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        authentication._users.clear()
+        self.user = User.objects.create_user(username="cached", password="old-password-1234")
+
+    def test_password_hash_is_not_cached(self):
+        authentication.get_cached_user(self.user.id)
+        fields, password_md5 = cache.get(f"{authentication.CACHE_PREFIX}{self.user.id}")
+        self.assertNotIn("password", fields)
+        self.assertNotIn(self.user.password, str(authentication._users[self.user.id]))
+
+        user = authentication.get_cached_user(self.user.id)
+        self.assertIn("password", user.get_deferred_fields())
+        # 캐시에서 만든 User 를 저장해도 비밀번호는 바뀌지 않음
+        user.save()
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.check_password("old-password-1234"))
+
+    def test_revoked_token_is_rejected_after_password_change(self):
+        # 모듈마다 import 해 둔 simplejwt api_settings 객체를 직접 바꿈 (override_settings 는 새 객체를 만듦)
+        with mock.patch.object(authentication.api_settings, "CHECK_REVOKE_TOKEN", True):
+            client = APIClient()
+            access = authentication.get_tokens_for_user(self.user)["access"]
+            client.credentials(HTTP_AUTHORIZATION=f"Bearer {access}")
+            self.assertEqual(client.get("/comprocessSW/user/me/travel-history/").status_code, 200)
+
+            self.user.set_password("new-password-5678")
+            self.user.save()
+            self.assertEqual(client.get("/comprocessSW/user/me/travel-history/").status_code, 401)
+
+
+def fake_response(output_text, input_tokens=100, output_tokens=50, cached_tokens=0):
+    """Responses API 응답 (output_text, usage 만 사용)"""
+    usage = types.SimpleNamespace(
+        input_tokens=input_tokens, output_tokens=output_tokens, total_tokens=input_tokens + output_tokens,
+        input_tokens_details=types.SimpleNamespace(cached_tokens=cached_tokens),
+    )
+    return types.SimpleNamespace(model="gpt-4o-mini", output_text=output_text, usage=usage)
+
+
+class StructuredOutputTests(TestCase):
+    def test_schemas_follow_strict_mode_rules(self):
+        """strict json_schema 는 모든 객체의 속성이 required 이고 additionalProperties 가 false 여야 함"""
+        def check(schema, path):
+            if schema.get("type") == "object":
+                self.assertEqual(set(schema["required"]), set(schema["properties"]), path)
+                self.assertIs(schema["additionalProperties"], False, path)
+                for key, sub in schema["properties"].items():
+                    check(sub, f"{path}.{key}")
+            elif schema.get("type") == "array":
+                check(schema["items"], f"{path}[]")
+
+        for schema in (TRAVEL_PLAN_SCHEMA, travel_schema.SKELETON_SCHEMA, travel_schema.DAY_SCHEMA):
+            check(schema, "$")
+
+    def test_plan_request_uses_schema_and_records_usage(self):
+        create = mock.AsyncMock(return_value=fake_response('{"itinerary": []}', 1200, 800, cached_tokens=1024))
+        with mock.patch.object(kjy.client.responses, "create", create), \
+                mock.patch.object(kjy, "FANOUT_MIN_DAYS", 30):
+            raw, usage = asyncio.run(kjy.generate_travel_plan("부산", "50만원", "2026-03-01 ~ 2026-03-02", "맛집", ""))
+
+        self.assertEqual(raw, '{"itinerary": []}')
+        text_format = create.call_args.kwargs["text"]["format"]
+        self.assertEqual(text_format["type"], "json_schema")
+        self.assertTrue(text_format["strict"])
+        self.assertIs(text_format["schema"], TRAVEL_PLAN_SCHEMA)
+        self.assertEqual(
+            {key: usage[key] for key in ("calls", "prompt_tokens", "completion_tokens", "cached_tokens", "total_tokens")},
+            {"calls": 1, "prompt_tokens": 1200, "completion_tokens": 800, "cached_tokens": 1024, "total_tokens": 2000},
+        )
+        self.assertIn("latency_ms", usage)
+
+    def test_failed_continuation_returns_partial_plan(self):
+        truncated = ('{"destination": "부산", "itinerary": [{"day": 1, "segments": '
+                     '[{"time": "09:00-10:00", "poi": "해운대", "duration_min": 60}]}, '
+                     '{"day": 2, "segments": [{"time": "09:')
+        generate = mock.AsyncMock(return_value=(truncated, {"calls": 1, "latency_ms": 10}))
+        continue_plan = mock.AsyncMock(side_effect=ValueError("timeout"))
+        with mock.patch.object(kjy, "generate_travel_plan", generate), \
+                mock.patch.object(kjy, "continue_travel_plan", continue_plan):
+            plan, usage, status = asyncio.run(
+                kjy.generate_travel_plan_result("부산", "50만원", "2026-03-01 ~ 2026-03-02", "맛집", "")
+            )
+
+        continue_plan.assert_awaited_once()
+        self.assertEqual(status, "partial")
+        self.assertEqual(plan["itinerary"][0]["segments"][0]["poi"], "해운대")
+        self.assertEqual(usage, {"calls": 1, "latency_ms": 10})
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class TravelDayRegenerateTests(TestCase):
+    PLAN = {
+        "destination": "서울",
+        "itinerary": [
+            {"day": 1, "segments": [{"time": "10:00-12:00", "poi": "경복궁", "duration_min": 120, "cost_local": 0}]},
+            {"day": 2, "segments": [{"time": "10:00-12:00", "poi": "명동", "duration_min": 120, "cost_local": 0}]},
+        ],
+        "costs": {"currency": "KRW"},
+    }
+    NEW_DAY = {"day": 2, "segments": [{"time": "13:00-15:00", "poi": "남산서울타워", "duration_min": 120, "cost_local": 21000}]}
+
+    def setUp(self):
+        self.schedule = Travel_Schedule.objects.create(
+            destination="서울", budget="50만원", travel_date="2026-03-01 ~ 2026-03-02",
+            preferences="", extra="", ai_result=json.loads(json.dumps(self.PLAN))
+        )
+        self.url = f"/comprocessSW/travel-plan/{self.schedule.id}/days/2/"
+
+    def post(self, regenerate):
+        with mock.patch("comprocessSW.views.regenerate_travel_day", regenerate):
+            return APIClient().post(self.url, {"feedback": "야경"}, format="json")
+
+    def test_regenerates_day_and_keeps_previous_revision(self):
+        events = []
+        postprocess_travel_plan, atomic = views.postprocess_travel_plan, views.transaction.atomic
+
+        def postprocess(*args, **kwargs):
+            events.append("postprocess")
+            return postprocess_travel_plan(*args, **kwargs)
+
+        def locked(*args, **kwargs):
+            events.append("lock")
+            return atomic(*args, **kwargs)
+
+        async def regenerated(*args):
+            return json.loads(json.dumps(self.NEW_DAY)), {"calls": 1}
+
+        with mock.patch("comprocessSW.views.postprocess_travel_plan", postprocess), \
+                mock.patch("comprocessSW.views.transaction.atomic", locked):
+            response = self.post(regenerated)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["segments"][0]["poi"], "남산서울타워")
+        # 후처리는 행 잠금(트랜잭션) 전에 끝남
+        self.assertEqual(events, ["postprocess", "lock"])
+
+        self.schedule.refresh_from_db()
+        self.assertEqual(self.schedule.ai_result["itinerary"][1], self.NEW_DAY)
+        self.assertEqual(self.schedule.ai_result["costs"]["total_local"], 21000)
+        revision = TravelDayRevision.objects.get(id=response.json()["previous_revision_id"])
+        self.assertEqual(revision.segments[0]["poi"], "명동")
+
+    def test_ai_failure_returns_502_and_leaves_plan(self):
+        for error in (ValueError("Invalid JSON returned from AI (travel_day: unrecoverable)"),
+                      kjy.OpenAIError("upstream down")):
+            response = self.post(mock.AsyncMock(side_effect=error))
+            self.assertEqual(response.status_code, 502)
+            self.assertEqual(response.json(), {
+                "schedule_id": self.schedule.id,
+                "error": "AI 일정 생성에 실패했습니다. 잠시 후 다시 시도해 주세요."
+            })
+        self.schedule.refresh_from_db()
+        self.assertEqual(self.schedule.ai_result, self.PLAN)
+        self.assertFalse(TravelDayRevision.objects.exists())
+
+    def test_plan_changed_during_generation_returns_409(self):
+        async def regenerated(*args):
+            await sync_to_async(Travel_Schedule.objects.filter(id=self.schedule.id).update)(
+                ai_result={**self.PLAN, "destination": "부산"}
+            )
+            return json.loads(json.dumps(self.NEW_DAY)), {"calls": 1}
+
+        response = self.post(regenerated)
+        self.assertEqual(response.status_code, 409)
+        self.assertFalse(TravelDayRevision.objects.exists())
+
+
+@override_settings(CACHES=LOCMEM_CACHE, PLAN_CACHE_SIMILARITY_THRESHOLD=0.75)
+class PlanSimilarityGuardTests(TestCase):
+    PLAN = {"destination": "부산", "itinerary": [{"day": 1, "segments": []}], "date": {}}
+
+    def setUp(self):
+        cache.clear()
+        index = plan_cache.PlanSimilarityIndex(capacity=10)
+        patcher = mock.patch.object(plan_cache, "_index", index)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.source = Travel_Schedule.objects.create(
+            destination="부산", budget="₩500,000", travel_date="2026-03-01 ~ 2026-03-02",
+            preferences="해변, 맛집, 카페", extra="", ai_result=self.PLAN
+        )
+        plan_cache.store(self.source)
+
+    def lookup(self, budget="₩500,000", preferences="해변, 맛집, 카페, 시장", extra=""):
+        return plan_cache.lookup("Busan", budget, "2026-04-10 ~ 2026-04-11", preferences, extra)
+
+    def test_similar_request_reuses_plan(self):
+        plan, info = self.lookup()
+        self.assertEqual(info["type"], "similar")
+        self.assertEqual(info["source_schedule_id"], self.source.id)
+
+    # 아래 요청들은 그룹 조건이 없으면 문자 n-gram 유사도만으로 0.75 를 넘음
+    def test_different_budget_is_not_reused(self):
+        for budget in ("₩50,000", "₩5,000,000", "₩50,000,000"):
+            self.assertIsNone(self.lookup(budget=budget, preferences="해변, 맛집, 카페"), budget)
+
+    def test_different_extra_is_not_reused(self):
+        self.assertIsNone(self.lookup(preferences="해변, 맛집, 카페", extra="휠체어"))
+
+
+@override_settings(CACHES=LOCMEM_CACHE, IMAGE_CACHE_MAX_DISTANCE=4)
+class ImageAnalysisCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        patcher = mock.patch.object(image_search, "_index", image_search.ImageSearchIndex())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.photo = jpeg_bytes((1200, 900), Image.radial_gradient)
+
+    def test_resized_copy_has_nearly_the_same_hash(self):
+        resized = io.BytesIO()
+        Image.open(io.BytesIO(self.photo)).resize((600, 450)).save(resized, "JPEG", quality=60)
+        distance = image_hash.hamming(image_hash.dhash(io.BytesIO(self.photo)), image_hash.dhash(resized))
+        self.assertLessEqual(distance, 4)
+        self.assertGreater(image_hash.hamming(image_hash.dhash(io.BytesIO(self.photo)),
+                                              image_hash.dhash(io.BytesIO(jpeg_bytes()))), 4)
+
+    def test_lookup_reuses_analysis_of_nearby_hash(self):
+        phash = image_hash.dhash(io.BytesIO(self.photo))
+        near = f"{int(phash, 16) ^ 0b101:016x}"
+        UploadedImage.objects.create(phash=near)
+        source = UploadedImage.objects.create(phash=near, ai_analysis={"type": "풍경"}, analyzed_at=timezone.now())
+
+        analysis, info = image_hash.lookup(phash)
+        self.assertEqual(analysis, {"type": "풍경"})
+        self.assertEqual(info, {"source_image_id": source.id, "distance": 2})
+
+        self.assertIsNone(image_hash.lookup(phash, force_refresh=True))
+        self.assertIsNone(image_hash.lookup(f"{int(phash, 16) ^ 0b11111:016x}", exclude_id=source.id))
+        self.assertEqual(image_hash.stats()["hits"], 1)
+
+
+def blob_files(root):
+    """MEDIA_ROOT 아래 blob 파일 (임시 파일, 축소본 제외)"""
+    return sorted(
+        str(path.relative_to(root)) for path in Path(root, "blobs").rglob("*")
+        if path.is_file() and storage.content_hash_from_name(str(path.relative_to(root)))
+    )
+
+
+@override_settings(CACHES=LOCMEM_CACHE, MEDIA_ROOT=tempfile.mkdtemp())
+class ContentAddressedUploadTests(TestCase):
+    def setUp(self):
+        self.photo = jpeg_bytes((320, 240))
+        self.digest = hashlib.sha256(self.photo).hexdigest()
+
+    def upload(self):
+        image = SimpleUploadedFile("photo.jpg", self.photo, content_type="image/jpeg")
+        return APIClient().post("/comprocessSW/image-upload/", {"image": image}, format="multipart")
+
+    def test_same_bytes_are_stored_once(self):
+        first, second = self.upload(), self.upload()
+        self.assertEqual((first.status_code, second.status_code), (201, 201))
+
+        rows = UploadedImage.objects.order_by("id")
+        self.assertEqual(rows.count(), 2)
+        self.assertEqual({row.image.name for row in rows}, {storage.blob_name(self.digest, ".jpg")})
+        self.assertEqual({row.content_hash for row in rows}, {self.digest})
+        self.assertEqual(blob_files(settings.MEDIA_ROOT), [storage.blob_name(self.digest, ".jpg")])
+
+    def test_direct_upload_session_completes(self):
+        client = APIClient()
+        created = client.post("/comprocessSW/image-upload/sessions/", {
+            "file_name": "IMG_0001.jpg", "total_size": len(self.photo), "sha256": self.digest,
+        }, format="json")
+        self.assertEqual(created.status_code, 201)
+        upload = created.data["upload"]
+        self.assertEqual(upload["method"], "PUT")
+
+        # 완료 전에는 파일이 없음
+        complete_url = f"/comprocessSW/image-upload/sessions/{created.data['id']}/complete/"
+        self.assertEqual(client.post(complete_url, {}, format="json").status_code, 400)
+
+        put = client.put(upload["url"], self.photo, content_type=upload["headers"]["Content-Type"])
+        self.assertEqual(put.status_code, 200)
+        completed = client.post(complete_url, {}, format="json")
+        self.assertEqual(completed.status_code, 201)
+        image = UploadedImage.objects.get(id=completed.data["id"])
+        self.assertEqual(image.image.name, storage.blob_name(self.digest, ".jpg"))
+        self.assertEqual(image.content_hash, self.digest)
+
+        # 같은 파일의 새 세션은 올릴 필요 없음
+        again = client.post("/comprocessSW/image-upload/sessions/", {
+            "file_name": "copy.jpg", "total_size": len(self.photo), "sha256": self.digest,
+        }, format="json")
+        self.assertIsNone(again.data["upload"])
+
+    def test_direct_upload_rejects_other_content(self):
+        upload = storage.upload_storage.presigned_upload(self.digest, len(self.photo), ".jpg")
+        tampered = self.photo[:-1] + b"\x00"
+        response = APIClient().put(upload["url"], tampered, content_type="image/jpeg")
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(blob_files(settings.MEDIA_ROOT), [])
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class MigrateMediaLayoutTests(TestCase):
+    def setUp(self):
+        # 테스트마다 빈 MEDIA_ROOT
+        self.root = Path(tempfile.mkdtemp())
+        media = override_settings(MEDIA_ROOT=str(self.root))
+        media.enable()
+        self.addCleanup(media.disable)
+
+        self.photo, self.other = jpeg_bytes((320, 240)), jpeg_bytes((320, 240), Image.radial_gradient)
+        (self.root / "uploads").mkdir()
+        files = {"a.jpg": self.photo, "b.jpg": self.photo, "c.jpg": self.other}
+        for name, data in files.items():
+            (self.root / "uploads" / name).write_bytes(data)
+        self.rows = {name: UploadedImage.objects.create(image=f"uploads/{name}") for name in [*files, "missing.jpg"]}
+
+    def migrate(self, *args):
+        out = io.StringIO()
+        call_command("migrate_media_layout", *args, stdout=out)
+        return out.getvalue()
+
+    def test_dry_run_changes_nothing(self):
+        self.assertIn("옮길 행: 4개", self.migrate("--dry-run"))
+        self.assertEqual(
+            sorted(UploadedImage.objects.values_list("image", flat=True)),
+            ["uploads/a.jpg", "uploads/b.jpg", "uploads/c.jpg", "uploads/missing.jpg"],
+        )
+        self.assertEqual(sorted(p.name for p in (self.root / "uploads").iterdir()), ["a.jpg", "b.jpg", "c.jpg"])
+
+    def test_moves_files_and_rewrites_paths(self):
+        # 한 행씩 나눠 실행해도(중단 후 재실행) 남은 행부터 이어서 처리
+        self.migrate("--limit", "1")
+        self.migrate("--batch-size", "2")
+
+        photo_blob = storage.blob_name(hashlib.sha256(self.photo).hexdigest(), ".jpg")
+        other_blob = storage.blob_name(hashlib.sha256(self.other).hexdigest(), ".jpg")
+        expected = {"a.jpg": photo_blob, "b.jpg": photo_blob, "c.jpg": other_blob, "missing.jpg": "uploads/missing.jpg"}
+        for name, row in self.rows.items():
+            row.refresh_from_db()
+            self.assertEqual(row.image.name, expected[name], name)
+            if name != "missing.jpg":
+                self.assertEqual(row.legacy_path, f"uploads/{name}")
+                self.assertEqual(row.content_hash, storage.content_hash_from_name(expected[name]))
+
+        self.assertEqual(blob_files(self.root), sorted([photo_blob, other_blob]))
+        self.assertEqual((self.root / photo_blob).read_bytes(), self.photo)
+        self.assertEqual(list((self.root / "uploads").iterdir()), [])
+        self.assertIn("완료: 0개 이동, 파일 없음 1개", self.migrate())
+
+    def test_keep_originals_then_purge(self):
+        self.migrate("--keep-originals")
+        self.assertEqual(len(list((self.root / "uploads").iterdir())), 3)
+        self.assertIn("예전 파일 3개 삭제", self.migrate("--purge-originals"))
+        self.assertEqual(list((self.root / "uploads").iterdir()), [])
+
+
+def store_upload(data, extension=".jpg"):
+    """업로드 저장소에 blob 으로 저장한 경로"""
+    return storage.upload_storage.save(f"photo{extension}", io.BytesIO(data))
+
+
+@override_settings(CACHES=LOCMEM_CACHE, MEDIA_ROOT=tempfile.mkdtemp(),
+                   IMAGE_THUMBNAIL_SIZE=256, IMAGE_VARIANT_WIDTHS=[320, 640, 1280])
+class ImageVariantTests(TestCase):
+    def test_creates_thumbnail_and_smaller_widths_for_all_rows(self):
+        name = store_upload(jpeg_bytes((1600, 1200)))
+        rows = [UploadedImage.objects.create(image=name) for _ in range(2)]
+
+        result = variants.generate_variants(name)
+        _, extension = variants.variant_format()
+        self.assertEqual(
+            {key: (info["width"], info["height"]) for key, info in result.items()},
+            {"w1280": (1280, 960), "w640": (640, 480), "w320": (320, 240), "thumb": (256, 256)},
+        )
+        for key, info in result.items():
+            self.assertEqual(info["name"], variants.variant_name(name, key, extension))
+            with storage.upload_storage.open(info["name"]) as f:
+                self.assertEqual(Image.open(f).size, (info["width"], info["height"]))
+        for row in rows:
+            row.refresh_from_db()
+            self.assertEqual(row.variants, result)
+        self.assertEqual(
+            set(ImageUploadSerializer(rows[0]).data["variants"]["w640"]), {"url", "width", "height"}
+        )
+
+        # 이미 있는 축소본은 다시 만들지 않음
+        with mock.patch.object(variants, "render_variants") as render:
+            self.assertEqual(variants.generate_variants(name), result)
+        render.assert_not_called()
+
+    def test_small_image_is_not_upscaled(self):
+        name = store_upload(jpeg_bytes((300, 200)))
+        result = variants.generate_variants(name)
+        self.assertEqual({key: (info["width"], info["height"]) for key, info in result.items()},
+                         {"thumb": (200, 200)})
+
+    def test_deleting_last_row_removes_variants(self):
+        name = store_upload(jpeg_bytes((800, 600)))
+        row = UploadedImage.objects.create(image=name)
+        result = variants.generate_variants(name)
+
+        with override_settings(BLOB_GC_GRACE_SECONDS=0), self.captureOnCommitCallbacks(execute=True):
+            row.delete()
+        self.assertFalse(storage.upload_storage.exists(name))
+        self.assertFalse(any(storage.upload_storage.exists(info["name"]) for info in result.values()))
+
+
+@override_settings(CACHES=LOCMEM_CACHE, MEDIA_ROOT=tempfile.mkdtemp(), IMAGE_VARIANT_WIDTHS=[320])
+class GenerateImageVariantsCommandTests(TransactionTestCase):
+    def setUp(self):
+        # 커밋 즉시 실행되는 업로드 후처리(백그라운드 스레드)는 끄고 명령만 확인
+        patcher = mock.patch.object(transcode, "schedule")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_fills_missing_variants_and_skips_broken_files(self):
+        good = UploadedImage.objects.create(image=store_upload(jpeg_bytes((640, 480))))
+        broken = UploadedImage.objects.create(image=store_upload(b"not an image"))
+        done = UploadedImage.objects.create(image=store_upload(jpeg_bytes((400, 300), Image.radial_gradient)),
+                                            variants={"thumb": {"name": "x", "width": 1, "height": 1}})
+
+        out, err = io.StringIO(), io.StringIO()
+        call_command("generate_image_variants", "--workers", "2", stdout=out, stderr=err)
+
+        self.assertIn("완료: 1개 생성, 실패 1개", out.getvalue())
+        self.assertIn(broken.image.name, err.getvalue())
+        good.refresh_from_db()
+        self.assertEqual(set(good.variants), {"w320", "thumb"})
+        done.refresh_from_db()
+        self.assertEqual(done.variants, {"thumb": {"name": "x", "width": 1, "height": 1}})
+
+
+def png_bytes(image):
+    buffer = io.BytesIO()
+    image.save(buffer, "PNG")
+    return buffer.getvalue()
+
+
+def photo_png(size=(400, 300)):
+    """색이 넓게 퍼진 사진 같은 PNG"""
+    return png_bytes(Image.merge("RGB", [
+        Image.effect_noise(size, 40), Image.linear_gradient("L").resize(size), Image.radial_gradient("L").resize(size)
+    ]))
+
+
+def screenshot_png(size=(400, 300)):
+    """흰 배경에 글자만 있는 스크린샷 같은 PNG"""
+    image = Image.new("RGB", size, "white")
+    draw = ImageDraw.Draw(image)
+    for y in range(10, size[1] - 10, 20):
+        draw.text((10, y), "hello world screenshot text", fill="black")
+    return png_bytes(image)
+
+
+def run_background_inline(fn, *args, **kwargs):
+    return fn(*args, **kwargs)
+
+
+@override_settings(CACHES=LOCMEM_CACHE, MEDIA_ROOT=tempfile.mkdtemp(), IMAGE_TRANSCODE="webp",
+                   IMAGE_TRANSCODE_KEEP_ORIGINAL=False, IMAGE_VARIANT_WIDTHS=[320])
+class TranscodeTests(TestCase):
+    def test_photo_is_lossy_and_screenshot_is_lossless(self):
+        photo = store_upload(photo_png(), ".png")
+        shot = store_upload(screenshot_png(), ".png")
+        rows = [UploadedImage.objects.create(image=name) for name in (photo, photo, shot)]
+
+        photo_result = transcode.transcode_upload(photo)
+        shot_result = transcode.transcode_upload(shot)
+        self.assertEqual(photo_result["kind"], "lossy")
+        self.assertEqual(shot_result["kind"], "lossless")
+        self.assertLess(photo_result["after"], photo_result["before"])
+
+        for row, result, original in zip(rows, (photo_result, photo_result, shot_result), (photo, photo, shot)):
+            row.refresh_from_db()
+            self.assertEqual(row.image.name, result["name"])
+            self.assertTrue(row.image.name.endswith(".webp"))
+            self.assertEqual(row.original_image, original)
+        # 방금 올라온 원본은 유예 기간 동안 남겨 두고 gc_blobs 가 정리
+        self.assertTrue(storage.upload_storage.exists(photo))
+
+    def test_jpeg_and_small_savings_are_skipped(self):
+        self.assertIsNone(transcode.transcode_upload(store_upload(jpeg_bytes())))
+        with self.settings(IMAGE_TRANSCODE_MIN_SAVING=0.9):
+            self.assertIsNone(transcode.transcode_upload(store_upload(photo_png(), ".png")))
+
+    def test_upload_is_transcoded_in_background_after_commit(self):
+        image = SimpleUploadedFile("screen.png", screenshot_png(), content_type="image/png")
+        with mock.patch.object(background, "submit", run_background_inline), \
+                self.captureOnCommitCallbacks(execute=True):
+            response = APIClient().post("/comprocessSW/image-upload/", {"image": image}, format="multipart")
+        self.assertEqual(response.status_code, 201)
+
+        row = UploadedImage.objects.get(id=response.data["id"])
+        self.assertTrue(row.image.name.endswith(".webp"))
+        self.assertTrue(row.original_image.endswith(".png"))
+        self.assertEqual(set(row.variants), {"w320", "thumb"})
+
+
+@override_settings(CACHES=LOCMEM_CACHE, MEDIA_ROOT=tempfile.mkdtemp(), IMAGE_TRANSCODE="webp", IMAGE_VARIANT_WIDTHS=[320])
+class TranscodeUploadsCommandTests(TransactionTestCase):
+    def setUp(self):
+        patcher = mock.patch.object(transcode, "schedule")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def transcode_uploads(self, *args):
+        out = io.StringIO()
+        call_command("transcode_uploads", "--workers", "2", *args, stdout=out, stderr=io.StringIO())
+        return out.getvalue()
+
+    def test_dry_run_then_transcode(self):
+        png = UploadedImage.objects.create(image=store_upload(photo_png(), ".png"))
+        UploadedImage.objects.create(image=store_upload(jpeg_bytes()))
+
+        self.assertIn("변환 예정: 1개, 건너뜀 0개, 실패 0개", self.transcode_uploads("--dry-run"))
+        png.refresh_from_db()
+        self.assertTrue(png.image.name.endswith(".png"))
+
+        self.assertIn("변환: 1개, 건너뜀 0개, 실패 0개", self.transcode_uploads())
+        png.refresh_from_db()
+        self.assertTrue(png.image.name.endswith(".webp"))
+        self.assertEqual(set(png.variants), {"w320", "thumb"})
+        self.assertIn("변환 후보: 0개", self.transcode_uploads())
+
+    def test_requires_transcode_setting(self):
+        with self.settings(IMAGE_TRANSCODE="off"), self.assertRaises(CommandError):
+            self.transcode_uploads()
+
+
+def parse_multipart(data):
+    """FILE_UPLOAD_HANDLERS 로 multipart 본문을 읽은 요청"""
+    request = RequestFactory().post("/comprocessSW/image-upload/", data)
+    request.FILES  # 업로드 핸들러 실행
+    return request
+
+
+@override_settings(IMAGE_MAX_DIMENSION=100, IMAGE_UPLOAD_MAX_BYTES=2 * 1024 * 1024)
+class ImageUploadLimitHandlerTests(TestCase):
+    def test_bad_magic_number_is_rejected_before_the_whole_file_arrives(self):
+        body = b"\x00garbage" * (128 * 1024)  # 1MB
+        request = parse_multipart({"image": SimpleUploadedFile("x.jpg", body), "title": "제목"})
+
+        self.assertNotIn("image", request.FILES)
+        self.assertEqual(upload_handlers.upload_errors(request),
+                         {"image": ["x.jpg: 이미지 파일이 아니거나 손상된 파일입니다."]})
+        # 헤더 검사 한도까지만 읽고 나머지는 버림
+        handler = request.upload_handlers[0]
+        self.assertLessEqual(handler.validator.size, upload_handlers.HEADER_MAX_BYTES + 64 * 1024)
+        self.assertEqual(request.POST["title"], "제목")
+
+    def test_oversized_dimensions_are_rejected(self):
+        wide = png_bytes(Image.new("RGB", (200, 50)))
+        request = parse_multipart({"image": SimpleUploadedFile("wide.png", wide)})
+        self.assertNotIn("image", request.FILES)
+        self.assertIn("200x50", upload_handlers.upload_errors(request)["image"][0])
+
+    def test_rejects_on_the_chunk_that_crosses_the_size_limit(self):
+        request = RequestFactory().post("/")
+        handler = upload_handlers.ImageUploadLimitHandler(request)
+        handler.new_file("image", "big.png", "image/png", None)
+        small = png_bytes(Image.new("RGB", (10, 10)))
+        self.assertEqual(handler.receive_data_chunk(small, 0), small)
+        with self.assertRaises(SkipFile):
+            handler.receive_data_chunk(bytes(2 * 1024 * 1024), len(small))
+        self.assertIn("파일이 너무 큽니다", upload_handlers.upload_errors(request)["image"][0])
+
+    def test_valid_image_and_text_fields_pass_through(self):
+        photo = png_bytes(Image.new("RGB", (80, 60)))
+        request = parse_multipart({"image": SimpleUploadedFile("ok.png", photo), "title": "해운대", "k": "5"})
+        self.assertEqual(request.FILES["image"].read(), photo)
+        self.assertEqual((request.POST["title"], request.POST["k"]), ("해운대", "5"))
+        self.assertEqual(upload_handlers.upload_errors(request), {})
+
+
+class BlockingStream:
+    """첫 read 에서 release 될 때까지 기다리는 요청 본문"""
+
+    def __init__(self, data):
+        self.data = io.BytesIO(data)
+        self.reading = threading.Event()
+        self.release = threading.Event()
+
+    def read(self, size=-1):
+        self.reading.set()
+        self.release.wait(5)
+        return self.data.read(size)
+
+
+@override_settings(CACHES=LOCMEM_CACHE, MEDIA_ROOT=tempfile.mkdtemp())
+class ResumableUploadTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.photo = jpeg_bytes((640, 480), Image.radial_gradient)
+
+    def create(self, data=None, total_size=None):
+        response = self.client.post("/comprocessSW/image-upload/sessions/", {
+            "file_name": "IMG_0001.jpg", "total_size": total_size or len(data or self.photo),
+        }, format="json")
+        self.assertEqual(response.status_code, 201)
+        return f"/comprocessSW/image-upload/sessions/{response.data['id']}/"
+
+    def put(self, url, chunk, offset):
+        return self.client.put(url, chunk, content_type="application/octet-stream", HTTP_UPLOAD_OFFSET=str(offset))
+
+    def test_chunks_resume_and_complete(self):
+        url = self.create()
+        session = UploadSession.objects.get()
+        self.assertTrue(Path(resumable.session_path(session)).exists())
+
+        half = len(self.photo) // 2
+        first = self.put(url, self.photo[:half], 0)
+        self.assertEqual((first.status_code, first.data["offset"], first.data["complete"]), (200, half, False))
+
+        # 잘못된 위치에서 보낸 조각은 409 + 서버가 받은 위치
+        mismatch = self.put(url, self.photo[half:], 10)
+        self.assertEqual((mismatch.status_code, mismatch.data["offset"]), (409, half))
+
+        # 연결이 끊긴 뒤 GET 으로 위치를 확인하고 이어서 전송
+        resume = self.client.get(url)
+        self.assertEqual((resume.data["offset"], resume["Upload-Offset"]), (half, str(half)))
+        rest = self.put(url, self.photo[half:], int(resume["Upload-Offset"]))
+        self.assertEqual((rest.status_code, rest.data["complete"]), (200, True))
+
+        completed = self.client.post(f"{url}complete/", {}, format="json")
+        self.assertEqual(completed.status_code, 201)
+        image = UploadedImage.objects.get(id=completed.data["id"])
+        digest = hashlib.sha256(self.photo).hexdigest()
+        self.assertEqual(image.image.name, storage.blob_name(digest, ".jpg"))
+        with image.image.open("rb") as f:
+            self.assertEqual(f.read(), self.photo)
+        self.assertNotEqual(image.phash, "")
+        self.assertFalse(Path(resumable.session_path(session)).exists())
+
+        # 다시 완료하면 같은 이미지, 완료된 세션에는 조각을 보낼 수 없음
+        again = self.client.post(f"{url}complete/", {}, format="json")
+        self.assertEqual((again.status_code, again.data["id"]), (200, image.id))
+        self.assertEqual(self.put(url, b"x", len(self.photo)).status_code, 400)
+
+    def test_incomplete_session_cannot_complete(self):
+        url = self.create()
+        self.put(url, self.photo[:100], 0)
+        self.assertEqual(self.client.post(f"{url}complete/", {}, format="json").status_code, 400)
+
+    def test_non_image_is_rejected_and_session_discarded(self):
+        data = b"\x00not an image" * 100
+        url = self.create(data)
+        response = self.put(url, data, 0)
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(UploadSession.objects.exists())
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+    def test_cleanup_removes_stale_sessions_and_orphan_files(self):
+        stale_url, fresh_url = self.create(), self.create()
+        stale = UploadSession.objects.get(id=stale_url.split("/")[-2])
+        UploadSession.objects.filter(id=stale.id).update(updated_at=timezone.now() - timedelta(hours=48))
+        orphan = Path(resumable.session_dir(), f"{uuid.uuid4()}.part")
+        orphan.write_bytes(b"left over")
+        old = (timezone.now() - timedelta(hours=48)).timestamp()
+        os.utime(orphan, (old, old))
+
+        out = io.StringIO()
+        call_command("cleanup_upload_sessions", "--dry-run", stdout=out)
+        self.assertIn("삭제 대상: 세션 1개, 세션 없는 임시 파일 1개", out.getvalue())
+        self.assertTrue(orphan.exists())
+
+        call_command("cleanup_upload_sessions", stdout=io.StringIO())
+        self.assertEqual(list(UploadSession.objects.values_list("id", flat=True)), [uuid.UUID(fresh_url.split("/")[-2])])
+        self.assertFalse(Path(resumable.session_path(stale)).exists())
+        self.assertFalse(orphan.exists())
+
+
+@override_settings(CACHES=LOCMEM_CACHE, MEDIA_ROOT=tempfile.mkdtemp())
+class ResumableConcurrencyTests(TransactionTestCase):
+    def test_concurrent_chunks_at_same_offset_do_not_interleave(self):
+        session = resumable.create_session("IMG_0001.jpg", 1000)
+        first, second = BlockingStream(b"a" * 600), BlockingStream(b"b" * 600)
+        second.release.set()
+        results = {}
+
+        def send(key, stream):
+            try:
+                results[key] = resumable.append_chunk(UploadSession.objects.get(pk=session.pk), stream, 0, 600)
+            except resumable.OffsetMismatch as e:
+                results[key] = e
+            finally:
+                connections.close_all()
+
+        threads = [threading.Thread(target=send, args=("first", first))]
+        threads[0].start()
+        self.assertTrue(first.reading.wait(5))
+        # 첫 요청이 쓰는 도중에 같은 offset 으로 온 요청
+        threads.append(threading.Thread(target=send, args=("second", second)))
+        threads[1].start()
+        # 잠금이 없으면 두 번째 요청이 이 사이에 본문을 읽어 파일에 씀
+        second.reading.wait(0.5)
+        first.release.set()
+        for thread in threads:
+            thread.join(5)
+
+        self.assertEqual(results["first"], 600)
+        self.assertIsInstance(results["second"], resumable.OffsetMismatch)
+        self.assertEqual(results["second"].offset, 600)
+        self.assertEqual(Path(resumable.session_path(session)).read_bytes(), b"a" * 600)
+        self.assertEqual(UploadSession.objects.get(pk=session.pk).offset, 600)
+
+
+@override_settings(CACHES=LOCMEM_CACHE, MEDIA_ROOT=tempfile.mkdtemp(), MEDIA_SERVE_MODE="django", MEDIA_REQUIRE_AUTH=False)
+class MediaServeTests(TestCase):
+    def setUp(self):
+        self.photo = jpeg_bytes((320, 240))
+        self.name = store_upload(self.photo)
+        self.url = f"/media/{self.name}"
+        self.etag = f'"{hashlib.sha256(self.photo).hexdigest()}"'
+
+    def get(self, **headers):
+        return self.client.get(self.url, headers=headers)
+
+    def test_full_file_with_validators(self):
+        response = self.get()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b"".join(response.streaming_content), self.photo)
+        self.assertEqual(response["ETag"], self.etag)
+        self.assertEqual(response["Accept-Ranges"], "bytes")
+        self.assertEqual(response["Cache-Control"], "public, max-age=31536000, immutable")
+
+    def test_range_returns_partial_content(self):
+        size = len(self.photo)
+        response = self.get(Range="bytes=100-199")
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response["Content-Range"], f"bytes 100-199/{size}")
+        self.assertEqual(response["Content-Length"], "100")
+        self.assertEqual(b"".join(response.streaming_content), self.photo[100:200])
+
+        suffix = self.get(Range="bytes=-10")
+        self.assertEqual((suffix.status_code, suffix["Content-Range"]), (206, f"bytes {size - 10}-{size - 1}/{size}"))
+        self.assertEqual(b"".join(suffix.streaming_content), self.photo[-10:])
+
+        # If-Range 가 현재 파일과 다르면 전체 전송
+        stale = self.get(Range="bytes=100-199", If_Range='"other"')
+        self.assertEqual(stale.status_code, 200)
+
+    def test_unsatisfiable_range(self):
+        response = self.get(Range=f"bytes={len(self.photo)}-")
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response["Content-Range"], f"bytes */{len(self.photo)}")
+
+    def test_matching_etag_is_not_modified(self):
+        response = self.get(If_None_Match=self.etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response["Cache-Control"], "public, max-age=31536000, immutable")
+        self.assertEqual(self.get(If_None_Match='"other"').status_code, 200)
+
+    def test_accel_mode_hands_off_to_nginx(self):
+        with self.settings(MEDIA_SERVE_MODE="accel", MEDIA_ACCEL_REDIRECT_PREFIX="/protected-media/"):
+            response = self.get(Range="bytes=0-9")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["X-Accel-Redirect"], f"/protected-media/{self.name}")
+        self.assertEqual(response["ETag"], self.etag)
+        self.assertEqual(response.content, b"")
+
+    def test_temporary_files_are_not_served(self):
+        tmp = Path(settings.MEDIA_ROOT, "blobs", "tmp", "x.part")
+        tmp.parent.mkdir(parents=True, exist_ok=True)
+        tmp.write_bytes(b"partial")
+        self.assertEqual(self.client.get("/media/blobs/tmp/x.part").status_code, 404)
+
+
+def age_file(path, seconds):
+    old = time.time() - seconds
+    os.utime(path, (old, old))
+
+
+@override_settings(CACHES=LOCMEM_CACHE, BLOB_GC_GRACE_SECONDS=3600)
+class BlobLifecycleTests(TestCase):
+    def setUp(self):
+        # gc_blobs 는 MEDIA_ROOT 전체를 보므로 테스트마다 빈 디렉터리
+        media = override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+        media.enable()
+        self.addCleanup(media.disable)
+
+    def delete(self, row):
+        with self.captureOnCommitCallbacks(execute=True):
+            row.delete()
+
+    def test_shared_blob_survives_until_last_row_is_deleted(self):
+        name = store_upload(jpeg_bytes())
+        first, second = (UploadedImage.objects.create(image=name) for _ in range(2))
+        age_file(storage.upload_storage.path(name), 7200)
+
+        self.delete(first)
+        self.assertTrue(signals.is_referenced(name))
+        self.assertTrue(storage.upload_storage.exists(name))
+
+        self.delete(second)
+        self.assertFalse(signals.is_referenced(name))
+        self.assertFalse(storage.upload_storage.exists(name))
+
+    def test_recently_uploaded_blob_is_left_for_gc(self):
+        # 같은 파일이 방금 다시 올라왔을 수 있으므로 유예 기간 안에는 지우지 않음
+        name = store_upload(jpeg_bytes())
+        self.delete(UploadedImage.objects.create(image=name))
+        self.assertTrue(storage.upload_storage.exists(name))
+
+    def test_gc_removes_unreferenced_blobs_after_grace_period(self):
+        kept = store_upload(jpeg_bytes((320, 240)))
+        UploadedImage.objects.create(image=kept)
+        orphan = store_upload(jpeg_bytes((320, 240), Image.radial_gradient))
+        orphan_variant = storage.upload_storage.save_derived(variants.variant_name(orphan, "thumb", "webp"), b"v")
+        leftover = Path(storage.upload_storage.tmp_dir(), "stale.part")
+        leftover.write_bytes(b"partial")
+
+        def gc(*args):
+            out = io.StringIO()
+            call_command("gc_blobs", *args, stdout=out)
+            return out.getvalue()
+
+        # 유예 기간 안: 아무것도 지우지 않음
+        self.assertIn("삭제: 0개 파일", gc())
+        self.assertTrue(storage.upload_storage.exists(orphan))
+
+        for name in (kept, orphan, orphan_variant):
+            age_file(storage.upload_storage.path(name), 7200)
+        age_file(leftover, 7200)
+        self.assertIn("삭제 대상: 3개 파일", gc("--dry-run"))
+        self.assertTrue(storage.upload_storage.exists(orphan))
+
+        self.assertIn("삭제: 3개 파일", gc())
+        self.assertTrue(storage.upload_storage.exists(kept))
+        self.assertFalse(storage.upload_storage.exists(orphan))
+        self.assertFalse(storage.upload_storage.exists(orphan_variant))
+        self.assertFalse(leftover.exists())
+
+
+@override_settings(CACHES=LOCMEM_CACHE, MEDIA_ROOT=tempfile.mkdtemp(), IMAGE_SEARCH_MAX_DISTANCE=12)
+class ImageSearchTests(TestCase):
+    def setUp(self):
+        patcher = mock.patch.object(image_search, "_index", image_search.ImageSearchIndex())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def add(self, data, title):
+        phash, signature = image_search.fingerprint(io.BytesIO(data))
+        return UploadedImage.objects.create(image=store_upload(data), title=title, phash=phash, signature=signature)
+
+    def resized(self, data, size, quality=70):
+        buffer = io.BytesIO()
+        Image.open(io.BytesIO(data)).resize(size).save(buffer, "JPEG", quality=quality)
+        return buffer.getvalue()
+
+    def test_nearest_neighbours_are_ranked_first(self):
+        photo = jpeg_bytes((640, 480), Image.radial_gradient)
+        query = self.add(photo, "원본")
+        near = self.add(self.resized(photo, (320, 240)), "축소본")
+        far = self.add(jpeg_bytes((640, 480)), "다른 사진")
+        for i in range(20):
+            # 무관한 이미지 (무작위 무늬)
+            noise = Image.effect_noise((64, 48), 60 + i).convert("RGB").resize((640, 480))
+            buffer = io.BytesIO()
+            noise.save(buffer, "JPEG")
+            self.add(buffer.getvalue(), f"noise {i}")
+
+        matches = image_search.search(query.phash, query.signature, 3, exclude_id=query.id)
+        self.assertEqual(len(matches), 3)
+        self.assertEqual(matches[0][0], near.id)
+        self.assertLessEqual(matches[0][1], 4)
+        self.assertGreater(matches[0][2], matches[1][2])
+        self.assertNotIn(query.id, [image_id for image_id, _, _ in matches])
+
+        # 저장된 이미지 기준 (GET) / 사진 파일 기준 (POST)
+        response = self.client.get("/comprocessSW/image-search/", {"image_id": query.id, "k": 1})
+        self.assertEqual([item["id"] for item in response.json()["results"]], [near.id])
+        upload = SimpleUploadedFile("query.jpg", self.resized(photo, (480, 360)), content_type="image/jpeg")
+        response = self.client.post("/comprocessSW/image-search/", {"image": upload, "k": 2})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual({item["id"] for item in response.json()["results"]}, {query.id, near.id})
+        self.assertNotIn(far.id, [item["id"] for item in response.json()["results"]])
+
+    def test_oversized_upload_reports_the_handler_rejection(self):
+        with self.settings(IMAGE_MAX_DIMENSION=100):
+            upload = SimpleUploadedFile("wide.png", png_bytes(Image.new("RGB", (200, 50))), content_type="image/png")
+            response = self.client.post("/comprocessSW/image-search/", {"image": upload})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("200x50", response.json()["image"][0])
+
+
+@override_settings(CACHES=LOCMEM_CACHE, PASSWORD_PBKDF2_ITERATIONS=1000, PASSWORD_HASH_RETRY_AFTER=3)
+class PasswordHashingTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User(username="traveler")
+        self.user.set_password("secret-pass")
+        self.user.save()
+
+    async def login(self, password="secret-pass"):
+        return await AsyncClient().post(
+            "/comprocessSW/login/", {"username": "traveler", "password": password}, content_type="application/json"
+        )
+
+    async def test_full_pool_returns_503_with_retry_after(self):
+        for workers, queue, pending in ((0, 0, 0), (2, 0, 2), (1, 3, 4)):
+            with self.subTest(workers=workers, queue=queue), \
+                    self.settings(PASSWORD_HASH_WORKERS=workers, PASSWORD_HASH_QUEUE=queue), \
+                    mock.patch.object(hashing, "_pending", pending):
+                response = await self.login()
+                self.assertEqual(response.status_code, 503)
+                self.assertEqual(response["Retry-After"], "3")
+
+        response = await self.login()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(hashing._pending, 0)
+
+    async def test_login_upgrades_old_iteration_hash(self):
+        with self.settings(PASSWORD_PBKDF2_ITERATIONS=500):
+            self.user.set_password("secret-pass")
+        await sync_to_async(self.user.save)()
+        self.assertTrue(self.user.password.startswith("pbkdf2_sha256$500$"))
+
+        self.assertEqual((await self.login("wrong")).status_code, 401)
+        await sync_to_async(self.user.refresh_from_db)()
+        self.assertTrue(self.user.password.startswith("pbkdf2_sha256$500$"))
+
+        self.assertEqual((await self.login()).status_code, 200)
+        await sync_to_async(self.user.refresh_from_db)()
+        self.assertTrue(self.user.password.startswith("pbkdf2_sha256$1000$"))
+        self.assertTrue(self.user.check_password("secret-pass"))
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class UserListPaginationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        # 두 명씩 같은 가입 시각 (id 로만 순서가 정해지는 경계)
+        self.base = timezone.now() - timedelta(days=1)
+        for index in range(7):
+            user = User.objects.create(username=f"member{index}")
+            User.objects.filter(pk=user.pk).update(created_at=self.base + timedelta(minutes=index // 2))
+        self.client = APIClient()
+
+    def fetch(self, **params):
+        response = self.client.get("/comprocessSW/users/", params)
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()
+
+    def test_pages_with_tied_created_at_neither_overlap_nor_skip(self):
+        expected = list(User.objects.order_by("-created_at", "-id").values_list("id", flat=True))
+        for limit in (1, 2, 3):
+            with self.subTest(limit=limit):
+                seen, cursor, pages = [], None, 0
+                while True:
+                    params = {"limit": limit, "count": "none"}
+                    if cursor:
+                        params["cursor"] = cursor
+                    body = self.fetch(**params)
+                    self.assertLessEqual(len(body["users"]), limit)
+                    seen += [user["id"] for user in body["users"]]
+                    pages += 1
+                    cursor = body["next"]
+                    if not cursor:
+                        break
+                self.assertEqual(seen, expected)
+                self.assertEqual(pages, -(-len(expected) // limit))
+
+    def test_tampered_cursor_returns_400(self):
+        cursor = self.fetch(limit=2)["next"]
+        tampered = cursor[:-1] + ("A" if cursor[-1] != "A" else "B")
+        # 서명은 맞지만 내용이 잘못된 커서, 다른 salt 로 서명한 커서
+        malformed = signing.dumps(["not-a-date", 1], salt=pagination.CURSOR_SALT, compress=True)
+        other_salt = signing.dumps([pagination.iso(self.base), 1], compress=True)
+        for value in (tampered, "garbage", malformed, other_salt):
+            with self.subTest(cursor=value):
+                response = self.client.get("/comprocessSW/users/", {"cursor": value})
+                self.assertEqual(response.status_code, 400)
+                self.assertIn("error", response.json())
+
+    def test_count_modes(self):
+        self.assertIsNone(self.fetch(count="none")["count"])
+        self.assertEqual(self.fetch(count="approx")["count"], 7)
+        self.assertEqual(self.fetch()["count"], 7)
+
+        User.objects.create(username="latecomer")
+        # approx 는 USER_LIST_COUNT_CACHE_SECONDS 동안 캐시된 값, exact 는 매번 COUNT
+        self.assertEqual(self.fetch(count="approx")["count"], 7)
+        self.assertEqual(self.fetch(count="exact")["count"], 8)
+        cache.clear()
+        self.assertEqual(self.fetch(count="approx")["count"], 8)
+
+        response = self.client.get("/comprocessSW/users/", {"count": "all"})
+        self.assertEqual(response.status_code, 400)
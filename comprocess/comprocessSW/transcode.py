@@ -0,0 +1,183 @@
+"""
+업로드 이미지 형식 변환 (저장 공간 / 전송량 절감)
+
+PNG 스크린샷, HEIC 사진처럼 무손실/대용량 형식으로 올라온 이미지를
+IMAGE_TRANSCODE(webp / jpeg) 설정에 따라 다시 인코딩해서 저장합니다.
+
+- 사진 같은 이미지: 고품질 손실 압축 (IMAGE_TRANSCODE_QUALITY)
+- 글자/그래픽 위주 이미지: WebP 무손실 (jpeg 설정이면 변환하지 않음)
+- EXIF 회전은 픽셀에 반영하고 EXIF/XMP 등 메타데이터는 버림 (ICC 색 프로필만 유지)
+- IMAGE_TRANSCODE_MIN_SAVING 이상 작아지지 않으면 원본 유지
+- 원본 blob 은 IMAGE_TRANSCODE_KEEP_ORIGINAL 일 때만 보관 (아니면 참조가 없어진 뒤 삭제)
+
+변환은 업로드 후 백그라운드에서 실행되고(schedule), 이어서 축소본을 만듭니다.
+기존 업로드는 manage.py transcode_uploads 로 변환합니다.
+"""
+import io
+import os
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db.models import Q
+from PIL import Image, ImageOps, features
+
+from . import background, metrics, variants
+from .ai_module.image_preprocess import has_alpha
+from .storage import content_hash_from_name, upload_storage
+
+try:
+    # HEIC/HEIF 지원은 선택 사항 (pip install pillow-heif)
+    from pillow_heif import register_heif_opener
+except ImportError:
+    register_heif_opener = None
+else:
+    register_heif_opener()
+
+SOURCE_FORMATS = {"PNG", "HEIF", "TIFF", "BMP"}
+SOURCE_EXTENSIONS = {".png", ".heic", ".heif", ".tif", ".tiff", ".bmp"}
+PHOTO_SAMPLE = 128
+# 가장 많이 쓰인 색 16개가 차지하는 비율이 이보다 작으면 사진으로 판단
+PHOTO_TOP_COLOR_SHARE = 0.5
+
+
+def enabled():
+    return settings.IMAGE_TRANSCODE in ("webp", "jpeg")
+
+
+def is_photographic(image):
+    """
+    사진인지 (스크린샷/그래픽이 아닌지)
+
+    스크린샷과 그래픽은 배경/글자색 등 적은 수의 색이 화면 대부분을 차지하고,
+    사진은 색이 넓게 퍼져 있습니다. 축소한 표본에서 상위 16색의 비율로 판단합니다.
+    """
+    sample = image.convert("RGB")
+    sample.thumbnail((PHOTO_SAMPLE, PHOTO_SAMPLE))
+    pixels = sample.width * sample.height
+    counts = sorted((count for count, _ in sample.getcolors(pixels)), reverse=True)
+    return sum(counts[:16]) / pixels < PHOTO_TOP_COLOR_SHARE
+
+
+def encode(file):
+    """
+    변환 대상이면 다시 인코딩
+
+    Returns:
+        (bytes, 확장자, "lossy" | "lossless") 또는 None (대상 아님)
+    """
+    target = settings.IMAGE_TRANSCODE
+    with Image.open(file) as source:
+        if source.format not in SOURCE_FORMATS or getattr(source, "is_animated", False):
+            return None
+        icc_profile = source.info.get("icc_profile")
+        image = ImageOps.exif_transpose(source)
+        photographic = is_photographic(image)
+        alpha = has_alpha(image)
+
+        buffer = io.BytesIO()
+        if target == "jpeg" and photographic and not alpha:
+            image.convert("RGB").save(
+                buffer, "JPEG", quality=settings.IMAGE_TRANSCODE_QUALITY,
+                optimize=True, progressive=True, icc_profile=icc_profile
+            )
+            return buffer.getvalue(), ".jpg", "lossy"
+        if target == "webp" and features.check("webp"):
+            image = image.convert("RGBA" if alpha else "RGB")
+            if photographic:
+                image.save(buffer, "WEBP", quality=settings.IMAGE_TRANSCODE_QUALITY, method=6, icc_profile=icc_profile)
+                return buffer.getvalue(), ".webp", "lossy"
+            image.save(buffer, "WEBP", lossless=True, quality=100, method=4, icc_profile=icc_profile)
+            return buffer.getvalue(), ".webp", "lossless"
+    return None
+
+
+def transcode_upload(name, storage=None, dry_run=False):
+    """
+    저장된 업로드 name 을 변환하고, 같은 파일을 참조하는 모든 행의 경로를 변경
+
+    Returns:
+        {"name", "before", "after", "kind"} 또는 None (대상 아님 / 충분히 작아지지 않음)
+        dry_run 이면 저장/변경 없이 크기만 계산하고 name 은 None
+    """
+    from .models import UploadedImage
+    from .signals import release_blob
+
+    storage = storage or upload_storage
+    if os.path.splitext(name)[1].lower() not in SOURCE_EXTENSIONS:
+        return None
+    before = storage.size(name)
+    with storage.open(name) as f:
+        encoded = encode(f)
+    if encoded is None or len(encoded[0]) > before * (1 - settings.IMAGE_TRANSCODE_MIN_SAVING):
+        if not dry_run:
+            metrics.incr("transcode:skipped")
+        return None
+
+    data, extension, kind = encoded
+    result = {"name": None, "before": before, "after": len(data), "kind": kind}
+    if dry_run:
+        return result
+
+    new_name = storage.save(os.path.splitext(name)[0] + extension, ContentFile(data))
+    UploadedImage.objects.filter(image=name).update(
+        image=new_name,
+        content_hash=content_hash_from_name(new_name),
+        original_image=name,
+        variants=None,
+    )
+    if not settings.IMAGE_TRANSCODE_KEEP_ORIGINAL:
+        # 방금 올라온 원본은 GC 유예 기간이 지난 뒤 gc_blobs 가 삭제
+        release_blob(storage, name)
+
+    metrics.incr(f"transcode:{kind}")
+    metrics.incr("transcode:bytes_before", before)
+    metrics.incr("transcode:bytes_after", len(data))
+    result["name"] = new_name
+    return result
+
+
+def fill_fingerprint(name, storage=None):
+    """지각 해시/검색용 서명이 비어 있는 행(저장소에 직접 올린 업로드, 서명 도입 전 업로드)의 서명 계산"""
+    from .image_search import fingerprint
+    from .models import UploadedImage
+
+    rows = UploadedImage.objects.filter(Q(phash="") | Q(signature__isnull=True), image=name)
+    if not rows.exists():
+        return
+    with (storage or upload_storage).open(name) as f:
+        phash, signature = fingerprint(f)
+    if phash:
+        rows.update(phash=phash, signature=signature)
+
+
+def process_upload(name):
+    """업로드 후처리: (직접 업로드면) 지각 해시/서명 → (설정 시) 형식 변환 → 썸네일/축소본 생성"""
+    fill_fingerprint(name)
+    if enabled():
+        result = transcode_upload(name)
+        if result:
+            name = result["name"]
+    variants.generate_variants(name)
+
+
+def schedule(names):
+    """커밋 후 백그라운드에서 업로드 후처리 (같은 원본은 한 번만)"""
+    for name in dict.fromkeys(names):
+        if name:
+            background.submit_on_commit(process_upload, name)
+
+
+def stats():
+    """show_metrics 용 요약"""
+    before = metrics.get("transcode:bytes_before")
+    after = metrics.get("transcode:bytes_after")
+    converted = metrics.get("transcode:lossy") + metrics.get("transcode:lossless")
+    return {
+        "policy": settings.IMAGE_TRANSCODE,
+        "converted": converted,
+        "lossy": metrics.get("transcode:lossy"),
+        "lossless": metrics.get("transcode:lossless"),
+        "skipped": metrics.get("transcode:skipped"),
+        "saved_mb": round((before - after) / 1024 / 1024, 1),
+        "size_ratio": metrics.ratio(after, before),
+    }
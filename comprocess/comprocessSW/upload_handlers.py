@@ -0,0 +1,161 @@
+"""
+업로드 이미지 조기 검증 (스트리밍 중 헤더 검사)
+
+serializers.ImageField 는 업로드가 전부 메모리/임시 파일에 저장된 뒤에야 Pillow 로 파일을 열어 보므로,
+너무 크거나 픽셀 폭탄(작은 PNG 가 수십억 픽셀로 풀리는 파일 등)인 업로드도 끝까지 받고 나서 거부됩니다.
+
+ImageUploadLimitHandler 는 FILE_UPLOAD_HANDLERS 의 첫 번째 핸들러로, 데이터가 들어오는 동안
+- 누적 바이트 수 (IMAGE_UPLOAD_MAX_BYTES)
+- 컨테이너 헤더의 형식 (IMAGE_ALLOWED_FORMATS), 가로/세로 (IMAGE_MAX_DIMENSION), 픽셀 수 (IMAGE_MAX_PIXELS)
+를 검사하고, 위반하면 SkipFile 로 나머지 데이터를 저장하지 않고 버립니다.
+픽셀 디코딩은 하지 않습니다 (Pillow 의 Image.open 은 헤더만 읽음).
+
+거부 사유는 request.image_upload_rejections 에 기록되고, 뷰에서 upload_errors(request) 로 꺼내
+400 응답으로 돌려줍니다. (거부된 파일은 request.FILES 에 없으므로 serializer 는 '파일 없음' 만 알 수 있음)
+"""
+import io
+import warnings
+
+from django.conf import settings
+from django.core.files.uploadhandler import FileUploadHandler, SkipFile
+from PIL import Image
+
+# 헤더를 찾기 위해 모아 두는 최대 크기 (JPEG 은 EXIF/ICC 뒤에 크기 정보가 있음)
+HEADER_MAX_BYTES = 256 * 1024
+# ISO-BMFF(HEIF/AVIF) 는 파일 전체가 있어야 열 수 있으므로 헤더 단계에서는 판단하지 않음
+ISO_BMFF_BRAND = b"ftyp"
+
+
+class ImageRejected(ValueError):
+    """업로드 이미지 검증 실패 (메시지는 그대로 API 응답에 사용)"""
+
+
+def check_image_limits(fmt, width, height):
+    if fmt not in settings.IMAGE_ALLOWED_FORMATS:
+        raise ImageRejected(f"지원하지 않는 이미지 형식입니다: {fmt}")
+    if max(width, height) > settings.IMAGE_MAX_DIMENSION:
+        raise ImageRejected(
+            f"이미지 크기가 너무 큽니다: {width}x{height} (가로/세로 최대 {settings.IMAGE_MAX_DIMENSION}px)"
+        )
+    if width * height > settings.IMAGE_MAX_PIXELS:
+        raise ImageRejected(
+            f"이미지 픽셀 수가 너무 많습니다: {width}x{height} "
+            f"(최대 {settings.IMAGE_MAX_PIXELS / 1_000_000:g}메가픽셀)"
+        )
+
+
+class ImageHeaderValidator:
+    """
+    파일 데이터를 조각 단위로 받으면서 크기/헤더 검사
+
+    feed() 와 finish() 는 제한을 넘으면 ImageRejected 를 발생시킵니다.
+    """
+
+    def __init__(self):
+        self.size = 0
+        self.header = bytearray()
+        self.info = None
+        self.deferred = False
+
+    def feed(self, chunk):
+        self.size += len(chunk)
+        if self.size > settings.IMAGE_UPLOAD_MAX_BYTES:
+            raise ImageRejected(
+                f"파일이 너무 큽니다 (최대 {settings.IMAGE_UPLOAD_MAX_BYTES / 1024 / 1024:g}MB)"
+            )
+        if self.info is None and not self.deferred and len(self.header) < HEADER_MAX_BYTES:
+            self.header += chunk[:HEADER_MAX_BYTES - len(self.header)]
+            self.info = self._parse(final=len(self.header) >= HEADER_MAX_BYTES)
+
+    def finish(self):
+        """
+        Returns:
+            {"format", "width", "height"} 또는 None (헤더만으로 판단할 수 없는 형식)
+        """
+        if self.size == 0:
+            raise ImageRejected("빈 파일입니다.")
+        if self.info is None and not self.deferred:
+            self.info = self._parse(final=True)
+        return self.info
+
+    def _parse(self, final):
+        try:
+            with warnings.catch_warnings():
+                # 제한 초과는 아래에서 직접 판단 (MAX_IMAGE_PIXELS 의 2배 이상이면 Pillow 가 바로 오류)
+                warnings.simplefilter("ignore", Image.DecompressionBombWarning)
+                with Image.open(io.BytesIO(self.header)) as image:
+                    fmt, (width, height) = image.format, image.size
+        except Image.DecompressionBombError:
+            raise ImageRejected(
+                f"이미지 픽셀 수가 너무 많습니다 (최대 {settings.IMAGE_MAX_PIXELS / 1_000_000:g}메가픽셀)"
+            )
+        except Exception:
+            # 헤더가 아직 다 오지 않았거나 이미지가 아님
+            if not final:
+                return None
+            if self.header[4:8] == ISO_BMFF_BRAND and self.size > len(self.header):
+                self.deferred = True
+                return None
+            raise ImageRejected("이미지 파일이 아니거나 손상된 파일입니다.")
+        check_image_limits(fmt, width, height)
+        return {"format": fmt, "width": width, "height": height}
+
+
+def validate_header(prefix, total_size):
+    """
+    파일 앞부분(최대 HEADER_MAX_BYTES)만으로 검사 (이어 올리기처럼 데이터가 여러 요청에 나뉘어 오는 경우)
+
+    Returns:
+        ImageHeaderValidator.finish() 와 같음
+    """
+    validator = ImageHeaderValidator()
+    validator.header = bytearray(prefix[:HEADER_MAX_BYTES])
+    validator.size = total_size
+    return validator.finish()
+
+
+def record_rejection(request, field_name, file_name, message):
+    rejections = getattr(request, "image_upload_rejections", None)
+    if rejections is None:
+        rejections = request.image_upload_rejections = {}
+    rejections.setdefault(field_name, []).append(f"{file_name}: {message}")
+
+
+def upload_errors(request):
+    """
+    스트리밍 검사에서 거부된 업로드 {필드명: [사유, ...]} (없으면 빈 dict)
+
+    request.data / request.FILES 로 업로드를 읽은 뒤에 호출해야 합니다.
+    """
+    return getattr(request, "image_upload_rejections", None) or {}
+
+
+class ImageUploadLimitHandler(FileUploadHandler):
+    """받는 동안 이미지 크기/헤더를 검사하는 업로드 핸들러 (FILE_UPLOAD_HANDLERS 첫 번째)"""
+
+    def new_file(self, field_name, file_name, content_type, content_length, charset=None, content_type_extra=None):
+        super().new_file(field_name, file_name, content_type, content_length, charset, content_type_extra)
+        self.validator = ImageHeaderValidator()
+        if content_length and content_length > settings.IMAGE_UPLOAD_MAX_BYTES:
+            self.reject(ImageRejected(
+                f"파일이 너무 큽니다 (최대 {settings.IMAGE_UPLOAD_MAX_BYTES / 1024 / 1024:g}MB)"
+            ))
+
+    def receive_data_chunk(self, raw_data, start):
+        try:
+            self.validator.feed(raw_data)
+        except ImageRejected as e:
+            self.reject(e)
+        return raw_data
+
+    def file_complete(self, file_size):
+        # 여기서는 SkipFile 을 쓸 수 없으므로 사유만 기록 (뷰에서 400 응답)
+        try:
+            self.validator.finish()
+        except ImageRejected as e:
+            record_rejection(self.request, self.field_name, self.file_name, str(e))
+        return None
+
+    def reject(self, error):
+        record_rejection(self.request, self.field_name, self.file_name, str(error))
+        raise SkipFile()
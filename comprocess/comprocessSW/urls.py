@@ -1,10 +1,12 @@
 from django.urls import path
 from rest_framework_simplejwt.views import TokenRefreshView
 from .views import (
-    TravelScheduleAI, ImageUploadView, ImageAnalyzeView, ExchangeRatePredictionView,
+    TravelScheduleAI, ImageUploadView, ImageAnalyzeView, ImageAnalyzeBatchView, ExchangeRatePredictionView,
     UserRegisterView, UserLoginView, UserUpdateView, UserDeleteView,
     UserDetailView, UserListView, UserTravelHistoryView, TravelScheduleDetailView,
-    UserMeView, MyTravelHistoryView
+    TravelScheduleDayView, UserMeView, MyTravelHistoryView,
+    UploadSessionCreateView, UploadSessionView, UploadSessionCompleteView, DirectUploadView,
+    ImageSearchView
 )
 
 urlpatterns = [
@@ -23,7 +25,14 @@ urlpatterns = [
     # Travel & Image
     path('travel-plan/', TravelScheduleAI.as_view()),
     path('travel-plan/<int:schedule_id>/', TravelScheduleDetailView.as_view(), name='travel-schedule-detail'),
+    path('travel-plan/<int:schedule_id>/days/<int:day>/', TravelScheduleDayView.as_view(), name='travel-schedule-day'),
     path('image-upload/', ImageUploadView.as_view()),
+    path('image-upload/sessions/', UploadSessionCreateView.as_view(), name='upload-session-create'),
+    path('image-upload/sessions/<uuid:session_id>/', UploadSessionView.as_view(), name='upload-session'),
+    path('image-upload/sessions/<uuid:session_id>/complete/', UploadSessionCompleteView.as_view(), name='upload-session-complete'),
+    path('image-upload/direct/<str:token>/', DirectUploadView.as_view(), name='direct-upload'),
+    path('image-search/', ImageSearchView.as_view(), name='image-search'),
     path('image-analyze/', ImageAnalyzeView.as_view()),
+    path('image-analyze/batch/', ImageAnalyzeBatchView.as_view(), name='image-analyze-batch'),
     path('exchange-rate-predict/', ExchangeRatePredictionView.as_view()),
 ]
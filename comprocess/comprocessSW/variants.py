@@ -0,0 +1,189 @@
+"""
+업로드 이미지의 썸네일 / 너비별 축소본 생성
+
+갤러리 화면에서 원본(수 MB)을 내려받지 않도록 업로드 후 백그라운드에서
+정사각형 썸네일과 몇 가지 너비(IMAGE_VARIANT_WIDTHS)의 축소본을 만들어
+원본 옆에 저장합니다.
+
+    blobs/ab/cd/<sha256>.jpg          원본
+    blobs/ab/cd/<sha256>_thumb.webp   썸네일 (IMAGE_THUMBNAIL_SIZE 정사각형)
+    blobs/ab/cd/<sha256>_w640.webp    너비 640 축소본
+
+- 축소본 경로는 원본 경로에서 정해지므로 같은 파일을 여러 번 올려도 한 번만 만듭니다.
+- 원본보다 넓은 너비는 만들지 않습니다 (확대 없음).
+- 결과는 UploadedImage.variants 에 {"thumb": {"name", "width", "height"}, "w640": {...}} 로 저장합니다.
+"""
+import io
+import math
+import os
+import re
+
+from django.conf import settings
+from PIL import Image, ImageOps, features
+
+from .storage import upload_storage
+
+THUMB = "thumb"
+EXIF_ORIENTATION = 0x0112
+# <원본 경로(확장자 제외)>_<thumb|w640>.<webp|jpg>
+VARIANT_NAME = re.compile(r"^(?P<root>.+)_(?P<key>thumb|w\d+)\.(?:webp|jpg)$")
+
+
+def variant_format():
+    """(Pillow 포맷, 확장자) - WebP 를 지원하지 않는 Pillow 빌드면 JPEG"""
+    if settings.IMAGE_VARIANT_FORMAT == "webp" and features.check("webp"):
+        return "WEBP", "webp"
+    return "JPEG", "jpg"
+
+
+def variant_name(name, key, extension):
+    return f"{os.path.splitext(name)[0]}_{key}.{extension}"
+
+
+def variant_keys(width):
+    """원본 너비에 대해 만들 축소본 키 (큰 것부터)"""
+    widths = sorted((w for w in settings.IMAGE_VARIANT_WIDTHS if w < width), reverse=True)
+    return [f"w{w}" for w in widths] + [THUMB]
+
+
+def _encode(image, fmt):
+    buffer = io.BytesIO()
+    if fmt == "WEBP":
+        mode = "RGBA" if image.mode in ("RGBA", "LA", "P") else "RGB"
+        image.convert(mode).save(buffer, "WEBP", quality=settings.IMAGE_VARIANT_QUALITY, method=4)
+    else:
+        image.convert("RGB").save(
+            buffer, "JPEG", quality=settings.IMAGE_VARIANT_QUALITY, optimize=True, progressive=True
+        )
+    return buffer.getvalue()
+
+
+def _oriented_size(image):
+    """EXIF 회전을 반영한 (너비, 높이)"""
+    if image.getexif().get(EXIF_ORIENTATION, 1) > 4:
+        return image.height, image.width
+    return image.size
+
+
+def render_variants(file):
+    """
+    원본 파일에서 축소본 생성
+
+    Returns:
+        {key: (bytes, width, height)}
+    """
+    fmt, _ = variant_format()
+    size = settings.IMAGE_THUMBNAIL_SIZE
+    with Image.open(file) as source:
+        width, height = _oriented_size(source)
+        # JPEG 은 가장 큰 축소본과 썸네일에 필요한 크기 이상으로만 축소 디코딩
+        # (큰 사진도 전체 해상도로 풀지 않음)
+        largest = max([w for w in settings.IMAGE_VARIANT_WIDTHS if w < width], default=0)
+        scale = min(1, max(largest / width, size / min(width, height)))
+        source.draft("RGB", (math.ceil(source.width * scale), math.ceil(source.height * scale)))
+        image = ImageOps.exif_transpose(source)
+        image.load()
+
+    rendered = {}
+    current = image
+    for key in variant_keys(width):
+        if key == THUMB:
+            # 작은 원본은 확대하지 않고 짧은 변 기준 정사각형으로만 자름
+            side = min(size, image.width, image.height)
+            base = current if min(current.size) >= side else image
+            variant = ImageOps.fit(base, (side, side), Image.LANCZOS)
+        else:
+            target = int(key[1:])
+            # 직전(더 큰) 축소본에서 다시 줄여서 원본 전체를 매번 다시 계산하지 않음
+            variant = current = current.resize(
+                (target, max(1, round(current.height * target / current.width))), Image.LANCZOS
+            )
+        rendered[key] = (_encode(variant, fmt), variant.width, variant.height)
+    return rendered
+
+
+def _existing_variants(storage, name, extension):
+    """이미 만들어진 축소본이 모두 있으면 그 정보, 하나라도 없으면 None"""
+    try:
+        with storage.open(name) as f, Image.open(f) as image:
+            width, _ = _oriented_size(image)
+    except OSError:
+        return None
+    variants = {}
+    for key in variant_keys(width):
+        path = variant_name(name, key, extension)
+        if not storage.exists(path):
+            return None
+        with storage.open(path) as f, Image.open(f) as image:
+            variants[key] = {"name": path, "width": image.width, "height": image.height}
+    return variants
+
+
+def generate_variants(name, force=False, storage=None):
+    """
+    원본 name 의 축소본을 만들고, 같은 파일을 참조하는 모든 행의 variants 갱신
+
+    Args:
+        name: 원본 저장 경로 (UploadedImage.image.name)
+        force: 이미 있어도 다시 생성
+
+    Returns:
+        variants dict
+    """
+    from .models import UploadedImage
+
+    storage = storage or upload_storage
+    _, extension = variant_format()
+    variants = None if force else _existing_variants(storage, name, extension)
+    if variants is None:
+        with storage.open(name) as f:
+            rendered = render_variants(f)
+        variants = {}
+        for key, (data, width, height) in rendered.items():
+            path = storage.save_derived(variant_name(name, key, extension), data)
+            variants[key] = {"name": path, "width": width, "height": height}
+
+    UploadedImage.objects.filter(image=name).update(variants=variants)
+    return variants
+
+
+def candidate_names(name):
+    """현재 설정으로 만들어질 수 있는 축소본 경로 (디렉터리를 읽지 않음, 큰 평평한 디렉터리용)"""
+    keys = [THUMB] + [f"w{w}" for w in settings.IMAGE_VARIANT_WIDTHS]
+    return [variant_name(name, key, extension) for extension in ("webp", "jpg") for key in keys]
+
+
+def variant_files(storage, name):
+    """원본 name 옆에 저장된 축소본 경로 목록 (형식/너비 설정이 바뀐 예전 파일 포함)"""
+    directory, filename = os.path.split(name)
+    root = os.path.splitext(filename)[0]
+    try:
+        _, files = storage.listdir(directory)
+    except FileNotFoundError:
+        return []
+    names = []
+    for candidate in files:
+        match = VARIANT_NAME.match(candidate)
+        if match and match.group("root") == root:
+            names.append(f"{directory}/{candidate}" if directory else candidate)
+    return names
+
+
+def delete_variants(storage, name):
+    for path in variant_files(storage, name):
+        storage.delete(path)
+
+
+def variant_urls(variants, request=None):
+    """API 응답용 {key: {"url", "width", "height"}} (아직 생성 전이면 None)"""
+    if not variants:
+        return None
+    result = {}
+    for key, info in variants.items():
+        url = upload_storage.url(info["name"])
+        result[key] = {
+            "url": request.build_absolute_uri(url) if request else url,
+            "width": info["width"],
+            "height": info["height"],
+        }
+    return result
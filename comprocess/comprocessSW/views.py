@@ -1,5 +1,13 @@
 import asyncio
+import copy
+import io
 import json
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.http import StreamingHttpResponse
+from django.utils import timezone
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
@@ -8,22 +16,35 @@ from rest_framework.renderers import JSONRenderer, BrowsableAPIRenderer
 from drf_yasg.utils import swagger_auto_schema
 from drf_yasg import openapi
 
-from .models import Travel_Schedule, UploadedImage, User
+from .models import Travel_Schedule, TravelDayRevision, UploadedImage, UploadSession, User
 from .serializers import (
     TravelScheduleSerializer, ImageUploadSerializer, ExchangeRatePredictionSerializer,
     UserRegisterSerializer, UserLoginSerializer, UserUpdateSerializer, UserDeleteSerializer,
-    UserDetailSerializer, TravelScheduleCreateSerializer, TravelScheduleDetailSerializer
+    UserDetailSerializer, TravelScheduleCreateSerializer, TravelScheduleDetailSerializer,
+    TravelDayRegenerateSerializer, TravelDayRevisionSerializer, ImageBatchUploadSerializer,
+    UploadSessionCreateSerializer, UploadSessionSerializer, UploadSessionCompleteSerializer,
+    ImageSearchQuerySerializer, ImageSearchUploadSerializer, UserListQuerySerializer, build_uploaded_image
 )
-from comprocessSW.ai_module.kjy import generate_travel_plan
+from comprocessSW.ai_module.kjy import AI_CALL_ERRORS, generate_travel_plan_result, regenerate_travel_day
+from comprocessSW.ai_module.postprocess import postprocess_travel_plan
 from comprocessSW.ai_module.kwy import KoreanImageAnalyzer
+from comprocessSW.ai_module.image_preprocess import PEAK_MB_EDGES
 from comprocessSW.ai_module.exchange_rate_predictor import ExchangeRatePredictor
-from comprocessSW.authentication import get_tokens_for_user
+from comprocessSW.authentication import ClaimsJWTAuthentication, get_tokens_for_user
+from comprocessSW import hashing, image_hash, image_search, metrics, pagination, plan_cache, resumable, transcode
+from comprocessSW.async_api import AsyncAPIView, request_data
+from comprocessSW.upload_handlers import ImageRejected, upload_errors
+from comprocessSW.storage import BlobVerificationError, upload_storage
+from django.core import signing
 from rest_framework.permissions import IsAuthenticated
 from rest_framework_simplejwt.views import TokenRefreshView
 from rest_framework_simplejwt.authentication import JWTAuthentication
 
+# 유저 목록에 내보내는 필드 (UserDetailSerializer.Meta.fields 와 같음)
+USER_LIST_FIELDS = ('id', 'username', 'created_at', 'updated_at')
+
 # Create your views here.
-class UserRegisterView(APIView):
+class UserRegisterView(AsyncAPIView):
     @swagger_auto_schema(
         operation_summary="회원가입",
         operation_description="""
@@ -54,14 +75,17 @@ class UserRegisterView(APIView):
                     }
                 }
             ),
-            400: "잘못된 요청 (아이디 중복 또는 필수 필드 누락)"
+            400: "잘못된 요청 (아이디 중복 또는 필수 필드 누락)",
+            503: "⏳ 요청이 많아 처리할 수 없음 (Retry-After 초 뒤 다시 시도)"
         },
         tags=["User Management"]
     )
-    def post(self, request):
-        serializer = UserRegisterSerializer(data=request.data)
-        if serializer.is_valid():
-            user = serializer.save()
+    async def post(self, request):
+        serializer = UserRegisterSerializer(data=await request_data(request))
+        if await sync_to_async(serializer.is_valid)():
+            # 비밀번호 해시는 전용 풀에서 계산 (hashing.py)
+            encoded_password = await hashing.make_password(serializer.validated_data['password'])
+            user = await sync_to_async(serializer.save)(encoded_password=encoded_password)
             return Response({
                 "id": user.id,
                 "username": user.username,
@@ -71,7 +95,7 @@ class UserRegisterView(APIView):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
-class UserLoginView(APIView):
+class UserLoginView(AsyncAPIView):
     @swagger_auto_schema(
         operation_summary="로그인",
         operation_description="""
@@ -103,12 +127,13 @@ class UserLoginView(APIView):
                     }
                 }
             ),
-            401: "아이디 또는 비밀번호가 올바르지 않습니다."
+            401: "아이디 또는 비밀번호가 올바르지 않습니다.",
+            503: "⏳ 요청이 많아 처리할 수 없음 (Retry-After 초 뒤 다시 시도)"
         },
         tags=["User Management"]
     )
-    def post(self, request):
-        serializer = UserLoginSerializer(data=request.data)
+    async def post(self, request):
+        serializer = UserLoginSerializer(data=await request_data(request))
         if not serializer.is_valid():
             return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
         
@@ -116,8 +141,9 @@ class UserLoginView(APIView):
         password = serializer.validated_data['password']
         
         try:
-            user = User.objects.get(username=username)
-            if user.check_password(password):
+            user = await sync_to_async(User.objects.get)(username=username)
+            # 해시 설정(알고리즘/반복 횟수)이 바뀌었으면 새 설정으로 다시 해시해 저장
+            if await hashing.check_password(user, password):
                 tokens = get_tokens_for_user(user)
                 return Response({
                     "id": user.id,
@@ -136,7 +162,7 @@ class UserLoginView(APIView):
             }, status=status.HTTP_401_UNAUTHORIZED)
 
 
-class UserUpdateView(APIView):
+class UserUpdateView(AsyncAPIView):
     @swagger_auto_schema(
         operation_summary="계정 수정",
         operation_description="""
@@ -148,6 +174,8 @@ class UserUpdateView(APIView):
         - new_username: 새 아이디 (선택)
         - new_password: 새 비밀번호 (선택)
         
+        아이디를 바꾸면 응답에 새 access/refresh 토큰이 포함됩니다. 이후 요청에는 새 토큰을 사용하세요.
+        
         **예시:**
         ```json
         {
@@ -165,30 +193,33 @@ class UserUpdateView(APIView):
                     "application/json": {
                         "id": 1,
                         "username": "newuser",
-                        "message": "계정 정보가 수정되었습니다."
+                        "message": "계정 정보가 수정되었습니다.",
+                        "access": "eyJ0eXAiOiJKV1QiLCJhbGc...",
+                        "refresh": "eyJ0eXAiOiJKV1QiLCJhbGc..."
                     }
                 }
             ),
             400: "잘못된 요청",
             401: "현재 비밀번호가 올바르지 않습니다.",
-            404: "사용자를 찾을 수 없습니다."
+            404: "사용자를 찾을 수 없습니다.",
+            503: "⏳ 요청이 많아 처리할 수 없음 (Retry-After 초 뒤 다시 시도)"
         },
         tags=["User Management"]
     )
-    def put(self, request, user_id):
-        serializer = UserUpdateSerializer(data=request.data)
+    async def put(self, request, user_id):
+        serializer = UserUpdateSerializer(data=await request_data(request))
         if not serializer.is_valid():
             return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
         
         try:
-            user = User.objects.get(id=user_id)
+            user = await sync_to_async(User.objects.get)(id=user_id)
         except User.DoesNotExist:
             return Response({
                 "error": "사용자를 찾을 수 없습니다."
             }, status=status.HTTP_404_NOT_FOUND)
         
         current_password = serializer.validated_data['current_password']
-        if not user.check_password(current_password):
+        if not await hashing.check_password(user, current_password):
             return Response({
                 "error": "현재 비밀번호가 올바르지 않습니다."
             }, status=status.HTTP_401_UNAUTHORIZED)
@@ -196,7 +227,7 @@ class UserUpdateView(APIView):
         # 아이디 변경
         new_username = serializer.validated_data.get('new_username')
         if new_username:
-            if User.objects.filter(username=new_username).exclude(id=user_id).exists():
+            if await sync_to_async(User.objects.filter(username=new_username).exclude(id=user_id).exists)():
                 return Response({
                     "error": "이미 사용 중인 아이디입니다."
                 }, status=status.HTTP_400_BAD_REQUEST)
@@ -205,18 +236,22 @@ class UserUpdateView(APIView):
         # 비밀번호 변경
         new_password = serializer.validated_data.get('new_password')
         if new_password:
-            user.set_password(new_password)
+            user.password = await hashing.make_password(new_password)
         
-        user.save()
+        await sync_to_async(user.save)()
         
-        return Response({
+        data = {
             "id": user.id,
             "username": user.username,
             "message": "계정 정보가 수정되었습니다."
-        }, status=status.HTTP_200_OK)
+        }
+        # 토큰에 아이디가 들어 있으므로 아이디를 바꾸면 새 토큰 발급 (user/me/ 는 토큰 정보로 응답)
+        if new_username:
+            data.update(get_tokens_for_user(user))
+        return Response(data, status=status.HTTP_200_OK)
 
 
-class UserDeleteView(APIView):
+class UserDeleteView(AsyncAPIView):
     @swagger_auto_schema(
         operation_summary="계정 삭제",
         operation_description="""
@@ -245,12 +280,13 @@ class UserDeleteView(APIView):
                 }
             ),
             401: "아이디 또는 비밀번호가 올바르지 않습니다.",
-            404: "사용자를 찾을 수 없습니다."
+            404: "사용자를 찾을 수 없습니다.",
+            503: "⏳ 요청이 많아 처리할 수 없음 (Retry-After 초 뒤 다시 시도)"
         },
         tags=["User Management"]
     )
-    def delete(self, request):
-        serializer = UserDeleteSerializer(data=request.data)
+    async def delete(self, request):
+        serializer = UserDeleteSerializer(data=await request_data(request))
         if not serializer.is_valid():
             return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
         
@@ -258,9 +294,9 @@ class UserDeleteView(APIView):
         password = serializer.validated_data['password']
         
         try:
-            user = User.objects.get(username=username)
-            if user.check_password(password):
-                user.delete()
+            user = await sync_to_async(User.objects.get)(username=username)
+            if await hashing.check_password(user, password):
+                await sync_to_async(user.delete)()
                 return Response({
                     "message": "계정이 삭제되었습니다."
                 }, status=status.HTTP_200_OK)
@@ -275,6 +311,9 @@ class UserDeleteView(APIView):
 
 
 class UserMeView(APIView):
+    # 토큰 클레임으로 응답 (DB 조회 없음)
+    authentication_classes = [ClaimsJWTAuthentication]
+
     @swagger_auto_schema(
         operation_summary="현재 로그인한 유저 정보 조회",
         operation_description="""
@@ -286,6 +325,7 @@ class UserMeView(APIView):
         
         **반환 정보:**
         - 현재 로그인한 사용자의 ID, 아이디, 생성일, 수정일
+        - 토큰을 발급받을 때의 정보입니다 (DB 를 조회하지 않음)
         """,
         security=[{'Bearer': []}],
         responses={
@@ -376,16 +416,23 @@ class UserListView(APIView):
     @swagger_auto_schema(
         operation_summary="모든 유저 목록 조회",
         operation_description="""
-        등록된 모든 유저의 목록을 조회합니다.
+        등록된 유저의 목록을 최신 가입 순으로 페이지 단위로 조회합니다.
+        
+        **쿼리 파라미터:**
+        - limit: 페이지 크기 (기본 50, 최대 200)
+        - cursor: 다음 페이지를 받을 때 이전 응답의 `next` 값
+        - count: 전체 유저 수 계산 방식 - `approx`(기본, 잠시 캐시된 값) / `exact` / `none`(생략, `null`)
         
         **반환 정보:**
         - 전체 유저 수
         - 각 유저의 ID, 아이디, 생성일, 수정일 목록
+        - next: 다음 페이지 커서 (마지막 페이지면 `null`)
         
         **참고:**
         - 비밀번호는 반환되지 않습니다
-        - 최신 가입 순으로 정렬됩니다
+        - 커서 방식이라 조회 중에 가입한 유저 때문에 중복되거나 빠지는 항목이 없습니다
         """,
+        query_serializer=UserListQuerySerializer,
         responses={
             200: openapi.Response(
                 description="유저 목록 조회 성공",
@@ -405,23 +452,50 @@ class UserListView(APIView):
                                 "created_at": "2025-11-30T10:00:00Z",
                                 "updated_at": "2025-11-30T10:00:00Z"
                             }
-                        ]
+                        ],
+                        "next": None
                     }
                 }
-            )
+            ),
+            400: "❌ 잘못된 파라미터 또는 커서"
         },
         tags=["User Management"]
     )
     def get(self, request):
-        users = User.objects.all().order_by('-created_at')
-        serializer = UserDetailSerializer(users, many=True)
+        serializer = UserListQuerySerializer(data=request.query_params)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        params = serializer.validated_data
+
+        try:
+            rows, next_cursor = pagination.keyset_page(
+                User.objects.all(), USER_LIST_FIELDS, params['limit'], params['cursor']
+            )
+        except pagination.InvalidCursor as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        # UserDetailSerializer 와 같은 형식 (모델 인스턴스를 만들지 않음)
+        users = [{
+            "id": row["id"],
+            "username": row["username"],
+            "created_at": pagination.iso(row["created_at"]),
+            "updated_at": pagination.iso(row["updated_at"]),
+        } for row in rows]
+
+        if params['count'] == 'exact':
+            count = User.objects.count()
+        elif params['count'] == 'approx':
+            count = pagination.approximate_count(User, settings.USER_LIST_COUNT_CACHE_SECONDS)
+        else:
+            count = None
         return Response({
-            "count": users.count(),
-            "users": serializer.data
+            "count": count,
+            "users": users,
+            "next": next_cursor
         }, status=status.HTTP_200_OK)
 
 
-class TravelScheduleAI(APIView):
+class TravelScheduleAI(AsyncAPIView):
     @swagger_auto_schema(
         operation_summary="AI 여행 일정 생성",
         operation_description="""
@@ -442,6 +516,8 @@ class TravelScheduleAI(APIView):
         - 입력한 정보
         - AI가 생성한 상세 여행 일정
         - 저장된 일정 ID
+        - 캐시 재사용 정보 (`cache`): 같거나 거의 같은 요청의 일정을 재사용한 경우
+          `type` (exact/template/similar), `similarity`, `source_schedule_id`. 새로 생성한 경우 null
         
         ### 예시
         ```json
@@ -506,20 +582,19 @@ class TravelScheduleAI(APIView):
                     }
                 }
             ),
-            400: "❌ 잘못된 요청 (필수 필드 누락)"
+            400: "❌ 잘못된 요청 (필수 필드 누락)",
+            502: "❌ AI 일정 생성 실패 (잠시 후 다시 시도)"
         },
         tags=["Travel Planning"]
     )
-    def post(self, request):
-        serializer = TravelScheduleCreateSerializer(data=request.data)
+    async def post(self, request):
+        serializer = TravelScheduleCreateSerializer(data=await request_data(request))
         if not serializer.is_valid():
             return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
         # 인증된 사용자라면 해당 사용자와 일정 연결
         user = request.user if getattr(request.user, "is_authenticated", False) else None
 
-        schedule_obj = serializer.save(user=user)
-        
-        schedule_obj = serializer.save(user=user)
+        schedule_obj = await sync_to_async(serializer.save)(user=user)
 
         destination = schedule_obj.destination
         budget = schedule_obj.budget
@@ -527,18 +602,39 @@ class TravelScheduleAI(APIView):
         preferences = schedule_obj.preferences
         extra = schedule_obj.extra
 
-        ai_raw = asyncio.run(
-            generate_travel_plan(destination, budget, travel_date, preferences, extra)
-        )
+        # 같거나 거의 같은 요청의 일정이 있으면 AI 호출 없이 재사용
+        cached = await sync_to_async(plan_cache.lookup)(destination, budget, travel_date, preferences, extra)
+        if cached is not None:
+            ai_result, cache_info = cached
+            ai_usage = {"calls": 0, "cache": cache_info}
+        else:
+            cache_info = None
+            # 잘못된 JSON 은 로컬에서 복구하고, 잘린 응답만 이어쓰기 요청 (재생성하지 않음)
+            ai_result, ai_usage, json_status = await generate_travel_plan_result(
+                destination, budget, travel_date, preferences, extra
+            )
+            ai_usage["json_status"] = json_status
+            metrics.incr(f"plan_json:{json_status}")
+            if json_status == "failed":
+                # 사용량은 남기고, 일정 없이 저장된 행으로 두지 않도록 오류 결과와 함께 저장
+                schedule_obj.ai_result = ai_result
+                schedule_obj.ai_usage = ai_usage
+                await sync_to_async(schedule_obj.save)(update_fields=['ai_result', 'ai_usage'])
+                return Response({
+                    "schedule_id": schedule_obj.id,
+                    "error": "AI 일정 생성에 실패했습니다. 잠시 후 다시 시도해 주세요."
+                }, status=status.HTTP_502_BAD_GATEWAY)
 
-        try:
-            ai_result = json.loads(ai_raw)
-        except json.JSONDecodeError:
-            ai_result = {"error": "Invalid JSON returned from AI", "raw": ai_raw}
+        # 비용 합계/원화 환산 등 로컬 후처리 (재사용 일정은 새 날짜 기준으로 다시 계산)
+        ai_result = await asyncio.to_thread(postprocess_travel_plan, ai_result, travel_date)
         
-        # AI 결과 저장
+        # AI 결과 및 토큰 사용량 저장
         schedule_obj.ai_result = ai_result
-        schedule_obj.save()
+        schedule_obj.ai_usage = ai_usage
+        await sync_to_async(schedule_obj.save)(update_fields=['ai_result', 'ai_usage'])
+
+        if cache_info is None:
+            await sync_to_async(plan_cache.store)(schedule_obj)
         
         detail_serializer = TravelScheduleDetailSerializer(schedule_obj)
 
@@ -550,9 +646,10 @@ class TravelScheduleAI(APIView):
                 "travel_date": schedule_obj.travel_date,
                 "preferences": schedule_obj.preferences,
                 "extra": schedule_obj.extra,
-                "user_id": schedule_obj.user.id if schedule_obj.user else None
+                "user_id": schedule_obj.user_id
             },
-            "ai_result": ai_result
+            "ai_result": ai_result,
+            "cache": cache_info
         }, status=status.HTTP_200_OK)
 
 
@@ -735,6 +832,184 @@ class TravelScheduleDetailView(APIView):
             }, status=status.HTTP_404_NOT_FOUND)
 
 
+class TravelScheduleDayView(AsyncAPIView):
+    def _get_schedule(self, request, schedule_id):
+        """일정 조회 및 소유자 확인. 실패 시 (None, Response) 반환"""
+        try:
+            schedule = Travel_Schedule.objects.get(id=schedule_id)
+        except Travel_Schedule.DoesNotExist:
+            return None, Response({
+                "error": "여행 일정을 찾을 수 없습니다."
+            }, status=status.HTTP_404_NOT_FOUND)
+
+        if schedule.user_id is not None and getattr(request.user, "id", None) != schedule.user_id:
+            return None, Response({
+                "error": "본인의 여행 일정만 수정할 수 있습니다."
+            }, status=status.HTTP_403_FORBIDDEN)
+        return schedule, None
+
+    @staticmethod
+    def _find_day(ai_result, day):
+        """itinerary 에서 해당 날짜의 위치 (없으면 None)"""
+        if not isinstance(ai_result, dict):
+            return None
+        for index, item in enumerate(ai_result.get("itinerary") or []):
+            if isinstance(item, dict) and item.get("day") == day:
+                return index
+        return None
+
+    @swagger_auto_schema(
+        operation_summary="특정 날짜 일정의 이전 버전 조회",
+        operation_description="""
+        ## 하루 단위 재생성으로 교체된 이전 일정을 조회합니다!
+        
+        ### URL 파라미터
+        - **schedule_id**: 여행 일정 ID
+        - **day**: 날짜 번호 (1부터 시작)
+        
+        ### 반환 정보
+        - 해당 날짜의 이전 버전 목록 (최신순)
+        """,
+        security=[{'Bearer': []}],
+        responses={
+            200: TravelDayRevisionSerializer(many=True),
+            403: "❌ 본인의 여행 일정만 조회할 수 있습니다.",
+            404: "❌ 여행 일정을 찾을 수 없습니다."
+        },
+        tags=["Travel Planning"]
+    )
+    async def get(self, request, schedule_id, day):
+        schedule, error = await sync_to_async(self._get_schedule)(request, schedule_id)
+        if error:
+            return error
+
+        revisions = schedule.day_revisions.filter(day=day).order_by('-created_at')
+        serializer = TravelDayRevisionSerializer(revisions, many=True)
+        return Response({
+            "schedule_id": schedule.id,
+            "day": day,
+            "revisions": await sync_to_async(lambda: serializer.data)()
+        }, status=status.HTTP_200_OK)
+
+    @swagger_auto_schema(
+        operation_summary="특정 날짜 일정만 AI로 다시 생성",
+        operation_description="""
+        ## 마음에 들지 않는 하루만 다시 만들어 드립니다!
+        
+        전체 일정을 다시 생성하지 않고 **해당 날짜의 segments 만** 새로 생성합니다.
+        나머지 날짜는 요약된 문맥으로만 전달되어 비용과 시간이 크게 줄어듭니다.
+        교체되기 전 일정은 이전 버전으로 보관됩니다.
+        
+        ### 인증
+        - 로그인 사용자의 일정은 본인만 수정할 수 있습니다.
+        
+        ### URL 파라미터
+        - **schedule_id**: 여행 일정 ID
+        - **day**: 다시 생성할 날짜 번호 (1부터 시작)
+        
+        ### 예시
+        ```json
+        {
+          "feedback": "비 예보가 있어서 실내 위주로 바꿔주세요"
+        }
+        ```
+        """,
+        request_body=TravelDayRegenerateSerializer,
+        security=[{'Bearer': []}],
+        responses={
+            200: openapi.Response(
+                description="✅ 하루 일정 재생성 완료",
+                examples={
+                    "application/json": {
+                        "schedule_id": 1,
+                        "day": 2,
+                        "segments": [
+                            {
+                                "time": "10:00-12:00",
+                                "title": "국립중앙박물관 관람",
+                                "poi": "국립중앙박물관",
+                                "duration_min": 120,
+                                "transport": "지하철",
+                                "cost_local": 0,
+                                "booking_needed": False
+                            }
+                        ],
+                        "previous_revision_id": 3
+                    }
+                }
+            ),
+            400: "❌ 잘못된 요청 (해당 날짜의 일정이 없음)",
+            403: "❌ 본인의 여행 일정만 수정할 수 있습니다.",
+            404: "❌ 여행 일정을 찾을 수 없습니다.",
+            409: "❌ 재생성 중에 다른 요청이 일정을 먼저 수정함 (다시 시도)",
+            502: "❌ AI 일정 생성 실패 (잠시 후 다시 시도)"
+        },
+        tags=["Travel Planning"]
+    )
+    async def post(self, request, schedule_id, day):
+        serializer = TravelDayRegenerateSerializer(data=await request_data(request))
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        schedule, error = await sync_to_async(self._get_schedule)(request, schedule_id)
+        if error:
+            return error
+
+        if self._find_day(schedule.ai_result, day) is None:
+            return Response({
+                "error": f"{day}일차 일정이 없습니다."
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        # AI 호출과 후처리는 트랜잭션 밖에서 수행 (행 잠금 시간 최소화)
+        try:
+            new_day, ai_usage = await regenerate_travel_day(
+                schedule.destination, schedule.budget, schedule.travel_date,
+                schedule.preferences, schedule.extra,
+                schedule.ai_result, day, serializer.validated_data['feedback']
+            )
+        except AI_CALL_ERRORS:
+            return Response({
+                "schedule_id": schedule.id,
+                "error": "AI 일정 생성에 실패했습니다. 잠시 후 다시 시도해 주세요."
+            }, status=status.HTTP_502_BAD_GATEWAY)
+
+        # 동선 최적화/환율 환산은 복사본에 적용해 두고, 잠금 안에서는 저장만 함
+        updated = copy.deepcopy(schedule.ai_result)
+        updated["itinerary"][self._find_day(updated, day)] = new_day
+        updated = await asyncio.to_thread(postprocess_travel_plan, updated, schedule.travel_date, days=[day])
+        return await sync_to_async(self._replace_day)(schedule, day, updated, ai_usage)
+
+    def _replace_day(self, original, day, updated, ai_usage):
+        """
+        재생성한 일정으로 교체하고 이전 일정은 TravelDayRevision 으로 보관
+
+        AI 호출 중에 다른 요청이 일정을 바꿨으면 그 변경을 덮어쓰지 않도록 409 를 반환합니다.
+        """
+        with transaction.atomic():
+            schedule = Travel_Schedule.objects.select_for_update().get(id=original.id)
+            if schedule.ai_result != original.ai_result:
+                return Response({
+                    "error": "다른 요청이 일정을 먼저 수정했습니다. 다시 시도해 주세요."
+                }, status=status.HTTP_409_CONFLICT)
+
+            index = self._find_day(schedule.ai_result, day)
+            revision = TravelDayRevision.objects.create(
+                schedule=schedule,
+                day=day,
+                segments=schedule.ai_result["itinerary"][index].get("segments") or [],
+                ai_usage=ai_usage
+            )
+            schedule.ai_result = updated
+            schedule.save(update_fields=['ai_result'])
+
+        return Response({
+            "schedule_id": schedule.id,
+            "day": day,
+            "segments": updated["itinerary"][index]["segments"],
+            "previous_revision_id": revision.id
+        }, status=status.HTTP_200_OK)
+
+
 class ImageUploadView(APIView):
     parser_classes = (MultiPartParser, FormParser)
     renderer_classes = (JSONRenderer, BrowsableAPIRenderer)
@@ -787,16 +1062,20 @@ class ImageUploadView(APIView):
                         "image": "/media/uploads/image_2024_01_01.jpg",
                         "title": "제주도 한라산",
                         "description": "일출 사진",
-                        "uploaded_at": "2025-11-28T10:30:00Z"
+                        "uploaded_at": "2025-11-28T10:30:00Z",
+                        "variants": None
                     }
                 }
             ),
-            400: "❌ 잘못된 요청 (이미지 파일 필수)"
+            400: "❌ 잘못된 요청 (이미지 파일 필수, 파일 크기/해상도 제한 초과, 지원하지 않는 형식)"
         },
         tags=["Image Management"]
     )
     def post(self, request, format=None):
         serializer = ImageUploadSerializer(data=request.data)
+        # 업로드 중 헤더 검사에서 거부된 파일 (upload_handlers.py)
+        if upload_errors(request):
+            return Response(upload_errors(request), status=status.HTTP_400_BAD_REQUEST)
         if serializer.is_valid():
             uploaded_image = serializer.save()
             return Response(serializer.data, status=status.HTTP_201_CREATED)
@@ -810,6 +1089,9 @@ class ImageUploadView(APIView):
         ### 반환 정보
         - 모든 이미지 목록 (최신순)
         - 각 이미지의 ID, URL, 제목, 설명, 업로드 시간
+        - **variants**: 썸네일(`thumb`, 정사각형)과 너비별 축소본(`w320`, `w640`, `w1280`)의 URL/크기
+          - 업로드 직후 백그라운드에서 만들어지므로 잠시 동안은 `null` 입니다 (원본 `image` 사용)
+          - 원본보다 넓은 축소본은 만들지 않습니다
         """,
         responses={200: ImageUploadSerializer(many=True)},
         tags=["Image Management"]
@@ -820,7 +1102,62 @@ class ImageUploadView(APIView):
         return Response(serializer.data, status=status.HTTP_200_OK)
 
 
-class ImageAnalyzeView(APIView):
+def save_image_analysis(uploaded_image, ai_result):
+    """
+    분석 결과 저장 + 메모리 지표 기록
+
+    성공한 분석만 저장합니다 (이후 비슷한 업로드의 캐시로 사용).
+    """
+    if ai_result.get("image"):
+        metrics.observe(
+            "image_analysis:peak_mb", ai_result["image"]["peak_bytes"] / 1024 / 1024, PEAK_MB_EDGES
+        )
+    if ai_result.get("success"):
+        uploaded_image.ai_analysis = ai_result
+        uploaded_image.analyzed_at = timezone.now()
+        uploaded_image.save(update_fields=['ai_analysis', 'analyzed_at'])
+
+
+async def analyze_uploaded_image(uploaded_image, image=None, force_refresh=False):
+    """
+    저장된 UploadedImage 분석 (비슷한 사진의 분석 결과가 있으면 재사용)
+
+    Args:
+        image: 분석에 읽을 파일 (업로드 파일 객체). None 이면 업로드 저장소에서 읽음
+
+    Returns:
+        (ai_analysis, cache 정보 또는 None) - 분석 중 오류도 ai_analysis 에 담아 반환
+    """
+    # 거의 같은 사진의 분석 결과가 있으면 AI 호출 없이 재사용
+    cached = await sync_to_async(image_hash.lookup)(uploaded_image.phash, uploaded_image.id, force_refresh)
+    if cached is not None:
+        ai_result, cache_info = cached
+    else:
+        cache_info = None
+
+    opened = None
+    try:
+        if cached is None:
+            if image is None:
+                # 로컬 디스크 / S3 어느 저장소든 storage 를 통해 읽음
+                image = opened = await sync_to_async(upload_storage.open)(uploaded_image.image.name)
+            analyzer = KoreanImageAnalyzer()
+            ai_result = await analyzer.analyze_image_async(image)
+
+        await sync_to_async(save_image_analysis)(uploaded_image, ai_result)
+        return ai_result, cache_info
+
+    except Exception as e:
+        return {
+            "success": False,
+            "error": f"AI 분석 중 오류 발생: {str(e)}"
+        }, cache_info
+    finally:
+        if opened is not None:
+            opened.close()
+
+
+class ImageAnalyzeView(AsyncAPIView):
     parser_classes = (MultiPartParser, FormParser)
 
     @swagger_auto_schema(
@@ -832,6 +1169,12 @@ class ImageAnalyzeView(APIView):
         - **image**: 분석할 이미지 파일
         - **title**: 제목 (선택사항)
         - **description**: 설명 (선택사항)
+        - **force_refresh**: true 이면 저장된 분석 결과를 쓰지 않고 새로 분석 (선택사항)
+        
+        ### 분석 결과 재사용
+        거의 같은 사진(지각 해시 거리가 작은 사진)이 이미 분석되었다면
+        AI를 다시 호출하지 않고 저장된 결과를 바로 반환합니다.
+        이때 `cache`에 원본 이미지 id와 해시 거리가 포함됩니다.
         
         ### AI 분석 내용
         
@@ -872,6 +1215,13 @@ class ImageAnalyzeView(APIView):
                 type=openapi.TYPE_STRING,
                 required=False
             ),
+            openapi.Parameter(
+                'force_refresh',
+                openapi.IN_FORM,
+                description="🔄 비슷한 사진의 저장된 분석 결과를 쓰지 않고 새로 분석 (선택사항)",
+                type=openapi.TYPE_BOOLEAN,
+                required=False
+            ),
         ],
         responses={
             201: openapi.Response(
@@ -892,40 +1242,639 @@ class ImageAnalyzeView(APIView):
                                 "음식에_대한_설명": "한국의 대표적인 찌개 요리...",
                                 "음식_특징": "매콤하고 개운한 맛..."
                             }
+                        },
+                        "cache": {
+                            "source_image_id": 1,
+                            "distance": 2
                         }
                     }
                 }
+            ),
+            400: openapi.Response(
+                description="❌ 잘못된 요청 (이미지 파일 필수, 파일 크기/해상도 제한 초과, 지원하지 않는 형식)",
+                examples={
+                    "application/json": {
+                        "image": ["bomb.png: 이미지 픽셀 수가 너무 많습니다: 30000x30000 (최대 40메가픽셀)"]
+                    }
+                }
             )
         },
         tags=["AI Analysis"]
     )
-    def post(self, request, format=None):
-        # 이미지 저장
-        serializer = ImageUploadSerializer(data=request.data)
-        if not serializer.is_valid():
+    async def post(self, request, format=None):
+        # 이미지 검증 (멀티파트 파싱, Pillow 검증은 스레드에서)
+        data = await request_data(request)
+        if upload_errors(request):
+            return Response(upload_errors(request), status=status.HTTP_400_BAD_REQUEST)
+        serializer = ImageUploadSerializer(data=data)
+        if not await asyncio.to_thread(serializer.is_valid):
             return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
         
-        uploaded_image = serializer.save()
+        # 파일 저장/해시 계산은 스레드 풀에서, 행 생성만 DB 스레드에서
+        uploaded_image = await asyncio.to_thread(build_uploaded_image, **serializer.validated_data)
+        await sync_to_async(uploaded_image.save)()
+        serializer.instance = uploaded_image
+        force_refresh = str(
+            data.get('force_refresh', request.query_params.get('force_refresh', ''))
+        ).lower() in ('1', 'true', 'yes')
+
+        # 업로드 요청의 파일 버퍼로 바로 AI 분석 (저장된 파일을 다시 읽지 않음)
+        ai_result, cache_info = await analyze_uploaded_image(
+            uploaded_image, serializer.validated_data['image'], force_refresh
+        )
+        return Response({
+            "image_info": serializer.data,
+            "ai_analysis": ai_result,
+            "cache": cache_info
+        }, status=status.HTTP_201_CREATED)
+
+
+class ImageAnalyzeBatchView(AsyncAPIView):
+    parser_classes = (MultiPartParser, FormParser)
+
+    @swagger_auto_schema(
+        operation_summary="여행 앨범 이미지 일괄 AI 분석",
+        operation_description="""
+        ## 여러 장의 사진을 한 번에 올리고 분석 결과를 끝나는 순서대로 받습니다!
         
-        # 저장된 이미지 경로로 AI 분석
+        ### 업로드 방법
+        - **images**: 분석할 이미지 파일들 (같은 이름으로 여러 개, 최대 IMAGE_BATCH_MAX_FILES 장)
+        - **force_refresh**: true 이면 저장된 분석 결과를 쓰지 않고 새로 분석 (선택사항)
+        
+        ### 처리 방식
+        - 모든 이미지를 하나의 트랜잭션으로 저장합니다.
+        - 거의 같은 사진의 분석 결과가 있으면 바로 반환하고,
+          나머지는 IMAGE_BATCH_CONCURRENCY 개씩 동시에 분석합니다.
+        - 같은 요청 안의 동일한 사진은 한 번만 분석합니다.
+        
+        ### 응답 형식 (application/x-ndjson)
+        한 줄에 이미지 하나의 결과 JSON 이 완료되는 순서대로 전송됩니다.
+        `index` 는 업로드한 순서입니다.
+        """,
+        manual_parameters=[
+            openapi.Parameter(
+                'images',
+                openapi.IN_FORM,
+                description="🖼️ 분석할 이미지 파일들 (한국 관광지 또는 음식)",
+                type=openapi.TYPE_ARRAY,
+                items=openapi.Items(type=openapi.TYPE_FILE),
+                collection_format='multi',
+                required=True
+            ),
+            openapi.Parameter(
+                'force_refresh',
+                openapi.IN_FORM,
+                description="🔄 저장된 분석 결과를 쓰지 않고 새로 분석 (선택사항)",
+                type=openapi.TYPE_BOOLEAN,
+                required=False
+            ),
+        ],
+        responses={
+            200: openapi.Response(
+                description="✅ 이미지별 분석 결과 (NDJSON, 한 줄에 하나)",
+                examples={
+                    "application/x-ndjson": {
+                        "index": 0,
+                        "image_info": {
+                            "id": 1,
+                            "image": "/media/blobs/ab/cd/abcd....jpg",
+                            "title": ""
+                        },
+                        "ai_analysis": {
+                            "success": True,
+                            "data": {"type": "음식", "음식명": "김치찌개"}
+                        },
+                        "cache": None
+                    }
+                }
+            ),
+            400: "❌ 잘못된 요청 (이미지 형식 오류, 파일 크기/해상도 제한 초과, 파일 수 초과 등)"
+        },
+        tags=["AI Analysis"]
+    )
+    async def post(self, request, format=None):
+        # 멀티파트 파싱, Pillow 검증, blob 저장은 스레드에서
+        data = await request_data(request)
+        if upload_errors(request):
+            return Response(upload_errors(request), status=status.HTTP_400_BAD_REQUEST)
+        serializer = ImageBatchUploadSerializer(data=data)
+        if not await asyncio.to_thread(serializer.is_valid):
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        uploads = serializer.validated_data['images']
+        force_refresh = serializer.validated_data['force_refresh']
+
+        # 파일은 blob 으로 먼저 저장하고, 행은 한 트랜잭션에서 한 번에 생성
+        images = await asyncio.to_thread(lambda: [build_uploaded_image(upload) for upload in uploads])
+        images = await sync_to_async(self.create_images)(images)
+
+        response = StreamingHttpResponse(
+            self.stream_results(images, uploads, force_refresh),
+            content_type='application/x-ndjson'
+        )
+        response['Cache-Control'] = 'no-cache'
+        # 프록시(nginx)가 응답을 모아서 보내지 않도록
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
+    def create_images(self, images):
+        with transaction.atomic():
+            images = UploadedImage.objects.bulk_create(images)
+            # bulk_create 는 post_save 를 보내지 않으므로 후처리(형식 변환, 축소본)는 직접 예약
+            transcode.schedule(image.image.name for image in images)
+        return images
+
+    async def stream_results(self, images, uploads, force_refresh):
+        """
+        캐시 적중 결과를 먼저 보내고, 나머지는 분석이 끝나는 순서대로 전송
+
+        분석은 이 요청의 이벤트 루프에서 IMAGE_BATCH_CONCURRENCY 개씩 동시에 진행합니다.
+        클라이언트가 연결을 끊으면 남은 분석은 취소합니다.
+        """
+        pending = {}
+        for index, (image, upload) in enumerate(zip(images, uploads)):
+            cached = await sync_to_async(image_hash.lookup)(image.phash, image.id, force_refresh)
+            if cached is not None:
+                ai_result, cache_info = cached
+                await sync_to_async(save_image_analysis)(image, ai_result)
+                yield self.result_line(index, image, ai_result, cache_info)
+                continue
+            # 같은 요청 안의 동일한 사진은 한 번만 분석 (해시가 없으면 각각 분석)
+            key = image.phash or f"#{index}"
+            pending.setdefault(key, {"upload": upload, "targets": []})["targets"].append((index, image))
+
+        if not pending:
+            return
+
         try:
             analyzer = KoreanImageAnalyzer()
-            image_path = uploaded_image.image.path
-            ai_result = analyzer.analyze_image(image_path)
-            
-            return Response({
-                "image_info": serializer.data,
-                "ai_analysis": ai_result
-            }, status=status.HTTP_201_CREATED)
-            
         except Exception as e:
+            ai_result = {"success": False, "error": f"AI 분석 중 오류 발생: {str(e)}"}
+            for group in pending.values():
+                for index, image in group["targets"]:
+                    yield self.result_line(index, image, ai_result, None)
+            return
+
+        semaphore = asyncio.Semaphore(settings.IMAGE_BATCH_CONCURRENCY)
+
+        async def analyze(key, upload):
+            async with semaphore:
+                try:
+                    ai_result = await analyzer.analyze_image_async(upload)
+                except Exception as e:
+                    ai_result = {"success": False, "error": f"AI 분석 중 오류 발생: {str(e)}"}
+            return key, ai_result
+
+        tasks = [asyncio.ensure_future(analyze(key, group["upload"])) for key, group in pending.items()]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                key, ai_result = await next_done
+                for index, image in pending[key]["targets"]:
+                    await sync_to_async(save_image_analysis)(image, ai_result)
+                    yield self.result_line(index, image, ai_result, None)
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    def result_line(self, index, image, ai_result, cache_info):
+        return json.dumps({
+            "index": index,
+            "image_info": ImageUploadSerializer(image).data,
+            "ai_analysis": ai_result,
+            "cache": cache_info
+        }, ensure_ascii=False, cls=DjangoJSONEncoder) + "\n"
+
+
+def upload_session_error(error):
+    """resumable 예외 → 응답"""
+    if isinstance(error, ImageRejected):
+        return Response({"error": str(error)}, status=status.HTTP_400_BAD_REQUEST)
+    body = {"error": str(error)}
+    if isinstance(error, resumable.OffsetMismatch):
+        body["offset"] = error.offset
+    return Response(body, status=error.status_code)
+
+
+def get_upload_session(request, session_id):
+    """세션 조회 및 소유자 확인. 실패 시 (None, Response) 반환"""
+    try:
+        session = UploadSession.objects.select_related('uploaded_image').get(id=session_id)
+    except UploadSession.DoesNotExist:
+        return None, Response({
+            "error": "업로드 세션을 찾을 수 없습니다."
+        }, status=status.HTTP_404_NOT_FOUND)
+
+    if session.user_id is not None and getattr(request.user, "id", None) != session.user_id:
+        return None, Response({
+            "error": "본인의 업로드 세션만 사용할 수 있습니다."
+        }, status=status.HTTP_403_FORBIDDEN)
+    return session, None
+
+
+class UploadSessionCreateView(APIView):
+    @swagger_auto_schema(
+        operation_summary="이어 올리기 세션 생성",
+        operation_description="""
+        ## 큰 사진을 조각으로 나눠 올리기 위한 세션을 만듭니다!
+        
+        연결이 끊겨도 처음부터 다시 보내지 않고, 받은 위치부터 이어서 보낼 수 있습니다.
+        
+        ### 업로드 순서
+        1. `POST image-upload/sessions/` 로 세션 생성 (파일 이름, 전체 크기)
+        2. `PUT image-upload/sessions/{id}/` 로 조각 전송
+           - 헤더 `Upload-Offset`: 이 조각의 시작 위치 (바이트)
+           - 본문: 파일의 해당 부분 원본 바이트 (`Content-Type: application/octet-stream`)
+        3. 연결이 끊기면 `GET image-upload/sessions/{id}/` 로 받은 위치(`offset`)를 확인하고 그 위치부터 다시 전송
+        4. 모두 보내면 `POST image-upload/sessions/{id}/complete/` 로 완료 (`analyze: true` 면 AI 분석까지)
+        
+        ### 직접 업로드 (presigned URL)
+        `sha256` 을 함께 보내면 응답의 `upload` 에 저장소(S3 등)로 바로 올릴 URL 이 담깁니다.
+        1. `upload.method`(PUT)로 `upload.url` 에 파일 전체를 보냄 (`upload.headers` 를 그대로 포함)
+        2. `POST image-upload/sessions/{id}/complete/` 로 완료
+        - 같은 파일이 이미 저장되어 있으면 `upload` 는 `null` 이고 바로 완료하면 됩니다
+        - 저장소가 받은 내용을 `sha256` 으로 검증하므로 다른 파일은 저장되지 않습니다
+        
+        ### 참고
+        - 로그인한 상태로 만든 세션은 본인만 사용할 수 있습니다
+        - 일정 시간 진행이 없는 세션은 자동으로 정리됩니다
+        """,
+        request_body=UploadSessionCreateSerializer,
+        responses={
+            201: openapi.Response(
+                description="✅ 세션 생성 완료",
+                examples={
+                    "application/json": {
+                        "id": "3f2b9c1e-7a4d-4e8b-9c0a-1d2e3f4a5b6c",
+                        "file_name": "IMG_0001.jpg",
+                        "total_size": 5242880,
+                        "offset": 0,
+                        "status": "active",
+                        "content_hash": "9f86d081884c7d659a2feaa0c55ad015a3bf4f1b2b0b822cd15d6c15b0f00a08",
+                        "uploaded_image": None,
+                        "upload": {
+                            "method": "PUT",
+                            "url": "https://bucket.s3.ap-northeast-2.amazonaws.com/blobs/9f/86/...jpg?X-Amz-Signature=...",
+                            "headers": {"Content-Type": "image/jpeg", "x-amz-checksum-sha256": "n4bQgYhMfWWaL+qgxVrQFaO/TxsrC4Is0V1sFbDwCgg="}
+                        }
+                    }
+                }
+            ),
+            400: "❌ 잘못된 요청 (파일 크기 제한 초과 등)"
+        },
+        tags=["Image Management"]
+    )
+    def post(self, request):
+        serializer = UploadSessionCreateSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        user = request.user if request.user.is_authenticated else None
+        try:
+            session = resumable.create_session(user=user, **serializer.validated_data)
+        except ImageRejected as e:
+            return upload_session_error(e)
+
+        data = UploadSessionSerializer(session).data
+        if session.content_hash:
+            upload = resumable.direct_upload(session)
+            if upload is not None:
+                upload["url"] = request.build_absolute_uri(upload["url"])
+            data["upload"] = upload
+        return Response(data, status=status.HTTP_201_CREATED)
+
+
+class UploadSessionView(APIView):
+    @swagger_auto_schema(
+        operation_summary="이어 올리기 진행 상황 조회",
+        operation_description="""
+        ## 서버가 받은 바이트 수를 확인합니다!
+        
+        연결이 끊긴 뒤에는 `offset` 부터 이어서 보내세요.
+        """,
+        responses={
+            200: UploadSessionSerializer,
+            404: "❌ 업로드 세션을 찾을 수 없습니다."
+        },
+        tags=["Image Management"]
+    )
+    def get(self, request, session_id):
+        session, error = get_upload_session(request, session_id)
+        if error:
+            return error
+        response = Response(UploadSessionSerializer(session).data, status=status.HTTP_200_OK)
+        response['Upload-Offset'] = str(session.offset)
+        return response
+
+    @swagger_auto_schema(
+        operation_summary="이어 올리기 조각 전송",
+        operation_description="""
+        ## 파일 조각을 보냅니다!
+        
+        - 헤더 `Upload-Offset`: 이 조각의 시작 위치 (서버가 받은 위치와 같아야 함)
+        - 본문: 파일의 해당 부분 원본 바이트
+        
+        ### 반환 정보
+        - **offset**: 지금까지 받은 바이트 수 (다음 조각의 시작 위치)
+        - **complete**: 모든 데이터를 받았는지
+        
+        ### 오류
+        - 409: `Upload-Offset` 이 서버가 받은 위치와 다름 (응답의 `offset` 부터 다시 전송)
+        - 410: 만료된 세션
+        """,
+        manual_parameters=[
+            openapi.Parameter(
+                'Upload-Offset',
+                openapi.IN_HEADER,
+                description="📍 조각의 시작 위치 (바이트)",
+                type=openapi.TYPE_INTEGER,
+                required=True
+            ),
+        ],
+        responses={
+            200: openapi.Response(
+                description="✅ 조각 저장 완료",
+                examples={
+                    "application/json": {
+                        "offset": 1048576,
+                        "total_size": 5242880,
+                        "complete": False
+                    }
+                }
+            ),
+            400: "❌ 잘못된 요청 (offset 누락, 선언한 크기 초과, 이미지가 아닌 파일 등)",
+            409: "❌ offset 불일치",
+            410: "❌ 만료된 세션"
+        },
+        tags=["Image Management"]
+    )
+    def put(self, request, session_id):
+        session, error = get_upload_session(request, session_id)
+        if error:
+            return error
+        try:
+            offset = int(request.headers.get('Upload-Offset', ''))
+        except ValueError:
+            return Response({
+                "error": "Upload-Offset 헤더가 필요합니다."
+            }, status=status.HTTP_400_BAD_REQUEST)
+        length = int(request.META.get('CONTENT_LENGTH') or 0)
+
+        # 본문은 파서를 거치지 않고 스트림에서 바로 임시 파일로 기록
+        try:
+            new_offset = resumable.append_chunk(session, request.stream or io.BytesIO(), offset, length)
+        except (resumable.UploadSessionError, ImageRejected) as e:
+            return upload_session_error(e)
+
+        response = Response({
+            "offset": new_offset,
+            "total_size": session.total_size,
+            "complete": new_offset == session.total_size
+        }, status=status.HTTP_200_OK)
+        response['Upload-Offset'] = str(new_offset)
+        return response
+
+    @swagger_auto_schema(
+        operation_summary="이어 올리기 취소",
+        responses={204: "✅ 세션 삭제 완료", 404: "❌ 업로드 세션을 찾을 수 없습니다."},
+        tags=["Image Management"]
+    )
+    def delete(self, request, session_id):
+        session, error = get_upload_session(request, session_id)
+        if error:
+            return error
+        if session.status == UploadSession.STATUS_COMPLETING:
+            return Response({
+                "error": "완료 처리 중인 세션은 취소할 수 없습니다."
+            }, status=status.HTTP_409_CONFLICT)
+        resumable.discard(session)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class DirectUploadView(APIView):
+    """로컬 저장소(UPLOAD_STORAGE=local)의 presigned PUT 대역 (S3 presigned URL 과 같은 방식으로 사용)"""
+    # URL 의 서명된 토큰이 권한 (S3 presigned URL 처럼 Authorization 헤더 불필요)
+    authentication_classes = []
+    permission_classes = []
+
+    @swagger_auto_schema(
+        operation_summary="직접 업로드 (로컬 저장소)",
+        operation_description="""
+        ## 세션 생성 응답의 `upload.url` 로 파일 전체를 보냅니다!
+        
+        `UPLOAD_STORAGE=local` 일 때 S3 presigned PUT URL 대신 사용되는 주소입니다.
+        본문은 파일 원본 바이트이며, 크기와 SHA-256 이 세션을 만들 때 보낸 값과 같아야 저장됩니다.
+        """,
+        responses={
+            200: "✅ 저장 완료",
+            400: "❌ 크기 또는 SHA-256 불일치",
+            403: "❌ 만료되었거나 잘못된 업로드 URL"
+        },
+        tags=["Image Management"]
+    )
+    def put(self, request, token):
+        if not upload_storage.local:
+            return Response({
+                "error": "저장소에 직접 업로드하는 URL 을 사용하세요."
+            }, status=status.HTTP_404_NOT_FOUND)
+        try:
+            claims = upload_storage.load_upload_token(token)
+        except signing.BadSignature:
             return Response({
-                "image_info": serializer.data,
-                "ai_analysis": {
-                    "success": False,
-                    "error": f"AI 분석 중 오류 발생: {str(e)}"
+                "error": "만료되었거나 잘못된 업로드 URL 입니다."
+            }, status=status.HTTP_403_FORBIDDEN)
+
+        try:
+            name = upload_storage.receive_blob(
+                request.stream or io.BytesIO(), claims["sha256"], claims["size"], claims["ext"]
+            )
+        except BlobVerificationError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({"name": name}, status=status.HTTP_200_OK)
+
+
+class UploadSessionCompleteView(AsyncAPIView):
+    @swagger_auto_schema(
+        operation_summary="이어 올리기 완료",
+        operation_description="""
+        ## 받은 파일로 이미지를 등록합니다!
+        
+        - **analyze**: `true` 면 `image-analyze/` 와 같은 AI 분석 결과를 함께 반환
+        - **force_refresh**: 비슷한 사진의 저장된 분석 결과를 쓰지 않고 새로 분석
+        
+        이미 완료된 세션에 다시 요청하면 같은 이미지를 반환합니다.
+        """,
+        request_body=UploadSessionCompleteSerializer,
+        responses={
+            201: "✅ 이미지 등록 완료 (analyze 면 image_info / ai_analysis / cache)",
+            400: "❌ 아직 모든 데이터를 받지 못했거나 이미지가 아닌 파일",
+            404: "❌ 업로드 세션을 찾을 수 없습니다."
+        },
+        tags=["Image Management"]
+    )
+    async def post(self, request, session_id):
+        data = await request_data(request)
+        serializer = UploadSessionCompleteSerializer(data=data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        session, error = await sync_to_async(get_upload_session)(request, session_id)
+        if error:
+            return error
+        try:
+            uploaded_image, created = await sync_to_async(resumable.complete_session)(session)
+        except (resumable.UploadSessionError, ImageRejected) as e:
+            return upload_session_error(e)
+
+        image_info = ImageUploadSerializer(uploaded_image).data
+        response_status = status.HTTP_201_CREATED if created else status.HTTP_200_OK
+        if not serializer.validated_data['analyze']:
+            return Response(image_info, status=response_status)
+
+        if uploaded_image.ai_analysis and not serializer.validated_data['force_refresh']:
+            ai_result, cache_info = uploaded_image.ai_analysis, None
+        else:
+            ai_result, cache_info = await analyze_uploaded_image(
+                uploaded_image, force_refresh=serializer.validated_data['force_refresh']
+            )
+        return Response({
+            "image_info": image_info,
+            "ai_analysis": ai_result,
+            "cache": cache_info
+        }, status=response_status)
+
+
+def search_results(request, matches):
+    """검색 결과 (image_id, 거리, 점수) → 이미지 정보 목록 (그 사이 삭제된 이미지는 제외)"""
+    images = UploadedImage.objects.in_bulk([image_id for image_id, _, _ in matches])
+    results = []
+    for image_id, distance, score in matches:
+        if image_id in images:
+            item = ImageUploadSerializer(images[image_id], context={'request': request}).data
+            item["distance"] = distance
+            item["score"] = score
+            results.append(item)
+    return results
+
+
+class ImageSearchView(APIView):
+    parser_classes = (MultiPartParser, FormParser)
+
+    search_description = """
+        ### 유사도 기준
+        - 지각 해시(dHash) 해밍 거리 + 색 분포 + 에지 방향 서명을 합친 **score** (0~1, 높을수록 비슷함)
+        - **distance**: 지각 해시 해밍 거리 (0 = 거의 같은 사진, 무관한 사진은 평균 32)
+        - 각 워커의 메모리 인덱스에서 찾으므로 이미지가 많아도 수 ms 안에 응답합니다
+        - 방금 올린 이미지는 몇 초(`IMAGE_SEARCH_REFRESH_SECONDS`) 뒤부터 결과에 포함됩니다
+        """
+
+    @swagger_auto_schema(
+        operation_summary="비슷한 이미지 검색 (저장된 이미지 기준)",
+        operation_description="""
+        ## 업로드된 이미지와 비슷한 사진을 찾아보세요!
+        
+        ### 요청
+        - **image_id**: 기준 이미지 ID
+        - **k**: 결과 수 (기본 10)
+        """ + search_description,
+        query_serializer=ImageSearchQuerySerializer,
+        responses={
+            200: openapi.Response(
+                description="✅ 검색 완료",
+                examples={
+                    "application/json": {
+                        "results": [{
+                            "id": 12,
+                            "image": "/media/blobs/ab/cd/abcd....jpg",
+                            "title": "제주도 한라산",
+                            "description": "",
+                            "uploaded_at": "2025-11-28T10:30:00Z",
+                            "variants": None,
+                            "distance": 3,
+                            "score": 0.9412
+                        }],
+                        "took_ms": 2.1
+                    }
                 }
-            }, status=status.HTTP_201_CREATED)
+            ),
+            400: "❌ 잘못된 요청",
+            404: "❌ 이미지를 찾을 수 없음"
+        },
+        tags=["Image Management"]
+    )
+    def get(self, request, format=None):
+        serializer = ImageSearchQuerySerializer(data=request.query_params)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        image_id = serializer.validated_data['image_id']
+        image = UploadedImage.objects.filter(id=image_id).only('id', 'image', 'phash', 'signature').first()
+        if image is None:
+            return Response({"error": "이미지를 찾을 수 없습니다."}, status=status.HTTP_404_NOT_FOUND)
+
+        phash, signature = image.phash, image.signature
+        if not phash or not signature:
+            # 후처리 전(직접 업로드)이거나 서명 도입 전에 올린 이미지
+            transcode.fill_fingerprint(image.image.name)
+            image.refresh_from_db(fields=['phash', 'signature'])
+            phash, signature = image.phash, image.signature
+        if not phash:
+            return Response({"error": "이미지를 읽을 수 없습니다."}, status=status.HTTP_400_BAD_REQUEST)
+
+        started = timezone.now()
+        matches = image_search.search(phash, signature, serializer.validated_data['k'], exclude_id=image_id)
+        return Response({
+            "results": search_results(request, matches),
+            "took_ms": round((timezone.now() - started).total_seconds() * 1000, 1),
+        }, status=status.HTTP_200_OK)
+
+    @swagger_auto_schema(
+        operation_summary="비슷한 이미지 검색 (사진 파일 기준)",
+        operation_description="""
+        ## 사진을 보내 비슷한 업로드 이미지를 찾아보세요!
+        
+        ### 요청
+        - **image**: 검색할 이미지 파일 (저장되지 않음)
+        - **k**: 결과 수 (기본 10)
+        """ + search_description,
+        manual_parameters=[
+            openapi.Parameter(
+                'image',
+                openapi.IN_FORM,
+                description="📁 검색할 이미지 파일",
+                type=openapi.TYPE_FILE,
+                required=True
+            ),
+            openapi.Parameter(
+                'k',
+                openapi.IN_FORM,
+                description="🔢 결과 수",
+                type=openapi.TYPE_INTEGER,
+                required=False
+            ),
+        ],
+        responses={
+            200: "✅ 검색 완료 (GET 과 같은 형식)",
+            400: "❌ 잘못된 요청 (이미지 파일 필수, 파일 크기/해상도 제한 초과, 지원하지 않는 형식)"
+        },
+        tags=["Image Management"]
+    )
+    def post(self, request, format=None):
+        # request.data 로 업로드를 먼저 읽어야 헤더 검사에서 거부된 파일이 기록됨 (upload_handlers.py)
+        data = request.data
+        if upload_errors(request):
+            return Response(upload_errors(request), status=status.HTTP_400_BAD_REQUEST)
+        serializer = ImageSearchUploadSerializer(data=data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        phash, signature = image_search.fingerprint(serializer.validated_data['image'])
+        if not phash:
+            return Response({"error": "이미지를 읽을 수 없습니다."}, status=status.HTTP_400_BAD_REQUEST)
+
+        started = timezone.now()
+        matches = image_search.search(phash, signature, serializer.validated_data['k'])
+        return Response({
+            "results": search_results(request, matches),
+            "took_ms": round((timezone.now() - started).total_seconds() * 1000, 1),
+        }, status=status.HTTP_200_OK)
 
 
 class ExchangeRatePredictionView(APIView):